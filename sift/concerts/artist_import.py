@@ -0,0 +1,116 @@
+"""
+concerts/artist_import.py
+
+Bulk artist import, for add_artists --file and the enrich_artists
+management command.
+
+import_artists de-duplicates names against every Artist name, case-folded
+and loaded in one query, and inserts the new ones with bulk_create.  The
+rows go in without a regex or Spotify ID; an empty re_string marks an
+artist as awaiting enrichment, and ArtistMatcher skips empty patterns, so
+pending artists never match anything.
+
+enrich_artists then works through the pending artists a batch at a time:
+it makes each one's regex and normalized name (see concerts.billing), looks
+the batch up on Spotify with SpotifyResolver.resolve_many, and saves them,
+flagging the artists needs_matching for the next make_matches.
+"""
+
+import logging
+
+from django.db import transaction
+
+from .billing import normalize_name
+from .matching import QUERY_CHUNK_SIZE
+from .utils import make_artist_regex
+
+logger = logging.getLogger('concerts')
+
+# pending artists enriched (and Spotify searches queued) per batch
+ENRICH_BATCH_SIZE = 100
+
+
+def read_artist_names(lines):
+    """
+    Yields the artist names in lines (eg. a file), one per line, skipping
+    blank lines and # comments.
+    """
+
+    for line in lines:
+        name = line.strip()
+        if name and not name.startswith('#'):
+            yield name
+
+
+def import_artists(names):
+    """
+    Inserts the artists in names that aren't in the DB yet, compared
+    case-insensitively, as pending enrichment.  Of names that differ only
+    in case, the first is kept.
+
+    :returns: A tuple of (<list of names added>, <number of names skipped>).
+    """
+
+    from .models import Artist
+
+    known = {name.casefold() for name in Artist.objects.values_list('name', flat=True)}
+    added = []
+    skipped = 0
+    for name in names:
+        key = name.casefold()
+        if key in known:
+            skipped += 1
+            continue
+        known.add(key)
+        added.append(name)
+
+    Artist.objects.bulk_create(
+        [Artist(name=name, re_string='', needs_matching=False) for name in added],
+        batch_size=QUERY_CHUNK_SIZE,
+    )
+    return added, skipped
+
+
+def enrich_artists(resolver=None, batch_size=ENRICH_BATCH_SIZE):
+    """
+    Gives every artist pending enrichment its regex, and Spotify ID if
+    resolver (a concerts.spotify.SpotifyResolver) is given and finds one.
+    Each batch is saved in its own transaction, so an interrupted run
+    picks up where it left off.
+
+    :returns: A dict of 'enriched' and 'spotify_ids' (found) counts.
+    """
+
+    from .models import Artist
+
+    counts = {'enriched': 0, 'spotify_ids': 0}
+    pending = Artist.objects.filter(re_string='').order_by('pk')
+    last_pk = 0
+
+    while True:
+        batch = list(
+            pending.filter(pk__gt=last_pk).values_list('pk', 'name', 'spotify_id')[:batch_size]
+        )
+        if not batch:
+            return counts
+        last_pk = batch[-1][0]
+
+        spotify_ids = {}
+        if resolver is not None:
+            spotify_ids = resolver.resolve_many(
+                name for pk, name, spotify_id in batch if not spotify_id
+            )
+
+        with transaction.atomic():
+            for pk, name, spotify_id in batch:
+                if not spotify_id and spotify_ids.get(name):
+                    spotify_id = spotify_ids[name]
+                    counts['spotify_ids'] += 1
+                Artist.objects.filter(pk=pk).update(
+                    re_string=make_artist_regex(name),
+                    normalized_name=normalize_name(name),
+                    spotify_id=spotify_id,
+                    needs_matching=True,
+                )
+        counts['enriched'] += len(batch)
+        logger.debug("Enriched {} artists".format(counts['enriched']))
@@ -0,0 +1,167 @@
+"""
+concerts/billing.py
+
+Normalized billing tokens: an inverted index from artist names to the
+concerts whose billing lists them, for make_matches --strategy index, and
+from words to concerts, for concerts.search.
+
+Each Concert.billing is split into one token per act, on "with", "w/",
+"featuring", "presents", commas, slashes, and the other separators in
+BILLING_SPLIT_RE (eg. "An Evening with Wilco (Acoustic)" gives "an
+evening", "wilco" and "acoustic").  Acts joined with "&" or "+" are kept
+whole and also split, as that may be one band or two.  Tokens and
+Artist.normalized_name are both normalize_name()d: case-folded, with
+apostrophes and a leading "the" dropped, and any other run of punctuation
+or whitespace collapsed to one space.  A BillingToken row links each token
+to its concert, so matching is an equality join between the two columns,
+driven by the (token, concert) index.
+
+Each act is also stored from each of its later words on ("new
+pornographers" adds "pornographers", with word=1), so a range scan of the
+same index finds every concert with a word starting with some prefix.
+Only whole acts (word=0) are matched to artists.
+
+Unlike the artist regexes, an artist only matches an act listed under
+exactly its name: "Wilco" doesn't match "The Wilco Tribute", but neither
+does it match "Wilco (DJ set)" unless the billing bracketed the extra
+words.  Names that are all punctuation ("!!!") normalize to nothing and
+are never matched this way.
+
+Billings are tokenized as they're written: by sync_venue_concerts at
+scrape time, stage_concert_fixture, and apply_delta.  make_matches
+--strategy index also tokenizes any flagged concert without tokens (eg.
+loaded by load_fixtures), and normalizes artists loaded from fixtures
+older than normalized_name.
+"""
+
+import re
+
+from .matching import QUERY_CHUNK_SIZE
+
+# where one act ends and the next begins on a bill
+BILLING_SPLIT_RE = re.compile(
+    r'\bwith\b|\bw/|\bfeat(?:uring\b|\.)|\bpresents?\b|\s[-–—]+\s|[,;:/*|()\[\]]',
+    flags=re.IGNORECASE
+)
+# acts joined with these may be one band or two
+JOINED_ACTS_RE = re.compile(r'[&+]')
+APOSTROPHE_RE = re.compile(r"['’]")
+NON_WORD_RE = re.compile(r'[\W_]+')
+LEADING_ARTICLE_RE = re.compile(r'^the ')
+
+
+def normalize_name(name):
+    """Returns name case-folded, without punctuation or a leading "the"."""
+
+    name = APOSTROPHE_RE.sub('', name.casefold())
+    name = NON_WORD_RE.sub(' ', name).strip()
+    return LEADING_ARTICLE_RE.sub('', name)
+
+
+def billing_tokens(billing):
+    """Returns the distinct normalized acts on a billing, in order."""
+
+    tokens = []
+    for part in BILLING_SPLIT_RE.split(billing):
+        acts = [part]
+        if JOINED_ACTS_RE.search(part):
+            acts += JOINED_ACTS_RE.split(part)
+        for act in acts:
+            token = normalize_name(act)
+            if token and token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def token_rows(billing):
+    """
+    Returns the (token, word) pairs to index for a billing: each act, with
+    word 0, then the rest of each act from each later word on.
+    """
+
+    rows = {}
+    acts = billing_tokens(billing)
+    for act in acts:
+        rows[act] = 0
+    for act in acts:
+        words = act.split(' ')
+        for word in range(1, len(words)):
+            rows.setdefault(' '.join(words[word:]), word)
+    return list(rows.items())
+
+
+def index_billings(concerts):
+    """
+    Replaces the BillingTokens of concerts (a Concert queryset) with
+    tokens of their current billings.  Returns the number of tokens written.
+    """
+
+    from .models import BillingToken
+
+    rows = list(concerts.values_list('id', 'billing'))
+    count = 0
+    for start in range(0, len(rows), QUERY_CHUNK_SIZE):
+        chunk = rows[start:start + QUERY_CHUNK_SIZE]
+        BillingToken.objects.filter(
+            concert_id__in=[concert_id for concert_id, billing in chunk]
+        ).delete()
+        tokens = [
+            BillingToken(concert_id=concert_id, token=token, word=word)
+            for concert_id, billing in chunk
+            for token, word in token_rows(billing)
+        ]
+        BillingToken.objects.bulk_create(tokens, batch_size=QUERY_CHUNK_SIZE)
+        count += len(tokens)
+    return count
+
+
+def normalize_artists(artists, refresh=False):
+    """
+    Fills in normalized_name for artists (an Artist queryset) that don't
+    have one yet, eg. loaded from a fixture older than the field, or with
+    refresh, corrects it for every artist.  Artists still waiting for
+    enrichment (empty re_string) are left alone.
+    """
+
+    if not refresh:
+        artists = artists.filter(normalized_name='')
+    rows = artists.exclude(re_string='').values_list('id', 'name', 'normalized_name')
+    for artist_id, name, current in list(rows):
+        normalized_name = normalize_name(name)
+        if normalized_name != current:
+            artists.model.objects.filter(pk=artist_id).update(normalized_name=normalized_name)
+
+
+def index_matches(tokens, artists):
+    """
+    Returns a list of (concert id, artist id) pairs for the whole-act tokens
+    that are one of artists' normalized names.
+
+    :param tokens: BillingToken queryset, eg. filtered on concert__generation.
+                   Filter through the concert relation rather than with
+                   concert__in, so the concerts are joined, not listed.
+    :param artists: Artist queryset.
+    """
+
+    from .models import Artist
+
+    # Django 1.9 can only join on foreign keys, so the artist table is
+    # joined in with extra()
+    artist_table = Artist._meta.db_table
+    token_table = tokens.model._meta.db_table
+    artist_sql, artist_params = artists.values('id').query.sql_with_params()
+    return list(
+        tokens.filter(word=0)
+        .extra(
+            select={'artist_id': '{}.id'.format(artist_table)},
+            tables=[artist_table],
+            where=[
+                '{}.normalized_name = {}.token'.format(artist_table, token_table),
+                '{}.id IN ({})'.format(artist_table, artist_sql),
+            ],
+            params=artist_params,
+        )
+        .values_list('concert_id', 'artist_id')
+        .distinct()
+        .order_by('concert_id', 'artist_id')
+    )
@@ -0,0 +1,62 @@
+"""
+concerts/caching.py
+
+Page caching for the concerts views, keyed on the data generation.
+
+The concert data only changes when the scrape and match commands run, so a
+rendered page stays valid until then.  Cached pages are stored under the
+current DataGeneration token and the request path; the commands bump the
+token once new data has landed, which retires every page cached before it
+at once.  Serving a cached page costs a single query for the token.
+
+Only the canonical pages, requested without a query string, are cached.
+Cursors, filters, and stray parameters make an unbounded number of
+variants, which would crowd the canonical pages out of the cache (as
+searches would; see views.Search), so those are rendered every time.
+
+Pages go to the Django cache named by PAGE_CACHE (see CACHES in settings);
+the local-memory and file-based backends both work.
+"""
+
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PAGE_CACHE = 'default'
+
+
+def page_cache_key(token, request):
+    return 'concerts:page:{}:{}'.format(token, request.path)
+
+
+class GenerationCacheMixin:
+    """
+    View mixin that caches successful GET responses to requests without a
+    query string until the next data generation.
+
+    The DataGeneration row is kept on the view as `data_generation`, so the
+    view can read the published concerts without querying it again.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return super().dispatch(request, *args, **kwargs)
+
+        from .models import DataGeneration
+
+        self.data_generation = DataGeneration.load()
+        if request.META.get('QUERY_STRING'):
+            return super().dispatch(request, *args, **kwargs)
+
+        cache = caches[PAGE_CACHE]
+        key = page_cache_key(self.data_generation.token, request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, 'render'):
+                response.render()
+            cache.set(key, (response.content, response['Content-Type']), None)
+        return response
@@ -0,0 +1,114 @@
+"""
+concerts/db_indexes.py
+
+Indexes for the concerts tables beyond the ones Django creates for primary,
+foreign, and unique keys, matched to how the tables are queried:
+
+- concerts listed in (date_time, id) order, by keyset page (ConcertsIndex,
+  UpcomingShows), optionally for one venue, and only the active ones when
+  matching (make_matches)
+- the latest date_scraped (last updated on the concert pages)
+- the few concerts and artists flagged needs_matching (make_matches)
+- active artists in name order (ArtistsIndex)
+- case-insensitive artist name lookups (add_artists' name__iexact)
+
+SEARCH_INDEXES are kept apart: GIN indexes for the full-text search of
+billings and artist names (concerts/search.py), on the same to_tsvector()
+expressions the searches use.  Migration 0011 creates them, as does
+benchmark_search before timing the searches.
+
+Partial indexes only cover the rows the queries ask for.  They're
+PostgreSQL-only: psycopg2 sends query parameters inline, so the planner can
+see that `is_active = true` satisfies the index, while SQLite plans with
+bound parameters and never picks them; the same goes for the
+case-insensitive name index, which SQLite's LIKE can't use, and the
+full-text indexes, which SQLite has no equivalent of.  Django 1.9
+can't declare these on the models, so migration 0007 creates them with
+create_indexes (and later migrations that make SQLite rebuild a table call
+it again); the benchmark_indexes command also drops and recreates them to
+compare query plans.  Migrations pass create_indexes their own copy of the
+definitions as they stood then, so changing these never changes what an
+applied migration did.  PostgreSQL and SQLite are supported; other
+databases are left alone.
+"""
+
+# name: (table, PostgreSQL definition, SQLite definition or None)
+INDEXES = {
+    'concerts_concert_date_time_id': (
+        'concerts_concert', '(date_time, id)', '(date_time, id)',
+    ),
+    'concerts_concert_active_date_time_id': (
+        'concerts_concert',
+        '(date_time, id) WHERE is_active',
+        None,
+    ),
+    'concerts_concert_venue_date_time_id': (
+        'concerts_concert', '(venue_id, date_time, id)', '(venue_id, date_time, id)',
+    ),
+    'concerts_concert_date_scraped': (
+        'concerts_concert', '(date_scraped)', '(date_scraped)',
+    ),
+    'concerts_concert_needs_matching': (
+        'concerts_concert',
+        '(id) WHERE needs_matching',
+        None,
+    ),
+    'concerts_artist_active_name': (
+        'concerts_artist',
+        '(name) WHERE is_active',
+        None,
+    ),
+    'concerts_artist_needs_matching': (
+        'concerts_artist',
+        '(id) WHERE needs_matching',
+        None,
+    ),
+    # name__iexact compiles to UPPER(name) = UPPER(%s) on PostgreSQL
+    'concerts_artist_name_ci': (
+        'concerts_artist', '(UPPER(name))', None,
+    ),
+}
+
+SEARCH_INDEXES = {
+    'concerts_concert_billing_search': (
+        'concerts_concert', "USING gin (to_tsvector('simple', billing))", None,
+    ),
+    'concerts_artist_name_search': (
+        'concerts_artist', "USING gin (to_tsvector('simple', name))", None,
+    ),
+}
+
+
+def _definitions(connection, indexes=None):
+    column = {'postgresql': 1, 'sqlite': 2}.get(connection.vendor)
+    if column is None:
+        return []
+    if indexes is None:
+        indexes = INDEXES
+    return [
+        (name, definition[0], definition[column])
+        for name, definition in sorted(indexes.items())
+        if definition[column] is not None
+    ]
+
+
+def create_indexes(connection, indexes=None):
+    """
+    Creates the INDEXES that don't exist yet on connection's database.
+    indexes replaces INDEXES, eg. with SEARCH_INDEXES or a migration's own
+    copy.
+    """
+
+    with connection.cursor() as cursor:
+        for name, table, definition in _definitions(connection, indexes):
+            cursor.execute('CREATE INDEX IF NOT EXISTS {} ON {} {}'.format(
+                name, table, definition
+            ))
+
+
+def drop_indexes(connection, indexes=None):
+    """Drops the INDEXES (or indexes instead) from connection's database."""
+
+    with connection.cursor() as cursor:
+        for name, table, definition in _definitions(connection, indexes):
+            cursor.execute('DROP INDEX IF EXISTS {}'.format(name))
@@ -0,0 +1,308 @@
+"""
+concerts/deltas.py
+
+Delta fixtures: the artists and concerts added, changed, and removed
+between two full fixtures, so refresh_heroku can update the DB in place
+from a file the size of the changes instead of reloading whole tables.
+
+refresh_dev writes a delta from the previous full fixture of each type to
+the one it just exported, under <type fixture dir>/deltas/.  A delta is
+gzipped JSON Lines: a header naming the SHA-256 digests of its base and
+target fixtures, then one line per object, either
+{"op": "upsert", "object": <fixture object>} or
+{"op": "delete", "key": <key>}.
+
+Artists are keyed on pk, which is the same everywhere they are loaded.
+Concerts get new pks wherever they are loaded (see stage_concert_fixture),
+so they are keyed on (venue, date_time, url) like concerts.sync.  Fields
+that only describe the DB they came from (the concert's matches,
+generation, date_scraped, and the needs_matching flags) aren't compared.
+
+DataGeneration records the digest of the fixture each type was last
+loaded from, and delta_chain finds the deltas leading from it to the
+latest fixture.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .billing import index_billings
+from .fixture_io import JSONL_SUFFIX, fixture_rows, raw_bulk_insert, read_fixture
+from .matching import QUERY_CHUNK_SIZE, clear_matches
+from .sync import concert_key
+from .utils import FIXTURE_DIRS, KEEP_FIXTURES
+
+DELTA_FIXTURE_TYPES = ('artists', 'concerts')
+DELTA_SUFFIX = '.delta' + JSONL_SUFFIX
+
+# not compared; see module docstring
+IGNORED_FIELDS = {
+    'artists': {'needs_matching'},
+    'concerts': {'artists', 'date_scraped', 'generation', 'needs_matching'},
+}
+
+
+def fixture_digest(path):
+    """Returns the SHA-256 hex digest of a fixture file's bytes."""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fixture:
+        for block in iter(lambda: fixture.read(64 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def delta_dir(fixture_type):
+    return os.path.join(FIXTURE_DIRS[fixture_type], 'deltas')
+
+
+def object_key(fixture_type, obj):
+    """Returns the key a fixture object is matched on; see module docstring."""
+
+    if fixture_type == 'concerts':
+        fields = obj['fields']
+        return [fields['venue'], fields['date_time'], fields['url']]
+    return obj['pk']
+
+
+def _compared(fixture_type, obj):
+    return {
+        name: value for name, value in obj['fields'].items()
+        if name not in IGNORED_FIELDS[fixture_type]
+    }
+
+
+def snapshot(fixture_type, path):
+    """
+    Reads a full fixture for diffing: returns (<digest>, <dict of
+    json-encoded key: object>).
+    """
+
+    objects = {
+        json.dumps(object_key(fixture_type, obj)): obj for obj in read_fixture(path)
+    }
+    return fixture_digest(path), objects
+
+
+def write_delta(fixture_type, base, target_path):
+    """
+    Writes the delta from a snapshot() of the base fixture to the fixture
+    at target_path, and returns (<delta path>, <dict of 'added', 'changed',
+    and 'removed' counts>).
+    """
+
+    base_digest, base_objects = base
+    target_digest, target_objects = snapshot(fixture_type, target_path)
+    counts = {'added': 0, 'changed': 0, 'removed': 0}
+
+    lines = [{
+        'fixture_type': fixture_type, 'base': base_digest, 'target': target_digest,
+    }]
+    for key, obj in target_objects.items():
+        old = base_objects.get(key)
+        if old is None:
+            counts['added'] += 1
+        elif _compared(fixture_type, old) != _compared(fixture_type, obj):
+            counts['changed'] += 1
+        else:
+            continue
+        lines.append({'op': 'upsert', 'object': obj})
+    for key in base_objects.keys() - target_objects.keys():
+        counts['removed'] += 1
+        lines.append({'op': 'delete', 'key': json.loads(key)})
+
+    directory = delta_dir(fixture_type)
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.basename(target_path)[:-len(JSONL_SUFFIX)]
+    path = os.path.join(directory, '{}_{}{}'.format(name, target_digest[:12], DELTA_SUFFIX))
+    handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(handle)
+    try:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as delta:
+            for line in lines:
+                delta.write(json.dumps(line, cls=DjangoJSONEncoder, separators=(',', ':')))
+                delta.write('\n')
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    names = sorted(name for name in os.listdir(directory) if name.endswith(DELTA_SUFFIX))
+    for name in names[:max(len(names) - KEEP_FIXTURES, 0)]:
+        os.remove(os.path.join(directory, name))
+    return path, counts
+
+
+def read_delta(path):
+    """Returns (<header dict>, <iterator of the delta's operations>)."""
+
+    lines = read_fixture(path)
+    header = next(lines, None)
+    if header is None or 'base' not in header or 'target' not in header:
+        raise ValueError("Not a delta fixture: {}".format(path))
+    return header, lines
+
+
+def delta_chain(fixture_type, applied_digest, target_digest):
+    """
+    Returns the paths of the deltas that lead, in order, from the fixture
+    with applied_digest to the one with target_digest, or None if the
+    deltas on hand don't connect them.
+    """
+
+    directory = delta_dir(fixture_type)
+    if not applied_digest or not os.path.isdir(directory):
+        return None
+    steps = {}
+    for name in os.listdir(directory):
+        if name.endswith(DELTA_SUFFIX):
+            path = os.path.join(directory, name)
+            header, lines = read_delta(path)
+            lines.close()
+            steps[header['base']] = (header['target'], path)
+
+    chain = []
+    digest = applied_digest
+    while digest != target_digest:
+        if digest not in steps or len(chain) > len(steps):
+            return None
+        digest, path = steps[digest]
+        chain.append(path)
+    return chain
+
+
+def _apply_artists(operations):
+    from .models import Artist
+
+    counts = {'added': 0, 'changed': 0, 'removed': 0}
+    upserts = []
+    removed = []
+    for operation in operations:
+        if operation['op'] == 'delete':
+            removed.append(operation['key'])
+        else:
+            upserts.append(operation['object'])
+
+    for start in range(0, len(removed), QUERY_CHUNK_SIZE):
+        artists = Artist.objects.filter(pk__in=removed[start:start + QUERY_CHUNK_SIZE])
+        clear_matches(artists=artists)
+        counts['removed'] += artists.delete()[1].get(Artist._meta.label, 0)
+
+    for start in range(0, len(upserts), QUERY_CHUNK_SIZE):
+        rows = list(fixture_rows(upserts[start:start + QUERY_CHUNK_SIZE]))
+        existing = Artist.objects.in_bulk([values['id'] for model, values, m2m in rows])
+        new_artists = []
+        for model, values, m2m in rows:
+            values.pop('needs_matching', None)
+            artist = existing.get(values['id'])
+            if artist is None:
+                new_artists.append(Artist(needs_matching=True, **values))
+                continue
+            values.pop('id')
+            rematch = (values.get('re_string', artist.re_string) != artist.re_string or
+                       values.get('is_active', artist.is_active) != artist.is_active)
+            Artist.objects.filter(pk=artist.pk).update(
+                needs_matching=artist.needs_matching or rematch, **values
+            )
+            counts['changed'] += 1
+        raw_bulk_insert(Artist, new_artists)
+        counts['added'] += len(new_artists)
+    return counts
+
+
+def _apply_concerts(operations, generation):
+    from .models import Concert
+
+    counts = {'added': 0, 'changed': 0, 'removed': 0}
+    upserts = {}
+    removed = set()
+    for operation in operations:
+        if operation['op'] == 'delete':
+            removed.add(tuple(operation['key']))
+        else:
+            model, values, m2m = next(fixture_rows([operation['object']]))
+            key = concert_key(values['venue_id'], values['date_time'], values['url'])
+            upserts[key] = values
+
+    # delete keys are in their JSON form; convert them as fixture_rows would
+    removed = {
+        concert_key(values['venue_id'], values['date_time'], values['url'])
+        for model, values, m2m in fixture_rows(
+            {'model': 'concerts.concert',
+             'fields': {'venue': venue, 'date_time': date_time, 'url': url}}
+            for venue, date_time, url in removed
+        )
+    }
+
+    wanted = list(upserts.keys() | removed)
+    existing = {}
+    published = Concert.objects.published(generation)
+    for start in range(0, len(wanted), QUERY_CHUNK_SIZE):
+        urls = {key[2] for key in wanted[start:start + QUERY_CHUNK_SIZE]}
+        for concert in published.filter(url__in=urls):
+            key = concert_key(concert.venue_id, concert.date_time, concert.url)
+            existing.setdefault(key, []).append(concert)
+
+    removed_ids = [
+        concert.id for key in removed for concert in existing.get(key, ())
+    ]
+    for start in range(0, len(removed_ids), QUERY_CHUNK_SIZE):
+        concerts = Concert.objects.filter(id__in=removed_ids[start:start + QUERY_CHUNK_SIZE])
+        clear_matches(concerts=concerts)
+        concerts.delete()
+    counts['removed'] = len(removed_ids)
+
+    new_concerts = []
+    for key, values in upserts.items():
+        # date_scraped is written, just not compared
+        for name in ('id', 'generation', 'needs_matching'):
+            values.pop(name, None)
+        concerts = existing.get(key)
+        if not concerts:
+            new_concerts.append(Concert(generation=generation, needs_matching=True, **values))
+            continue
+        for concert in concerts:
+            rematch = (values.get('billing', concert.billing) != concert.billing or
+                       values.get('is_active', concert.is_active) != concert.is_active)
+            Concert.objects.filter(pk=concert.pk).update(
+                needs_matching=concert.needs_matching or rematch, **values
+            )
+        counts['changed'] += 1
+    raw_bulk_insert(Concert, new_concerts)
+    counts['added'] = len(new_concerts)
+    # new and changed concerts are the flagged ones
+    index_billings(published.filter(needs_matching=True))
+    return counts
+
+
+def apply_delta(path, generation=None):
+    """
+    Applies a delta in place, in one transaction: artists by pk, concerts
+    to the published generation (or `generation`).  Changed and new rows
+    are flagged needs_matching, and the concerts' billings tokenized; run
+    make_matches afterwards.
+
+    :returns: (<header dict>, <dict of 'added', 'changed', and 'removed'
+              counts>).
+    """
+
+    from .models import DataGeneration
+
+    header, operations = read_delta(path)
+    with transaction.atomic():
+        if header['fixture_type'] == 'artists':
+            counts = _apply_artists(operations)
+        elif header['fixture_type'] == 'concerts':
+            if generation is None:
+                generation = DataGeneration.load().published
+            counts = _apply_concerts(operations, generation)
+        else:
+            raise ValueError("Can't apply a {} delta".format(header['fixture_type']))
+    return header, counts
@@ -0,0 +1,396 @@
+"""
+concerts/fixture_io.py
+
+Bulk loading and export of the fixtures in concerts/fixtures, for the
+load_fixtures and export_fixtures management commands and the refresh_*
+commands.
+
+Fixtures come in two formats: dumpdata's JSON list (.json), and the
+compact format export_fixtures writes (.jsonl.gz), gzipped JSON Lines with
+one fixture object per line.  Both are read as a stream of the same
+objects, so every loader takes either.
+
+loaddata deserializes a whole fixture into memory, then saves each object
+on its own (an UPDATE, and an INSERT if that touched no row) and sends its
+pre/post_save signals.  load_fixtures reads the fixture a chunk at a time
+instead, and writes each model's objects in batches: one query for the
+rows already there, raw bulk INSERTs for the new ones, and an UPDATE only
+for rows whose fields differ.  Many-to-many links (Concert.artists) are
+diffed and bulk inserted the same way.  The result is the same as
+loaddata's, and no signals are sent (the concerts app has no receivers).
+
+As with loaddata, everything happens in one transaction, foreign keys are
+checked once at the end, and primary key sequences are reset.  Unlike it,
+load_fixtures can also prune: delete the rows of the fixtures' models that
+aren't in them, so a full fixture replaces a table as flush + loaddata did.
+"""
+
+from collections import OrderedDict
+import gzip
+import json
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+# stays within SQLite's limits on rows per INSERT and parameters per query
+BATCH_SIZE = 500
+READ_SIZE = 64 * 1024
+
+JSON_SUFFIX = '.json'
+JSONL_SUFFIX = '.jsonl.gz'
+FIXTURE_SUFFIXES = (JSON_SUFFIX, JSONL_SUFFIX)
+
+
+def iter_fixture(stream, read_size=READ_SIZE):
+    """
+    Yields the objects of a JSON fixture (a list of dicts, as written by
+    dumpdata) one at a time, reading stream read_size characters at a time.
+
+    :raises ValueError: If the stream isn't a JSON list of objects.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    started = False
+
+    while True:
+        # skip whitespace, the opening bracket and separators
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,[':
+            if buffer[pos] == '[':
+                if started:
+                    raise ValueError("Fixture objects must not be lists")
+                started = True
+            elif buffer[pos] == ',' and not started:
+                raise ValueError("Fixture must be a JSON list")
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+
+        try:
+            if pos == len(buffer) or not started:
+                raise ValueError("Need more input")
+            obj, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            more = stream.read(read_size)
+            if not more:
+                if buffer[pos:].strip() or started:
+                    raise ValueError("Truncated or malformed fixture")
+                return
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+
+        if not isinstance(obj, dict):
+            raise ValueError("Fixture objects must be JSON objects")
+        yield obj
+        if pos > read_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def read_fixture(path):
+    """
+    Yields the objects of a .json or .jsonl.gz fixture file one at a time.
+
+    :raises ValueError: If the file is malformed or of neither format.
+    """
+
+    if path.endswith(JSONL_SUFFIX):
+        with gzip.open(path, 'rt', encoding='utf-8') as fixture:
+            for line in fixture:
+                if line.strip():
+                    obj = json.loads(line)
+                    if not isinstance(obj, dict):
+                        raise ValueError("Fixture objects must be JSON objects")
+                    yield obj
+    elif path.endswith(JSON_SUFFIX):
+        with open(path, encoding='utf-8') as fixture:
+            yield from iter_fixture(fixture)
+    else:
+        raise ValueError("Unknown fixture format: {}".format(path))
+
+
+def fixture_rows(objects):
+    """
+    Yields (<model>, <dict of field attname: value>, <dict of m2m field:
+    list of related pks>) for each of a fixture's objects (eg. from
+    read_fixture), with values converted from their JSON form as loaddata
+    would.
+    """
+
+    for obj in objects:
+        model = apps.get_model(obj['model'])
+        values = {}
+        m2m = {}
+        for name, value in obj['fields'].items():
+            field = model._meta.get_field(name)
+            if field.many_to_many:
+                target_pk = field.remote_field.model._meta.pk
+                m2m[field] = [target_pk.to_python(pk) for pk in value]
+            elif field.is_relation:
+                values[field.attname] = (
+                    None if value is None else field.target_field.to_python(value)
+                )
+            else:
+                values[field.attname] = field.to_python(value)
+        if obj.get('pk') is not None:
+            values[model._meta.pk.attname] = model._meta.pk.to_python(obj['pk'])
+        yield model, values, m2m
+
+
+def raw_bulk_insert(model, objects, using=DEFAULT_DB_ALIAS):
+    """
+    Bulk inserts model instances as loaddata saves them: raw, so the values
+    are written as they are, including auto_now(_add) fields like
+    Concert.date_scraped, which bulk_create would overwrite.
+    """
+
+    if not objects:
+        return
+    connection = connections[using]
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field.primary_key and getattr(objects[0], field.attname) is None)
+    ]
+    manager = model._base_manager.using(using)
+    batch_size = max(connection.ops.bulk_batch_size(fields, objects), 1)
+    for start in range(0, len(objects), batch_size):
+        manager._insert(
+            objects[start:start + batch_size], fields=fields, using=using, raw=True
+        )
+
+
+class FixtureLoader:
+    """
+    Writes fixture rows to the DB a batch at a time; see load_fixtures.
+
+    `counts` maps each model label to a dict of 'added', 'updated', and
+    'unchanged' object counts, and `removed` each pruned model's label to
+    the number of objects prune deleted.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, batch_size=BATCH_SIZE):
+        self.using = using
+        self.batch_size = batch_size
+        self.models = set()
+        self.counts = OrderedDict()
+        self.removed = OrderedDict()
+        self._pending = OrderedDict()
+        self._pks = {}
+
+    def add(self, model, values, m2m):
+        if model._meta.pk.attname not in values:
+            raise ValueError("Fixture objects need a pk to be bulk loaded")
+        self._pks.setdefault(model, set()).add(values[model._meta.pk.attname])
+        batch = self._pending.setdefault(model, [])
+        batch.append((values, m2m))
+        if len(batch) >= self.batch_size:
+            self._write(model, batch)
+            batch.clear()
+
+    def flush(self):
+        for model, batch in self._pending.items():
+            if batch:
+                self._write(model, batch)
+                batch.clear()
+
+    def prune(self):
+        """
+        Deletes the objects of each model added so far that weren't added,
+        with the usual on_delete handling (many-to-many links go with them).
+        """
+
+        for model, pks in self._pks.items():
+            manager = model._base_manager.using(self.using)
+            stale = [pk for pk in manager.values_list('pk', flat=True) if pk not in pks]
+            removed = 0
+            for start in range(0, len(stale), self.batch_size):
+                deleted = manager.filter(pk__in=stale[start:start + self.batch_size]).delete()
+                removed += deleted[1].get(model._meta.label, 0)
+            self.removed[model._meta.label] = removed
+
+    def _write(self, model, batch):
+        self.models.add(model)
+        counts = self.counts.setdefault(
+            model._meta.label, {'added': 0, 'updated': 0, 'unchanged': 0}
+        )
+        pk_name = model._meta.pk.attname
+        manager = model._base_manager.using(self.using)
+        attnames = [field.attname for field in model._meta.concrete_fields]
+        existing = {
+            row[pk_name]: row
+            for row in manager.filter(pk__in=[values[pk_name] for values, m2m in batch])
+                              .values(*attnames)
+        }
+
+        new_objects = []
+        for values, m2m in batch:
+            current = existing.get(values[pk_name])
+            if current is None:
+                new_objects.append(model(**values))
+                counts['added'] += 1
+                continue
+            changed = {
+                name: value for name, value in values.items() if current[name] != value
+            }
+            if changed:
+                manager.filter(pk=values[pk_name]).update(**changed)
+                counts['updated'] += 1
+            else:
+                counts['unchanged'] += 1
+        raw_bulk_insert(model, new_objects, using=self.using)
+
+        m2m_fields = {field for values, m2m in batch for field in m2m}
+        for field in m2m_fields:
+            self._write_links(field, batch, pk_name)
+
+    def _write_links(self, field, batch, pk_name):
+        through = field.remote_field.through
+        source = through._meta.get_field(field.m2m_field_name()).attname
+        target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+        links = through._base_manager.using(self.using)
+
+        wanted = {
+            values[pk_name]: set(m2m[field])
+            for values, m2m in batch if field in m2m
+        }
+        current = {pk: set() for pk in wanted}
+        for source_pk, target_pk in links.filter(
+            **{source + '__in': list(wanted)}
+        ).values_list(source, target):
+            current[source_pk].add(target_pk)
+
+        stale = [pk for pk in wanted if current[pk] and current[pk] != wanted[pk]]
+        if stale:
+            links.filter(**{source + '__in': stale}).delete()
+        links.bulk_create(
+            [
+                through(**{source: pk, target: target_pk})
+                for pk, targets in wanted.items()
+                if targets != current[pk]
+                for target_pk in sorted(targets)
+            ],
+            batch_size=self.batch_size,
+        )
+
+
+def load_fixtures(paths, using=DEFAULT_DB_ALIAS, batch_size=BATCH_SIZE, prune=False):
+    """
+    Bulk loads fixtures, updating objects that already exist by pk.
+
+    :param paths: Fixture file paths, loaded in order.
+    :param bool prune: Also delete the objects of the fixtures' models that
+                       aren't in the fixtures.
+    :returns: The FixtureLoader, whose `counts` say what was written.
+    :raises ValueError: If a fixture is malformed or an object has no pk.
+    """
+
+    connection = connections[using]
+    loader = FixtureLoader(using=using, batch_size=batch_size)
+
+    with transaction.atomic(using=using):
+        with connection.constraint_checks_disabled():
+            for path in paths:
+                for model, values, m2m in fixture_rows(read_fixture(path)):
+                    loader.add(model, values, m2m)
+                loader.flush()
+        if prune:
+            loader.prune()
+
+        # checks were off while loading; as in loaddata, the fixture models'
+        # tables are checked
+        connection.check_constraints(
+            table_names=[model._meta.db_table for model in loader.models]
+        )
+
+        if any(counts['added'] for counts in loader.counts.values()):
+            sequence_sql = connection.ops.sequence_reset_sql(no_style(), loader.models)
+            with connection.cursor() as cursor:
+                for line in sequence_sql:
+                    cursor.execute(line)
+
+    return loader
+
+
+def export_rows(queryset, chunk_size=BATCH_SIZE):
+    """
+    Yields a queryset's objects as fixture dicts, in pk order, reading
+    chunk_size rows (and their many-to-many links) per query.
+    """
+
+    model = queryset.model
+    opts = model._meta
+    fields = [field for field in opts.concrete_fields if not field.primary_key]
+    m2m_fields = [
+        field for field in opts.many_to_many
+        if field.remote_field.through._meta.auto_created
+    ]
+    queryset = queryset.order_by('pk')
+    last_pk = None
+
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(
+            chunk.values_list('pk', *(field.attname for field in fields))[:chunk_size]
+        )
+        if not rows:
+            return
+        pks = [row[0] for row in rows]
+
+        links = {}
+        for field in m2m_fields:
+            through = field.remote_field.through
+            source = through._meta.get_field(field.m2m_field_name()).attname
+            target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+            field_links = links[field.name] = {pk: [] for pk in pks}
+            for source_pk, target_pk in (
+                through._base_manager.using(queryset.db)
+                .filter(**{source + '__in': pks})
+                .order_by(source, target)
+                .values_list(source, target)
+            ):
+                field_links[source_pk].append(target_pk)
+
+        for row in rows:
+            obj_fields = OrderedDict(
+                (field.name, value) for field, value in zip(fields, row[1:])
+            )
+            for name, field_links in links.items():
+                obj_fields[name] = field_links[row[0]]
+            yield OrderedDict((
+                ('model', opts.label_lower), ('pk', row[0]), ('fields', obj_fields)
+            ))
+        last_pk = pks[-1]
+
+
+def export_fixture(queryset, path, chunk_size=BATCH_SIZE):
+    """
+    Writes a queryset's objects to a .jsonl.gz fixture at path.
+
+    The file is written under a temporary name and moved into place once
+    complete, so readers never pick up a partial fixture.
+
+    :returns: The number of objects written.
+    """
+
+    directory = os.path.dirname(path)
+    handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(handle)
+    count = 0
+    try:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as fixture:
+            for obj in export_rows(queryset, chunk_size=chunk_size):
+                fixture.write(json.dumps(obj, cls=DjangoJSONEncoder, separators=(',', ':')))
+                fixture.write('\n')
+                count += 1
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return count
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# concerts/forms.py
+
+import datetime
+
+import pytz
+from django import forms
+from django.utils import timezone
+
+from .models import Venue
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+# the site shows times in Chicago (see base.html), so dates are taken as such
+LOCAL_TZ = pytz.timezone('America/Chicago')
+
+
+def local_midnight(date):
+    return LOCAL_TZ.localize(datetime.datetime.combine(date, datetime.time()))
+
+
+def make_cursor(concert):
+    """
+    Returns the keyset cursor for the page of concerts after this one:
+    its date_time (as microseconds since the epoch, to stay exact) and id.
+    """
+
+    delta = concert.date_time - EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 10**6 + delta.microseconds
+    return '{}.{}'.format(microseconds, concert.pk)
+
+
+def read_cursor(cursor):
+    """
+    Returns the (date_time, id) pair a cursor from make_cursor points after.
+
+    :raises ValueError: If cursor is malformed.
+    """
+
+    microseconds, concert_id = cursor.split('.')
+    date_time = EPOCH + datetime.timedelta(microseconds=int(microseconds))
+    return date_time, int(concert_id)
+
+
+class ConcertFilterForm(forms.Form):
+    """
+    Query string for ConcertsIndex: venue and date range filters, the
+    keyset cursor of the page to show, and whether to stream every row.
+    """
+
+    venue = forms.ModelChoiceField(
+        queryset=Venue.objects.filter(is_active=True).order_by('name'),
+        required=False,
+        empty_label='All venues',
+    )
+    start = forms.DateField(required=False, label='From')
+    end = forms.DateField(required=False, label='To')
+    after = forms.CharField(required=False, widget=forms.HiddenInput)
+    stream = forms.BooleanField(required=False, widget=forms.HiddenInput)
+
+    def clean_after(self):
+        after = self.cleaned_data['after']
+        if not after:
+            return None
+        try:
+            return read_cursor(after)
+        except (ValueError, OverflowError):
+            raise forms.ValidationError("Invalid page cursor")
+
+    def filter(self, concerts):
+        """Applies the venue and date range filters to a Concert queryset."""
+
+        if self.cleaned_data['venue']:
+            concerts = concerts.filter(venue=self.cleaned_data['venue'])
+        if self.cleaned_data['start']:
+            concerts = concerts.filter(
+                date_time__gte=local_midnight(self.cleaned_data['start'])
+            )
+        if self.cleaned_data['end']:
+            day_after = self.cleaned_data['end'] + datetime.timedelta(days=1)
+            concerts = concerts.filter(date_time__lt=local_midnight(day_after))
+        return concerts
+
+
+class SearchForm(forms.Form):
+    """Query string for Search and SearchJson: the query and page number."""
+
+    q = forms.CharField(required=False, max_length=200, label='Search')
+    page = forms.IntegerField(required=False, min_value=1, widget=forms.HiddenInput)
+
+    def clean_page(self):
+        return self.cleaned_data['page'] or 1
@@ -2,24 +2,73 @@
 management/commands/add_artists.py
 
 Add artist(s) to database.
+
+With --file, imports artist names in bulk, one per line, from a file (or
+stdin, for -) without asking for confirmation: the new names are inserted
+in one go, then given their regex and Spotify ID in batches (see
+concerts/artist_import.py).  --no-enrich leaves that for enrich_artists.
+
+New artists are exported to a fixture, along with the delta from the
+previous one (concerts/deltas.py), as refresh_dev does, so refresh_heroku
+can still apply the artist deltas in place.
 """
-from datetime import datetime
-import os, sys
+import logging
+import os
+import sys
 
 from django.core.management import call_command
 from django.core.management.base import BaseCommand, CommandError
 
-from concerts.models import Artist
-from concerts.utils import FIXTURE_DIRS
+from concerts.artist_import import import_artists, read_artist_names
+from concerts.deltas import snapshot, write_delta
+from concerts.models import Artist, DataGeneration
+from concerts.utils import get_latest_fixture
+
+
+logger = logging.getLogger('concerts.data_management')
+
 
 class Command(BaseCommand):
     help = 'Add artists to the Artist table.'
 
     def add_arguments(self, parser):
-        parser.add_argument('artists', nargs='+',
+        parser.add_argument('artists', nargs='*',
             help='Artist names to add, wrapped in double quotes if necessary')
+        parser.add_argument('--file',
+            default=None,
+            help='Import artist names from this file, one per line (- for stdin).'
+        )
+        parser.add_argument('--no-enrich',
+            action='store_true',
+            default=False,
+            help='With --file, leave regexes and Spotify IDs to enrich_artists.'
+        )
+
+    def export_artists(self):
+        # read the previous fixture before a same-day export replaces it
+        try:
+            base = snapshot('artists', get_latest_fixture('artists'))
+        except IndexError:
+            base = None
+            self.stdout.write("No previous artists fixture to diff against")
+        self.stdout.write("Exporting new Artist fixture...")
+        call_command('export_fixtures', 'artists', stdout=self.stdout)
+        if base is not None:
+            path, counts = write_delta('artists', base, get_latest_fixture('artists'))
+            self.stdout.write(
+                "Wrote artists delta {}: {added} added, {changed} changed, {removed} removed".format(
+                    os.path.basename(path), **counts
+                )
+            )
 
     def handle(self, **options):
+        if options['file'] is not None:
+            if options['artists']:
+                raise CommandError("Give artist names or --file, not both")
+            self.import_file(options)
+            return
+        if not options['artists']:
+            raise CommandError("Give artist names to add, or --file")
 
         # get manual confirmation that artists were entered correctly
         print("Artists to add:")
@@ -45,16 +94,33 @@ class Command(BaseCommand):
             added_new_artists = True
 
         if added_new_artists:
-            # TODO fixture rotation?
-            artist_fixture_name = datetime.utcnow().strftime('%Y%m%d') + '_artist.json'
-            artist_fixture_path = os.path.join(FIXTURE_DIRS['artists'], artist_fixture_name)
-            self.stdout.write("Dumping new Artist fixture: {}".format(artist_fixture_name))
-            call_command(
-                'dumpdata',
-                'concerts.Artist',
-                '--indent=4',
-                '--output={}'.format(artist_fixture_path)
-            )
+            DataGeneration.bump()
+            self.export_artists()
             self.stdout.write("Done!\n")
         else:
             self.stdout.write("No new artists added.\n")
+
+    def import_file(self, options):
+        try:
+            if options['file'] == '-':
+                added, skipped = import_artists(read_artist_names(sys.stdin))
+            else:
+                with open(options['file'], encoding='utf-8') as names:
+                    added, skipped = import_artists(read_artist_names(names))
+        except OSError as e:
+            raise CommandError("Can't read {}: {}".format(options['file'], e))
+
+        report = "Added {} new artists, skipped {} already known".format(len(added), skipped)
+        logger.info(report)
+        self.stdout.write(report)
+        if not added:
+            self.stdout.write("No new artists added.\n")
+            return
+
+        DataGeneration.bump()
+        if options['no_enrich']:
+            self.stdout.write("Run enrich_artists to finish adding them.")
+            return
+        call_command('enrich_artists', stdout=self.stdout)
+        self.export_artists()
+        self.stdout.write("Done!\n")
@@ -0,0 +1,89 @@
+"""
+concerts/management/commands/benchmark_fixtures.py
+
+Times loading the bundled fixtures (the latest venue, artist, and concert
+fixtures in concerts/fixtures) into empty tables with loaddata and with
+load_fixtures (concerts/fixture_io.py), and checks both load the same rows.
+
+Everything happens in one transaction that is rolled back at the end; the
+concerts tables are emptied while it runs, so point it at a dev database.
+"""
+
+import timeit
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from concerts.fixture_io import load_fixtures
+from concerts.models import Artist, Concert, ConcertMatch, Venue
+from concerts.utils import get_latest_fixture
+
+
+class Command(BaseCommand):
+    help = 'Compares loaddata and load_fixtures on the bundled fixtures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat',
+            type=int,
+            default=3,
+            help='Number of timed runs for each loader (best is reported)'
+        )
+
+    def _empty_tables(self):
+        ConcertMatch.objects.all().delete()
+        Concert.artists.through.objects.all().delete()
+        Concert.objects.all().delete()
+        Artist.objects.all().delete()
+        Venue.objects.all().delete()
+
+    def _snapshot(self):
+        return (
+            sorted(Venue.objects.values_list()),
+            sorted(Artist.objects.values_list()),
+            sorted(Concert.objects.values_list()),
+            sorted(Concert.artists.through.objects.values_list('concert_id', 'artist_id')),
+        )
+
+    def _time(self, load, repeat):
+        def run():
+            with transaction.atomic():
+                load()
+                transaction.set_rollback(True)
+
+        seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+        # load once more to keep the rows for comparison
+        with transaction.atomic():
+            load()
+            snapshot = self._snapshot()
+            transaction.set_rollback(True)
+        return seconds, snapshot
+
+    def handle(self, *args, **options):
+        paths = [get_latest_fixture(kind) for kind in ('venues', 'artists', 'concerts')]
+        for path in paths:
+            self.stdout.write("Fixture: {}".format(path))
+
+        with transaction.atomic():
+            self._empty_tables()
+            loaddata_time, loaddata_rows = self._time(
+                lambda: call_command('loaddata', *paths, verbosity=0),
+                options['repeat'],
+            )
+            bulk_time, bulk_rows = self._time(
+                lambda: load_fixtures(paths), options['repeat']
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write("  {:<16} {:8.1f} ms".format('loaddata', loaddata_time * 1000))
+        self.stdout.write("  {:<16} {:8.1f} ms ({:.1f}x)".format(
+            'load_fixtures', bulk_time * 1000, loaddata_time / bulk_time
+        ))
+        if bulk_rows != loaddata_rows:
+            self.stderr.write("The loaders wrote different rows!")
+        else:
+            self.stdout.write(
+                "Both loaders wrote the same {} venues, {} artists, {} concerts "
+                "and {} concert-artist links".format(*map(len, bulk_rows))
+            )
+        self.stdout.write("Rolled back the loaded data")
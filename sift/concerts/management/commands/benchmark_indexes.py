@@ -0,0 +1,159 @@
+"""
+concerts/management/commands/benchmark_indexes.py
+
+Seeds a large synthetic set of artists and concerts, then reports the query
+plan and best time of the site's main queries without and with the indexes
+from concerts/db_indexes.py.
+
+Everything, including the seeded rows and the dropped and recreated
+indexes, happens in one transaction that is rolled back at the end.  The
+indexes are dropped while it runs, so point it at a dev database.
+"""
+
+import datetime
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from concerts.db_indexes import create_indexes, drop_indexes
+from concerts.models import Artist, Concert, Venue
+
+# stays within SQLite's limit on rows per INSERT
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Compares query plans and timings with and without the concerts indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concerts',
+            type=int,
+            default=100000,
+            help='Number of synthetic concerts to seed (default 100000)'
+        )
+        parser.add_argument('--artists',
+            type=int,
+            default=10000,
+            help='Number of synthetic artists to seed (default 10000)'
+        )
+        parser.add_argument('--repeat',
+            type=int,
+            default=5,
+            help='Number of timed runs for each query (best is reported)'
+        )
+
+    def _seed(self, concert_count, artist_count):
+        rand = random.Random(0)
+        start = timezone.now()
+
+        venues = [
+            Venue.objects.create(
+                name='Benchmark Venue {}'.format(n), address='', schedule_url=''
+            )
+            for n in range(10)
+        ]
+        Artist.objects.bulk_create(
+            [
+                Artist(
+                    name='Benchmark Artist {}'.format(n),
+                    re_string=r'\bBenchmark Artist {}\b'.format(n),
+                    is_active=rand.random() < 0.9,
+                    needs_matching=rand.random() < 0.01,
+                )
+                for n in range(artist_count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        Concert.objects.bulk_create(
+            [
+                Concert(
+                    billing='Benchmark Artist {}'.format(rand.randrange(artist_count)),
+                    venue=rand.choice(venues),
+                    date_time=start + datetime.timedelta(minutes=rand.randrange(2 * 525600)),
+                    price='$10',
+                    url='http://example.com/{}'.format(n),
+                    is_active=rand.random() < 0.9,
+                    needs_matching=rand.random() < 0.01,
+                )
+                for n in range(concert_count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return venues[0], start + datetime.timedelta(days=365), artist_count // 2
+
+    def _queries(self, venue, middle, artist_number):
+        by_date = Concert.objects.select_related('venue').order_by('date_time', 'id')
+        return [
+            ("concerts by date, first page", by_date[:100]),
+            ("concerts by date, keyset page", by_date.filter(
+                Q(date_time__gt=middle) | Q(date_time=middle, id__gt=0)
+            )[:100]),
+            ("one venue, date range", by_date.filter(
+                venue=venue,
+                date_time__gte=middle,
+                date_time__lt=middle + datetime.timedelta(days=30),
+            )[:100]),
+            ("active concerts by date", Concert.objects.filter(
+                is_active=True
+            ).order_by('date_time', 'id')[:100]),
+            ("latest date_scraped", Concert.objects.order_by(
+                '-date_scraped'
+            ).values_list('date_scraped')[:1]),
+            ("concerts needing matching", Concert.objects.filter(
+                is_active=True, needs_matching=True
+            ).values_list('id', 'billing')),
+            ("active artists by name", Artist.objects.filter(
+                is_active=True
+            ).order_by('name')),
+            ("artists needing matching", Artist.objects.filter(
+                is_active=True, needs_matching=True
+            ).values_list('id', 're_string')),
+            ("artist name__iexact", Artist.objects.filter(
+                name__iexact='benchmark artist {}'.format(artist_number)
+            )),
+        ]
+
+    def _explain(self, cursor, sql, params):
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        else:
+            cursor.execute('EXPLAIN ' + sql, params)
+        # the plan text is the last column on both
+        return [row[-1] for row in cursor.fetchall()]
+
+    def _report(self, queries, repeat):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            for label, queryset in queries:
+                sql, params = queryset.query.sql_with_params()
+
+                def run():
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+
+                seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+                self.stdout.write("  {:<32} {:8.2f} ms".format(label, seconds * 1000))
+                for line in self._explain(cursor, sql, params):
+                    self.stdout.write("      {}".format(line))
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write("Seeding {} concerts and {} artists...".format(
+                options['concerts'], options['artists']
+            ))
+            queries = self._queries(*self._seed(options['concerts'], options['artists']))
+
+            self.stdout.write("Without indexes:")
+            drop_indexes(connection)
+            self._report(queries, options['repeat'])
+
+            self.stdout.write("With indexes:")
+            create_indexes(connection)
+            self._report(queries, options['repeat'])
+
+            transaction.set_rollback(True)
+        self.stdout.write("Rolled back the seeded data")
@@ -0,0 +1,86 @@
+"""
+concerts/management/commands/benchmark_matching.py
+
+Times the single-pass ArtistMatcher against the original artist-by-concert
+nested regex loop, using the latest artist and concert fixtures.  Reads the
+fixture files directly, so no database access is needed.
+
+Also times unpickling the matcher, as load_matcher does when the artists
+haven't changed since it was saved.
+"""
+
+import pickle
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from concerts.fixture_io import read_fixture
+from concerts.matching import ArtistMatcher, nested_loop_matches
+from concerts.utils import get_latest_fixture
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks ArtistMatcher against the nested regex loop on fixture data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat',
+            type=int,
+            default=5,
+            help='Number of timed runs for each matching strategy (best is reported)'
+        )
+
+    def _load_pairs(self, fixture_type, field):
+        try:
+            fixture_path = get_latest_fixture(fixture_type)
+        except IndexError:
+            raise CommandError("No {} fixture found".format(fixture_type))
+
+        pairs = [
+            (obj['pk'], obj['fields'][field]) for obj in read_fixture(fixture_path)
+            if obj['fields'].get('is_active', True)
+        ]
+        self.stdout.write("{}: {} rows".format(fixture_path, len(pairs)))
+        return pairs
+
+    def handle(self, *args, **options):
+        artist_pairs = self._load_pairs('artists', 're_string')
+        concert_pairs = self._load_pairs('concerts', 'billing')
+        repeat = options['repeat']
+
+        expected = nested_loop_matches(artist_pairs, concert_pairs)
+        matcher = ArtistMatcher(artist_pairs)
+        found = matcher.match_all(concert_pairs)
+        if set(found) != set(expected):
+            raise CommandError(
+                "ArtistMatcher disagrees with the nested loop: "
+                "missing {}, extra {}".format(
+                    sorted(set(expected) - set(found)),
+                    sorted(set(found) - set(expected)),
+                )
+            )
+        self.stdout.write("Both strategies found {} matches".format(len(found)))
+
+        nested_time = min(timeit.repeat(
+            lambda: nested_loop_matches(artist_pairs, concert_pairs),
+            number=1, repeat=repeat,
+        ))
+        cold_time = min(timeit.repeat(
+            lambda: ArtistMatcher(artist_pairs).match_all(concert_pairs),
+            number=1, repeat=repeat,
+        ))
+        pickled = pickle.dumps(matcher, protocol=pickle.HIGHEST_PROTOCOL)
+        load_time = min(timeit.repeat(
+            lambda: pickle.loads(pickled),
+            number=1, repeat=repeat,
+        ))
+        scan_time = min(timeit.repeat(
+            lambda: matcher.match_all(concert_pairs),
+            number=1, repeat=repeat,
+        ))
+
+        self.stdout.write("nested loop:       {:8.2f} ms".format(nested_time * 1000))
+        self.stdout.write("matcher (cold):    {:8.2f} ms".format(cold_time * 1000))
+        self.stdout.write("matcher (load):    {:8.2f} ms ({} KB pickled)".format(
+            load_time * 1000, len(pickled) // 1024))
+        self.stdout.write("matcher (scan):    {:8.2f} ms".format(scan_time * 1000))
+        self.stdout.write("speedup (cold):    {:8.1f}x".format(nested_time / cold_time))
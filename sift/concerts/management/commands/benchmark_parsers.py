@@ -0,0 +1,91 @@
+"""
+concerts/management/commands/benchmark_parsers.py
+
+Times each scraper's make_shows on its cached schedule page (see
+scrapers.cache) with each BeautifulSoup tree builder, with and without the
+scraper's parse_only SoupStrainer.  Every combination must produce the same
+ShowTuples as a full 'html.parser' parse.  Needs a cached page per venue,
+eg. from a previous scrape_shows run; no network or database access.
+"""
+
+import timeit
+
+from bs4 import BeautifulSoup, FeatureNotFound
+from django.core.management.base import BaseCommand, CommandError
+
+from concerts.scrapers import cache
+from concerts.utils import SCRAPERS
+
+PARSERS = ('html.parser', 'lxml')
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the BeautifulSoup parser backends on cached venue pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat',
+            type=int,
+            default=3,
+            help='Number of timed runs for each parser (best is reported)'
+        )
+
+    def _make_shows(self, scraper_class, html, parser, strained):
+        scraper = scraper_class()
+        scraper.parser = parser
+        if not strained:
+            scraper.parse_only = None
+        scraper.make_shows(html)
+        return scraper.shows
+
+    def handle(self, *args, **options):
+        parsers = []
+        for parser in PARSERS:
+            try:
+                BeautifulSoup('', parser)
+            except FeatureNotFound:
+                self.stdout.write("{} is not installed, skipping".format(parser))
+                continue
+            parsers.append(parser)
+
+        totals = {}
+        for venue_id, scraper_class in sorted(SCRAPERS.items()):
+            try:
+                html = cache.get(scraper_class().cache_key)
+            except cache.CacheMiss as e:
+                self.stdout.write("{}, skipping".format(e))
+                continue
+
+            expected = self._make_shows(scraper_class, html, 'html.parser', strained=False)
+            self.stdout.write("{} ({} KB, {} shows)".format(
+                scraper_class.__name__, len(html) // 1024, len(expected)
+            ))
+
+            for parser in parsers:
+                for strained in (False, True):
+                    label = "{}{}".format(parser, " + strainer" if strained else "")
+                    shows = self._make_shows(scraper_class, html, parser, strained)
+                    if shows != expected:
+                        raise CommandError(
+                            "{} with {} disagrees with html.parser: "
+                            "missing {}, extra {}".format(
+                                scraper_class.__name__, label,
+                                [show for show in expected if show not in shows],
+                                [show for show in shows if show not in expected],
+                            )
+                        )
+                    seconds = min(timeit.repeat(
+                        lambda: self._make_shows(scraper_class, html, parser, strained),
+                        number=1, repeat=options['repeat'],
+                    ))
+                    totals[label] = totals.get(label, 0) + seconds
+                    self.stdout.write("  {:<24} {:8.2f} ms".format(label, seconds * 1000))
+
+        if not totals:
+            raise CommandError("No cached venue pages; run scrape_shows first")
+
+        baseline = totals['html.parser']
+        self.stdout.write("All venues:")
+        for label, seconds in totals.items():
+            self.stdout.write("  {:<24} {:8.2f} ms ({:.1f}x)".format(
+                label, seconds * 1000, baseline / seconds
+            ))
@@ -0,0 +1,136 @@
+"""
+concerts/management/commands/benchmark_search.py
+
+Seeds a large synthetic set of artists and concerts, with billings made
+of several made-up band names each, and reports the best time of a range
+of searches through concerts.search, against a target of TARGET_MS.
+
+Everything happens in one transaction that is rolled back at the end, so
+the seeded rows never stick; still, point it at a dev database.
+"""
+
+import datetime
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from concerts.billing import index_billings
+from concerts.db_indexes import SEARCH_INDEXES, create_indexes
+from concerts.models import Artist, Concert, DataGeneration, Venue
+from concerts.search import search
+
+# stays within SQLite's limit on rows per INSERT
+BATCH_SIZE = 500
+TARGET_MS = 50
+
+SYLLABLES = (
+    'ba', 'ko', 'ri', 'zen', 'mo', 'tha', 'lu', 'vex', 'dra', 'ni', 'sol', 'que',
+    'pa', 'gro', 'fi', 'shu', 'wen', 'ta', 'xo', 'mel',
+)
+
+
+class Command(BaseCommand):
+    help = 'Times concert and artist searches on a large synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concerts',
+            type=int,
+            default=100000,
+            help='Number of synthetic concerts to seed (default 100000)'
+        )
+        parser.add_argument('--artists',
+            type=int,
+            default=10000,
+            help='Number of synthetic artists to seed (default 10000)'
+        )
+        parser.add_argument('--repeat',
+            type=int,
+            default=5,
+            help='Number of timed runs for each search (best is reported)'
+        )
+
+    def _word(self, rand):
+        return ''.join(rand.choice(SYLLABLES) for _ in range(rand.randint(2, 3)))
+
+    def _seed(self, concert_count, artist_count):
+        rand = random.Random(0)
+        start = timezone.now()
+
+        venues = [
+            Venue.objects.create(
+                name='Benchmark Hall {}'.format(n), address='', schedule_url=''
+            )
+            for n in range(10)
+        ]
+        names = sorted({
+            ' '.join(self._word(rand).title() for _ in range(rand.randint(1, 3)))
+            for n in range(artist_count)
+        })
+        Artist.objects.bulk_create(
+            [Artist(name=name, re_string=name) for name in names],
+            batch_size=BATCH_SIZE,
+        )
+        generation = DataGeneration.load().published
+        Concert.objects.bulk_create(
+            [
+                Concert(
+                    billing=' with '.join(rand.sample(names, rand.randint(1, 4))),
+                    venue=rand.choice(venues),
+                    date_time=start + datetime.timedelta(minutes=rand.randrange(2 * 525600)),
+                    price='$10',
+                    url='http://example.com/{}'.format(n),
+                    is_active=rand.random() < 0.9,
+                    generation=generation,
+                )
+                for n in range(concert_count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        index_billings(Concert.objects.filter(generation=generation))
+        return generation, rand.choice(names), venues[3].name
+
+    def _searches(self, name, venue_name):
+        words = name.lower().split()
+        return [
+            ("artist name", name, 1),
+            ("word prefix", words[0][:4], 1),
+            ("prefix, page 5", words[0][:4], 5),
+            ("two words", '{} {}'.format(words[0], venue_name.split()[-1]), 1),
+            ("venue name", venue_name, 1),
+            ("common syllable", SYLLABLES[0], 1),
+            ("no match", 'zzzzzz', 1),
+        ]
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write("Seeding {} concerts and {} artists...".format(
+                options['concerts'], options['artists']
+            ))
+            generation, name, venue_name = self._seed(options['concerts'], options['artists'])
+            create_indexes(connection)
+            create_indexes(connection, indexes=SEARCH_INDEXES)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            self.stdout.write("{} searches, target {} ms:".format(connection.vendor, TARGET_MS))
+            slowest = 0
+            for label, query, page in self._searches(name, venue_name):
+                results = search(query, generation=generation, page=page)
+                seconds = min(timeit.repeat(
+                    lambda: search(query, generation=generation, page=page),
+                    number=1, repeat=options['repeat'],
+                ))
+                slowest = max(slowest, seconds)
+                self.stdout.write("  {:<18} {:<28} {:8.2f} ms  ({} concerts{}, {} artists)".format(
+                    label, repr(query), seconds * 1000, len(results.concerts),
+                    '+' if results.has_next else '', len(results.artists),
+                ))
+            self.stdout.write("Slowest: {:.2f} ms ({})".format(
+                slowest * 1000, 'OK' if slowest * 1000 < TARGET_MS else 'over target'
+            ))
+
+            transaction.set_rollback(True)
+        self.stdout.write("Rolled back the seeded data")
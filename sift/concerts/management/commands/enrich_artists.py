@@ -0,0 +1,79 @@
+"""
+concerts/management/commands/enrich_artists.py
+
+Gives the artists add_artists --file imported their regex and Spotify ID,
+a batch at a time (see concerts/artist_import.py).  Without a
+SPOTIFY_TOKEN, or with --skip-spotify, only the regexes are made;
+get_spotify_artist_ids can fill in the IDs later.
+
+Enriched artists are flagged needs_matching, so the next make_matches run
+looks for them in the concert billings.
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from concerts.artist_import import ENRICH_BATCH_SIZE, enrich_artists
+from concerts.models import DataGeneration
+from concerts.spotify import MAX_WORKERS, RATE, SpotifyError, SpotifyResolver
+
+
+logger = logging.getLogger('concerts.data_management')
+
+
+class Command(BaseCommand):
+    help = 'Makes regexes and looks up Spotify IDs for newly imported artists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size',
+            type=int,
+            default=ENRICH_BATCH_SIZE,
+            help='Artists enriched per batch (default {}).'.format(ENRICH_BATCH_SIZE)
+        )
+        parser.add_argument('--skip-spotify',
+            action='store_true',
+            default=False,
+            help="Only make the regexes; don't look up Spotify IDs."
+        )
+        parser.add_argument('--workers',
+            type=int,
+            default=MAX_WORKERS,
+            help='Number of Spotify searches in flight at once (default {}).'.format(
+                MAX_WORKERS)
+        )
+        parser.add_argument('--rate',
+            type=float,
+            default=RATE,
+            help='Most Spotify searches per second (default {}).'.format(RATE)
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if options['workers'] < 1 or options['rate'] <= 0:
+            raise CommandError("--workers must be at least 1 and --rate above 0")
+
+        resolver = None
+        if not options['skip_spotify']:
+            try:
+                resolver = SpotifyResolver(
+                    rate=options['rate'],
+                    burst=max(1, int(options['rate'])),
+                    max_workers=options['workers'],
+                )
+            except SpotifyError as e:
+                logger.warning("{}; skipping Spotify IDs".format(e))
+                self.stdout.write("{}; skipping Spotify IDs".format(e))
+
+        start = time.time()
+        counts = enrich_artists(resolver=resolver, batch_size=options['batch_size'])
+        if counts['enriched']:
+            DataGeneration.bump()
+
+        report = "Enriched {} artists ({} Spotify IDs found) in {:.1f}s".format(
+            counts['enriched'], counts['spotify_ids'], time.time() - start
+        )
+        logger.info(report)
+        self.stdout.write(report)
@@ -0,0 +1,75 @@
+"""
+concerts/management/commands/export_fixtures.py
+
+Exports Artist, Venue, and (published) Concert rows to compact fixtures:
+gzipped JSON Lines, written a chunk of rows at a time, named
+<YYYYMMDD>_<type>.jsonl.gz in the type's concerts/fixtures directory (see
+concerts/fixture_io.py).  get_latest_fixture picks the newest, and
+load_fixtures and the refresh_* commands read them like the .json ones.
+
+Only the --keep most recent fixtures of each exported type are kept.
+"""
+
+import logging
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from concerts.fixture_io import BATCH_SIZE, export_fixture
+from concerts.models import Artist, Concert, Venue
+from concerts.utils import KEEP_FIXTURES, new_fixture_path, rotate_fixtures
+
+
+logger = logging.getLogger('concerts.data_management')
+
+FIXTURE_QUERYSETS = {
+    'artists': lambda: Artist.objects.all(),
+    'concerts': lambda: Concert.objects.published(),
+    'venues': lambda: Venue.objects.all(),
+}
+
+
+class Command(BaseCommand):
+    help = 'Exports artists, venues, and concerts to compact fixtures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixture_types', nargs='*',
+            metavar='TYPE',
+            help='Fixture types to export: artists, concerts, venues (default all)'
+        )
+        parser.add_argument('--keep',
+            type=int,
+            default=KEEP_FIXTURES,
+            help='Number of fixtures of each type to keep (default {}).'.format(KEEP_FIXTURES)
+        )
+        parser.add_argument('--chunk-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Rows read per query (default {}).'.format(BATCH_SIZE)
+        )
+
+    def handle(self, *args, **options):
+        fixture_types = options['fixture_types'] or sorted(FIXTURE_QUERYSETS)
+        unknown = set(fixture_types) - set(FIXTURE_QUERYSETS)
+        if unknown:
+            raise CommandError("Unknown fixture types: {}".format(', '.join(sorted(unknown))))
+        if options['keep'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("--keep and --chunk-size must be at least 1")
+
+        for fixture_type in fixture_types:
+            start = time.time()
+            path = new_fixture_path(fixture_type)
+            count = export_fixture(
+                FIXTURE_QUERYSETS[fixture_type](), path, chunk_size=options['chunk_size']
+            )
+            report = "Exported {} {} to {} ({} bytes, {:.2f}s)".format(
+                count, fixture_type, os.path.basename(path),
+                os.path.getsize(path), time.time() - start
+            )
+            logger.info(report)
+            self.stdout.write(report)
+
+            for removed in rotate_fixtures(fixture_type, keep=options['keep']):
+                logger.info("Removed old fixture {}".format(removed))
+                self.stdout.write("Removed old fixture {}".format(os.path.basename(removed)))
@@ -3,50 +3,74 @@ concerts/management/commands/get_spotify_artist_ids.py
 
 For Artist entries without a spotify_id, queries the Spotify API for
 artist ID and saves it to the DB.
+
+Names are resolved by concerts.spotify.SpotifyResolver: a few at a time
+(--workers), rate limited (--rate requests per second), and cached on disk,
+so names looked up before, found or not, cost no request.  The IDs found
+are saved in one transaction, and the DataGeneration bumped once, since the
+cached pages link to the artists on Spotify.
 """
 
 import logging
 import time
-from random import randint
 
 from django.core.management.base import BaseCommand, CommandError
-from django.utils.http import urlencode
-
-import requests
+from django.db import transaction
 
-from concerts.models import Artist
+from concerts.models import Artist, DataGeneration
+from concerts.spotify import MAX_WORKERS, RATE, SpotifyError, SpotifyResolver
 
 
 logger = logging.getLogger('concerts.data_management')
 
-SPOTIFY_SEARCH_BASE = 'https://api.spotify.com/v1/search?'
-
 
 class Command(BaseCommand):
     help = 'Attempt to save the Spotify Artist URI to the Artist model'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers',
+            type=int,
+            default=MAX_WORKERS,
+            help='Number of searches in flight at once (default {}).'.format(MAX_WORKERS)
+        )
+        parser.add_argument('--rate',
+            type=float,
+            default=RATE,
+            help='Most searches per second (default {}).'.format(RATE)
+        )
+
     def handle(self, *args, **options):
+        if options['workers'] < 1 or options['rate'] <= 0:
+            raise CommandError("--workers must be at least 1 and --rate above 0")
+        try:
+            resolver = SpotifyResolver(
+                rate=options['rate'],
+                burst=max(1, int(options['rate'])),
+                max_workers=options['workers'],
+            )
+        except SpotifyError as e:
+            raise CommandError(str(e))
+
+        start = time.time()
+        artists = list(
+            Artist.objects.filter(is_active=True, spotify_id='').values_list('id', 'name')
+        )
+        spotify_ids = resolver.resolve_many(name for artist_id, name in artists)
+
+        found = 0
+        with transaction.atomic():
+            for artist_id, name in artists:
+                if spotify_ids.get(name):
+                    Artist.objects.filter(pk=artist_id).update(spotify_id=spotify_ids[name])
+                    found += 1
+            if found:
+                DataGeneration.bump()
 
-        for artist in Artist.objects.filter(is_active=True, spotify_id=''):
-
-            # searching quoted artist name seems to give more accurate
-            # first result; eg. Boris vs. "Boris"
-            quoted_name = '\"' + artist.name + '\"'
-            query_str = urlencode([('q', quoted_name), ('type', 'artist')])
-            response = requests.get(SPOTIFY_SEARCH_BASE + query_str)
-            response.raise_for_status()
-
-            # use the artist regex algo on returned artist names to compare
-            # to target? etc.
-
-            if response.status_code == 200:
-                time.sleep(randint(3,6))
-                try:
-                    artist_id = response.json()['artists']['items'][0]['id']
-                    artist.spotify_id = artist_id
-                    artist.save()
-                except IndexError:
-                    continue
-            else:
-                self.stdout.write(response.status_code + " - " + response.text)
-                logger.debug(response.status_code + " - " + response.text)
+        report = "Found Spotify IDs for {} of {} artists ({} not found, {} failed) in {:.1f}s".format(
+            found, len(artists),
+            sum(1 for spotify_id in spotify_ids.values() if not spotify_id),
+            len({name for artist_id, name in artists} - spotify_ids.keys()),
+            time.time() - start,
+        )
+        logger.info(report)
+        self.stdout.write(report)
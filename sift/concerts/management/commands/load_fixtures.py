@@ -0,0 +1,70 @@
+"""
+concerts/management/commands/load_fixtures.py
+
+Bulk loads JSON fixtures (dumpdata's format) into the DB, a much faster
+stand-in for loaddata on the concerts fixtures; see concerts/fixture_io.py.
+
+Objects are matched to existing rows by pk: new ones are inserted, changed
+ones updated, and unchanged ones left alone, so it can load over a live DB.
+With --prune, the rows of the fixtures' models that aren't in them are
+deleted too, as flush + loaddata would have dropped them; matches left
+without artists go with them.  Bumps the DataGeneration if anything changed, so cached pages are
+re-rendered.
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from concerts.fixture_io import load_fixtures
+from concerts.models import ConcertMatch, DataGeneration
+
+
+logger = logging.getLogger('concerts.data_management')
+
+
+class Command(BaseCommand):
+    help = 'Bulk loads JSON fixtures, updating existing objects in place'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', nargs='+',
+            help='Paths of the fixture files to load, in order'
+        )
+        parser.add_argument('--prune',
+            action='store_true',
+            default=False,
+            help="Delete objects of the fixtures' models that aren't in the fixtures."
+        )
+
+    def handle(self, *args, **options):
+        start = time.time()
+        try:
+            with transaction.atomic():
+                loader = load_fixtures(options['fixtures'], prune=options['prune'])
+                if any(loader.removed.values()):
+                    ConcertMatch.objects.filter(artists__isnull=True).delete()
+        except (IOError, ValueError, LookupError) as e:
+            raise CommandError("Problem loading fixtures: {}".format(e))
+
+        for label, counts in loader.counts.items():
+            report = "{}: {added} added, {updated} updated, {unchanged} unchanged".format(
+                label, **counts
+            )
+            logger.info(report)
+            self.stdout.write(report)
+        for label, removed in loader.removed.items():
+            report = "{}: {} removed".format(label, removed)
+            logger.info(report)
+            self.stdout.write(report)
+
+        if (any(counts['added'] or counts['updated'] for counts in loader.counts.values()) or
+                any(loader.removed.values())):
+            DataGeneration.bump()
+
+        report = "Loaded {} fixtures in {:.2f}s".format(
+            len(options['fixtures']), time.time() - start
+        )
+        logger.info(report)
+        self.stdout.write(report)
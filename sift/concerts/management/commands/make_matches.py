@@ -4,13 +4,36 @@ concerts/management/commands/make_matches.py
 Uses the Artist.re_string to search for the artist in the
 concert lineup (Concert.billing).  If a match is found, saves a
 ConcertMatch object for lookup later.
+
+All artist patterns are searched in a single pass over each billing
+(concerts.matching.ArtistMatcher), and the matches are written in bulk in
+one transaction (concerts.matching.save_matches).  The matcher for every
+active artist is loaded from its saved copy unless the artists changed
+(concerts.matching.load_matcher).
+
+By default only new or changed concerts and artists (needs_matching=True)
+are re-evaluated: flagged concerts against every active artist, and flagged
+artists against every other active concert.  Flagged artists that were
+deactivated just have their matches dropped.  --full rescans everything.
+
+--strategy index matches by joining normalized artist names against the
+billing tokens written at scrape time (concerts.billing) instead: an
+artist only matches an act billed under exactly its name.
+
+Matches the published generation of concerts (see DataGeneration), or with
+--generation, a staging generation that a refresh is building.  Bumps the
+DataGeneration when the published concerts change, so cached pages are
+re-rendered with the matches.
 """
 
-import re
 import logging
 
-from django.core.management.base import BaseCommand, CommandError
-from concerts.models import Artist, Concert, ConcertMatch, Venue
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from concerts.billing import index_billings, index_matches, normalize_artists
+from concerts.matching import ArtistMatcher, clear_matches, load_matcher, save_matches
+from concerts.models import Artist, BillingToken, Concert, DataGeneration
 
 
 logger = logging.getLogger('concerts.data_management')
@@ -19,38 +42,99 @@ logger = logging.getLogger('concerts.data_management')
 class Command(BaseCommand):
     help = 'Looks for tracked artists in the concert billings and saves matches'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--full',
+            action='store_true',
+            default=False,
+            help='Rescan every active concert against every active artist.'
+        )
+        parser.add_argument('--generation',
+            type=int,
+            default=None,
+            help='Match this generation of concerts (default: the published one).'
+        )
+        parser.add_argument('--strategy',
+            choices=('regex', 'index'),
+            default='regex',
+            help='Match with the artist regexes (default), or by joining normalized '
+                 'artist names against the billing tokens.'
+        )
+
     def handle(self, *args, **options):
-        artist_pairs = list(Artist.objects.filter(is_active=True).values_list('id', 're_string'))
-        concert_pairs = list(Concert.objects.filter(is_active=True).values_list('id', 'billing'))
-        match_count = 0
-
-        for artist_id, regex_string in artist_pairs:
-            artist_regex = re.compile(
-                r'{}'.format(regex_string),
-                flags=re.IGNORECASE|re.MULTILINE|re.DOTALL,
+        published = DataGeneration.load().published
+        generation = options['generation']
+        if generation is None:
+            generation = published
+        concerts = Concert.objects.published(generation).filter(is_active=True)
+        artists = Artist.objects.filter(is_active=True)
+
+        if options['full']:
+            dirty_concerts = concerts
+            dirty_artists = artists.none()
+        else:
+            dirty_concerts = concerts.filter(needs_matching=True)
+            dirty_artists = artists.filter(needs_matching=True)
+        # deactivated since the last run: only their matches are dropped
+        dropped_artists = Artist.objects.filter(is_active=False, needs_matching=True)
+
+        dirty_artist_pairs = list(dirty_artists.values_list('id', 're_string'))
+        matches = []
+
+        if options['strategy'] == 'index':
+            # tokens are normally written along with the concerts; --full
+            # rewrites them all, and every artist's normalized name
+            index_billings(
+                dirty_concerts if options['full']
+                else dirty_concerts.filter(billingtoken=None)
+            )
+            normalize_artists(artists, refresh=options['full'])
+            # the same concerts as above, joined through the tokens
+            tokens = BillingToken.objects.filter(
+                concert__generation=generation, concert__is_active=True
             )
+            dirty_tokens = tokens if options['full'] else tokens.filter(
+                concert__needs_matching=True
+            )
+            matches += index_matches(dirty_tokens, artists)
+            if dirty_artist_pairs:
+                matches += index_matches(
+                    tokens.filter(concert__needs_matching=False), dirty_artists
+                )
+
+        else:
+            if dirty_concerts.exists():
+                matcher = load_matcher()
+                matches += matcher.match_all(dirty_concerts.values_list('id', 'billing'))
 
-            for concert_id, concert_billing in concert_pairs:
-                if artist_regex.search(concert_billing):
-                    concert_matched = Concert.objects.get(id=concert_id)
-                    artist_matched = Artist.objects.get(id=artist_id)
-                    logger.info(
-                        "Matched artist {} and concert {}".format(
-                            artist_matched, concert_matched
-                        )
-                    )
-                    # check for existing concertmatch
-                    # TODO but hacky? --review models--
-
-                    match, created = ConcertMatch.objects.get_or_create(
-                        concert=concert_matched
-                    )
-
-                    concert_matched.artists.add(artist_matched)
-                    concert_matched.save()
-                    match.artists.add(artist_matched)
-                    match.save()
-                    match_count += 1
+            if dirty_artist_pairs:
+                # flagged concerts were already checked against every artist
+                matcher = ArtistMatcher(dirty_artist_pairs)
+                matches += matcher.match_all(
+                    concerts.filter(needs_matching=False).values_list('id', 'billing')
+                )
+
+        logger.info("Re-evaluated {} concerts and {} artists".format(
+            dirty_concerts.count(), len(dirty_artist_pairs))
+        )
+
+        for concert_id, artist_id in matches:
+            logger.debug("Matched artist {} and concert {}".format(artist_id, concert_id))
+
+        with transaction.atomic():
+            clear_matches(
+                concerts=dirty_concerts,
+                artists=dirty_artists | dropped_artists,
+                within=Concert.objects.published(generation),
+            )
+            match_count = save_matches(matches)
+            if options['full']:
+                dirty_concerts = concerts.filter(needs_matching=True)
+                dirty_artists = artists.filter(needs_matching=True)
+            dirty_concerts.update(needs_matching=False)
+            dirty_artists.update(needs_matching=False)
+            dropped_artists.update(needs_matching=False)
+            if generation == published:
+                DataGeneration.bump()
 
         logger.info("Saved {} matches".format(match_count))
 
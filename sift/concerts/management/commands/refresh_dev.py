@@ -1,66 +1,65 @@
 """
 concerts/management/commands/refresh_dev.py
 
-Flushes the DB and re-seeds Artist and Venue from fixtures, then
-runs scrape_shows and make_matches commmands to populate ConcertMatch table.
+Re-seeds Artist and Venue from fixtures (bulk loaded in place by
+load_fixtures --prune, which deletes the ones gone from the fixtures),
+then runs the scrape_shows and make_matches commands to populate the
+ConcertMatch table.
 
-Also dumps Concerts to a fixture for the Heroku app to use.
+The concerts are scraped into a new staging generation (see DataGeneration)
+and matched there while the site keeps serving the published one, then
+published in a single update, so the site never shows a half-built set.
+
+Also exports the artists and the published concerts to fixtures for the
+Heroku app to use (export_fixtures, which keeps the last few), along with
+delta fixtures from the previous ones (concerts/deltas.py), which
+refresh_heroku applies in place.
 """
 
 import os, sys
-from datetime import datetime
 
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import BaseCommand
 from django.core.management import call_command
 
-from concerts.utils import FIXTURE_DIRS
+from concerts.deltas import DELTA_FIXTURE_TYPES, snapshot, write_delta
+from concerts.models import DataGeneration
+from concerts.utils import get_latest_fixture
 
 class Command(BaseCommand):
-    help = 'Flushes DB, reloads artist and venue fixtures, scrapes shows and finds the matches'
+    help = 'Reloads artist and venue fixtures, scrapes shows and finds the matches'
 
     def handle(self, *args, **options):
         try:
-            artists_fixtures = os.listdir(FIXTURE_DIRS['artists'])
-            artists_fixtures.sort()
-            latest_artists_fixture = os.path.join(
-                FIXTURE_DIRS['artists'],
-                artists_fixtures[-1]
-            )
-
-            venues_fixtures = os.listdir(FIXTURE_DIRS['venues'])
-            venues_fixtures.sort()
-            latest_venues_fixture = os.path.join(
-                FIXTURE_DIRS['venues'],
-                venues_fixtures[-1]
-            )
-
-            concerts_fixtures = os.listdir(FIXTURE_DIRS['concerts'])
-            concerts_fixtures.sort()
-            latest_concerts_fixture = os.path.join(
-                FIXTURE_DIRS['concerts'],
-                concerts_fixtures[-1]
-            )
+            latest_artists_fixture = get_latest_fixture('artists')
+            latest_venues_fixture = get_latest_fixture('venues')
         except IndexError as e:
             sys.exit("Problem opening a fixture: {}".format(e.args))
 
-        self.stdout.write("Flushing DB...")
-        call_command('flush', '--noinput')
-        self.stdout.write("Loading artists from fixture...")
-        call_command('loaddata', latest_artists_fixture)
-        self.stdout.write("Loading venues from fixture...")
-        call_command('loaddata', latest_venues_fixture)
-        self.stdout.write("Scraping venue sites for concerts...")
-        call_command('scrape_shows')
-        self.stdout.write("Finding target artists in the concert billings...")
-        call_command('make_matches')
-        # TODO Add concert fixture rotation?
-        concert_fixture_name = datetime.utcnow().strftime('%Y%m%d') + '_concert.json'
-        concert_fixture_path = os.path.join(FIXTURE_DIRS['concerts'], concert_fixture_name)
-        self.stdout.write("Dumping new concerts to {}".format(concert_fixture_name))
+        self.stdout.write("Loading artists and venues from fixtures...")
         call_command(
-            'dumpdata',
-            'concerts.Concert',
-            '--indent=4',
-            '--output={}'.format(concert_fixture_path)
+            'load_fixtures', latest_artists_fixture, latest_venues_fixture, prune=True
         )
+        generation = DataGeneration.stage()
+        self.stdout.write("Scraping venue sites for concerts into generation {}...".format(generation))
+        call_command('scrape_shows', generation=generation)
+        self.stdout.write("Finding target artists in the concert billings...")
+        call_command('make_matches', full=True, generation=generation)
+        self.stdout.write("Publishing generation {}...".format(generation))
+        DataGeneration.publish(generation)
+        # read the previous fixtures before a same-day export replaces them
+        previous = {}
+        for fixture_type in DELTA_FIXTURE_TYPES:
+            try:
+                previous[fixture_type] = snapshot(fixture_type, get_latest_fixture(fixture_type))
+            except IndexError:
+                self.stdout.write("No previous {} fixture to diff against".format(fixture_type))
+        self.stdout.write("Exporting new artists and concerts fixtures...")
+        call_command('export_fixtures', *DELTA_FIXTURE_TYPES, stdout=self.stdout)
+        for fixture_type, base in previous.items():
+            path, counts = write_delta(fixture_type, base, get_latest_fixture(fixture_type))
+            self.stdout.write(
+                "Wrote {} delta {}: {added} added, {changed} changed, {removed} removed".format(
+                    fixture_type, os.path.basename(path), **counts
+                )
+            )
         self.stdout.write("Done!")
@@ -1,57 +1,105 @@
 """
 concerts/management/commands/refresh_heroku.py
 
-Flushes and re-seeds the DB from Artist, Venue, and Concert fixtures,
-then runs the make_matches management commmand to populate ConcertMatch table.
+Re-seeds the DB from Artist, Venue, and Concert fixtures, then runs the
+make_matches management command to populate ConcertMatch table.
+
+Artists and concerts are updated from delta fixtures (concerts/deltas.py)
+when there are deltas leading from the fixtures they were last loaded from
+to the latest ones: only the added, changed, and removed rows are written,
+in place, and only those are re-matched.  The concert deltas and their
+matches land in one transaction.  If the artists were reloaded in full
+instead, every concert is re-matched, since the full load doesn't say
+which artists changed.
+
+Otherwise (or with --full), artists are bulk loaded in place, as venues
+always are (load_fixtures --prune, so ones gone from the fixtures are
+deleted, with their matches), and the concerts are loaded into a new
+staging generation (see DataGeneration) and matched there while the site
+keeps serving the published one, then published in a single update, so
+the site never shows a half-loaded set.
 
 This workflow is currently necessary due to being unable to scrape the
 Subterranean site from Heroku. cf. concerts/buffering_error.txt.
 """
 
 import os, sys
-from datetime import datetime
 
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import BaseCommand
 from django.core.management import call_command
+from django.db import transaction
 
-from concerts.utils import FIXTURE_DIRS
+from concerts.deltas import DELTA_FIXTURE_TYPES, apply_delta, delta_chain, fixture_digest
+from concerts.models import DataGeneration
+from concerts.utils import get_latest_fixture, stage_concert_fixture
 
 class Command(BaseCommand):
-    help = "Flushes and re-seeds DB from fixtures, runs make_matches to find upcoming concerts."
+    help = "Re-seeds DB from fixtures, runs make_matches to find upcoming concerts."
 
-    def handle(self, *args, **options):
-        try:
-            artists_fixtures = os.listdir(FIXTURE_DIRS['artists'])
-            artists_fixtures.sort()
-            latest_artists_fixture = os.path.join(
-                FIXTURE_DIRS['artists'],
-                artists_fixtures[-1]
-            )
+    def add_arguments(self, parser):
+        parser.add_argument('--full',
+            action='store_true',
+            default=False,
+            help='Reload the full fixtures even if there are deltas to apply.'
+        )
 
-            venues_fixtures = os.listdir(FIXTURE_DIRS['venues'])
-            venues_fixtures.sort()
-            latest_venues_fixture = os.path.join(
-                FIXTURE_DIRS['venues'],
-                venues_fixtures[-1]
+    def _apply_chain(self, chain):
+        for path in chain:
+            header, counts = apply_delta(path)
+            self.stdout.write(
+                "Applied {}: {added} added, {changed} changed, {removed} removed".format(
+                    os.path.basename(path), **counts
+                )
             )
 
-            concerts_fixtures = os.listdir(FIXTURE_DIRS['concerts'])
-            concerts_fixtures.sort()
-            latest_concerts_fixture = os.path.join(
-                FIXTURE_DIRS['concerts'],
-                concerts_fixtures[-1]
-            )
+    def handle(self, *args, **options):
+        try:
+            latest_artists_fixture = get_latest_fixture('artists')
+            latest_venues_fixture = get_latest_fixture('venues')
+            latest_concerts_fixture = get_latest_fixture('concerts')
         except IndexError as e:
             sys.exit("Problem accessing a fixture: {}".format(e.args))
 
-        self.stdout.write("Flushing DB...")
-        call_command('flush', '--noinput')
-        self.stdout.write("Loading artists from fixture...")
-        call_command('loaddata', latest_artists_fixture)
+        loaded = DataGeneration.load()
+        digests = {
+            'artists': fixture_digest(latest_artists_fixture),
+            'concerts': fixture_digest(latest_concerts_fixture),
+        }
+        chains = {
+            fixture_type: None if options['full'] else delta_chain(
+                fixture_type,
+                getattr(loaded, '{}_fixture'.format(fixture_type)),
+                digests[fixture_type],
+            )
+            for fixture_type in DELTA_FIXTURE_TYPES
+        }
+
+        with transaction.atomic():
+            if chains['artists'] is None:
+                self.stdout.write("Loading artists from fixture...")
+                call_command('load_fixtures', latest_artists_fixture, prune=True)
+            else:
+                self.stdout.write("Applying {} artist deltas...".format(len(chains['artists'])))
+                self._apply_chain(chains['artists'])
+            DataGeneration.record_fixture('artists', digests['artists'])
         self.stdout.write("Loading venues from fixture...")
-        call_command('loaddata', latest_venues_fixture)
-        self.stdout.write("Loading concerts from fixture...")
-        call_command('loaddata', latest_concerts_fixture)
-        self.stdout.write("Making concert matches...")
-        call_command('make_matches')
+        call_command('load_fixtures', latest_venues_fixture, prune=True)
+
+        if chains['concerts'] is None:
+            generation = DataGeneration.stage()
+            self.stdout.write("Loading concerts from fixture into generation {}...".format(generation))
+            stage_concert_fixture(latest_concerts_fixture, generation)
+            self.stdout.write("Making concert matches...")
+            call_command('make_matches', full=True, generation=generation)
+            self.stdout.write("Publishing generation {}...".format(generation))
+            with transaction.atomic():
+                DataGeneration.publish(generation)
+                DataGeneration.record_fixture('concerts', digests['concerts'])
+        else:
+            with transaction.atomic():
+                self.stdout.write("Applying {} concert deltas...".format(len(chains['concerts'])))
+                self._apply_chain(chains['concerts'])
+                self.stdout.write("Making concert matches...")
+                call_command('make_matches', full=chains['artists'] is None)
+                DataGeneration.record_fixture('concerts', digests['concerts'])
         self.stdout.write("Done!")
@@ -3,51 +3,233 @@ concerts/management/commands/scrape_shows.py
 
 Using the concerts.utils.scrapers, scrapes venue sites and
 writes the upcoming concerts to Concerts table.
+
+Venue sites are fetched and parsed on a pool of worker threads
+(--workers); writes to the DB stay on the main thread, as each venue
+finishes, in one transaction per venue.  Shows are diffed against the
+existing concerts (concerts.sync): new ones are bulk inserted, changed ones
+updated, and ones gone from the venue's schedule deactivated, so unchanged
+concerts keep their matches.
+
+A venue whose scraper fails is logged and skipped; the other venues are
+still written, and concerts at other venues (MISC_VENUE_ID) are only
+deactivated when every venue was scraped.
+
+With --if-modified, venues whose schedule page is unchanged since the last
+scrape (HTTP 304) are skipped, and their concerts are left as they are.
+A page's ETag/Last-Modified are only saved once its concerts are written,
+so a venue that failed, or was only parsed (--dry-run), is fetched in
+full next time.
+
+Concerts are written to the published generation (see DataGeneration), or
+with --generation, to a staging generation that a refresh is building.
+
+Every page parsed is kept in the scrapers.cache page cache.  --replay parses
+the cached pages with no network access, --cache-ttl reuses cached pages
+younger than the given age, and --dry-run parses without writing to the DB.
+
+Selenium venues share a pool of up to --browsers headless browsers, started
+once for the run.
+
+Bumps the DataGeneration once the published concerts are written, so cached
+pages are re-rendered.
+
+--parser picks the BeautifulSoup tree builder the scrapers parse with
+(SIFT_HTML_PARSER, or 'html.parser', by default); 'lxml' is much faster.
 """
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
+import time
 
+from bs4 import BeautifulSoup, FeatureNotFound
 from django.core.management.base import BaseCommand, CommandError
 
-from concerts.models import Venue, Concert
+from concerts.models import DataGeneration, Venue
+from concerts.scrapers.browser import BrowserPool
+from concerts.scrapers.cache import CacheMiss
+from concerts.sync import deactivate_missing, sync_venue_concerts
 from concerts.utils import SCRAPERS
 
 
-MISC_VENUE = Venue.objects.get(id=99)
+# concerts held elsewhere by a tracked venue are filed under this Venue
+MISC_VENUE_ID = 99
+# venues scraped at once by default, update_live and refresh_dev included;
+# the fetches are network bound, so this is well past the CPU count
+DEFAULT_WORKERS = 4
 
 logger = logging.getLogger('concerts.data_management')
 
 
-class Command(BaseCommand):
-    help = 'Scrapes sites for all active Venues and writes shows to Concerts table'
+def load_venue_shows(venue, browser_pool=None, parser=None, **load_options):
+    """
+    Runs the venue's scraper.  Called on a worker thread, so no DB access.
 
-    def handle(self, *args, **options):
+    parser overrides the scraper's BeautifulSoup tree builder, and
+    load_options are passed on to the scraper's load_live_shows.
 
-        for venue in Venue.objects.filter(is_active=True):
-            # point to from model?
-            scraper = SCRAPERS[venue.id]()
+    :returns: A tuple of (<scraper with shows loaded>, <seconds taken>).
+    """
 
-            logger.info("Scraping venue {}".format(venue))
+    # point to from model?
+    scraper = SCRAPERS[venue.id]()
+    scraper.browser_pool = browser_pool
+    if parser is not None:
+        scraper.parser = parser
+    start = time.time()
+    scraper.load_live_shows(**load_options)
+    return scraper, time.time() - start
 
-            # try:
-            scraper.load_live_shows()
 
-            for show in scraper.shows:
-                # better to use venue.concert_set.create(...) ?
-                concert = Concert.objects.create(
-                    billing=show.artists,
-                    venue=venue if show.venue_name==venue.name else MISC_VENUE,
-                    date_time=show.show_date,
-                    price=show.price,
-                    url=show.show_url,
-                )
-                concert.save()
-                logger.debug("Concert added: {}".format(concert))
+class Command(BaseCommand):
+    help = 'Scrapes sites for all active Venues and writes shows to Concerts table'
 
-            logger.info("Added {} shows from {}".format(
-                len(scraper.shows), venue)
-            )
+    def add_arguments(self, parser):
+        parser.add_argument('--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help='Number of venues to scrape at the same time '
+                 '(default {}).'.format(DEFAULT_WORKERS)
+        )
+        parser.add_argument('--browsers',
+            type=int,
+            default=1,
+            help='Number of headless browsers shared by the selenium venues (default 1).'
+        )
+        parser.add_argument('--if-modified',
+            action='store_true',
+            default=False,
+            help='Skip venues whose schedule page is unchanged since the last scrape.'
+        )
+        parser.add_argument('--replay',
+            action='store_true',
+            default=False,
+            help='Parse the cached pages from the last scrape instead of fetching.'
+        )
+        parser.add_argument('--cache-ttl',
+            type=int,
+            default=None,
+            help='Parse cached pages at most this many seconds old instead of fetching.'
+        )
+        parser.add_argument('--dry-run',
+            action='store_true',
+            default=False,
+            help='Parse the shows but do not write them to the DB.'
+        )
+        parser.add_argument('--generation',
+            type=int,
+            default=None,
+            help='Write to this generation of concerts (default: the published one).'
+        )
+        parser.add_argument('--parser',
+            default=None,
+            help="BeautifulSoup tree builder to parse with, eg. 'lxml' "
+                 "(default: SIFT_HTML_PARSER or 'html.parser')."
+        )
 
-            # except: requests.HTTPError (500 seen: once)
-                # selenium.NoSuchElement, ?
-                # log, send something to rollbar, continue
+    def handle(self, *args, **options):
+
+        if options['workers'] < 1 or options['browsers'] < 1:
+            raise CommandError("--workers and --browsers must be at least 1")
+        if options['parser'] is not None:
+            try:
+                BeautifulSoup('', options['parser'])
+            except FeatureNotFound:
+                raise CommandError("Parser {} is not installed".format(options['parser']))
+
+        run_start = time.time()
+        venues = list(Venue.objects.filter(is_active=True))
+        misc_venue = Venue.objects.get(id=MISC_VENUE_ID)
+        published = DataGeneration.load().published
+        generation = options['generation']
+        if generation is None:
+            generation = published
+
+        browser_pool = BrowserPool(size=options['browsers'])
+        # misc venue concerts can only be judged gone once every venue is in
+        misc_keys = set()
+        all_scraped = True
+        failed = []
+
+        with browser_pool, ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {}
+            for venue in venues:
+                logger.info("Scraping venue {}".format(venue))
+                future = executor.submit(
+                    load_venue_shows, venue,
+                    browser_pool=browser_pool,
+                    parser=options['parser'],
+                    conditional=options['if_modified'],
+                    replay=options['replay'],
+                    max_age=options['cache_ttl'],
+                )
+                futures[future] = venue
+
+            for future in as_completed(futures):
+                venue = futures[future]
+                try:
+                    scraper, fetch_time = future.result()
+                except Exception as e:
+                    # the other venues are still written
+                    all_scraped = False
+                    failed.append(venue)
+                    if isinstance(e, CacheMiss):
+                        report = "Can't replay {}: {}".format(venue, e)
+                        logger.error(report)
+                    else:
+                        report = "Failed to scrape {}: {!r}".format(venue, e)
+                        logger.exception(report)
+                    self.stderr.write(report)
+                    continue
+
+                if scraper.not_modified:
+                    all_scraped = False
+                    report = "{} unchanged since last scrape, skipped ({:.1f}s)".format(
+                        venue, fetch_time
+                    )
+                    logger.info(report)
+                    self.stdout.write(report)
+                    continue
+
+                if options['dry_run']:
+                    for show in scraper.shows:
+                        logger.debug("Parsed show: {}".format(show))
+                    report = "Parsed {} shows from {} (scraped in {:.1f}s)".format(
+                        len(scraper.shows), venue, fetch_time
+                    )
+                    logger.info(report)
+                    self.stdout.write(report)
+                    continue
+
+                write_start = time.time()
+                counts, venue_misc_keys = sync_venue_concerts(
+                    venue, misc_venue, scraper.shows, generation
+                )
+                write_time = time.time() - write_start
+                misc_keys |= venue_misc_keys
+                scraper.save_validators()
+
+                report = (
+                    "{} shows from {}: {added} added, {updated} updated, "
+                    "{unchanged} unchanged, {deactivated} deactivated "
+                    "(scraped in {:.1f}s, written in {:.2f}s)"
+                ).format(len(scraper.shows), venue, fetch_time, write_time, **counts)
+                logger.info(report)
+                self.stdout.write(report)
+
+        if not options['dry_run']:
+            if all_scraped:
+                deactivated = deactivate_missing(misc_venue, misc_keys, generation)
+                logger.info("Deactivated {} concerts at other venues".format(deactivated))
+            if generation == published:
+                DataGeneration.bump()
+
+        report = "Scraped {} venues in {:.1f}s".format(
+            len(venues) - len(failed), time.time() - run_start
+        )
+        if failed:
+            report += " ({} failed: {})".format(
+                len(failed), ', '.join(str(venue) for venue in failed)
+            )
+        logger.info(report)
+        self.stdout.write(report)
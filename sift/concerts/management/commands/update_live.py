@@ -3,8 +3,14 @@ concerts/management/commands/live_update.py
 
 Regular job to refresh the site (Heroku deployment).
 
-Deletes existing concert matches, then runs scrape_shows and make_matches
-commmands to populate ConcertMatch table.
+Fetches the venue sites first (scrape_shows --dry-run --if-modified, which
+fills the scrapers' page cache, skipping pages unchanged since the last
+run), then, in one transaction, runs scrape_shows on the cached pages,
+which updates the existing concerts in place and saves each page's
+ETag/Last-Modified for the next run, and make_matches to re-match the new
+and changed ones.  Unchanged concerts keep
+their matches, and readers see the old concerts and matches until the
+transaction commits the new ones all at once.
 """
 
 from datetime import datetime
@@ -13,15 +19,14 @@ import sys
 
 from django.core.management.base import BaseCommand
 from django.core.management import call_command
-
-from concerts.models import Concert
+from django.db import transaction
 
 
 logger = logging.getLogger('concerts.data_management')
 
 
 class Command(BaseCommand):
-    help = 'Delete existing Concerts, scrapes venues, and finds the matches'
+    help = 'Scrapes venues, updates the Concerts, and finds the new matches'
 
     def add_arguments(self, parser):
         parser.add_argument('--force',
@@ -41,11 +46,12 @@ class Command(BaseCommand):
             logger.info("Another day..")
             sys.exit()
 
-        logger.info("Deleting existing Concert objects")
-        Concert.objects.all().delete()
+        logger.info("Fetching venue sites...")
+        call_command('scrape_shows', dry_run=True, if_modified=True, stdout=self.stdout)
 
-        logger.info("Scraping venue sites for concerts...")
-        call_command('scrape_shows')
+        with transaction.atomic():
+            logger.info("Updating concerts from the fetched pages...")
+            call_command('scrape_shows', replay=True, stdout=self.stdout)
 
-        logger.info("Finding target artists in the concert billings...")
-        call_command('make_matches')
+            logger.info("Finding target artists in the concert billings...")
+            call_command('make_matches', stdout=self.stdout)
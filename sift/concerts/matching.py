@@ -0,0 +1,386 @@
+"""
+concerts/matching.py
+
+Single-pass artist matching for the make_matches management command.
+
+Artist.re_string patterns (see utils.make_artist_regex) are literal artist
+names with punctuation swapped for '.?' and wrapped in word boundaries.  Any
+billing an artist's regex matches must therefore contain the longest literal
+run of that pattern.  ArtistMatcher loads those literal "keys" into one
+Aho-Corasick automaton, so each billing is scanned once for every artist at
+the same time, and only the artists whose key turned up get their full regex
+run as confirmation.  Matching results are identical to searching each
+artist regex against each billing.
+
+Building the automaton is most of the cost of a matching run, so
+load_matcher keeps the matcher for the active artists pickled on disk
+(MATCHER_PATH), stamped with a SHA-256 digest of their (id, re_string)
+pairs.  It is only rebuilt when that set changes, and is kept in memory
+too, so later lookups in the same process only cost the artists query.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import tempfile
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger('concerts')
+
+# flags make_matches has always compiled Artist.re_string with
+ARTIST_RE_FLAGS = re.IGNORECASE | re.MULTILINE | re.DOTALL
+
+# keeps IN (...) clauses under SQLite's bound-parameter limit
+QUERY_CHUNK_SIZE = 500
+
+# Patterns made of word boundaries, optional wildcards, and plain characters
+# can be reduced to literal keys; anything else is always verified.
+SIMPLE_PATTERN_RE = re.compile(r'(?:\\b|\.\?|[^\\.^$*+?{}\[\]|()])*')
+PATTERN_SPLIT_RE = re.compile(r'\\b|\.\?')
+
+MATCHER_PATH = os.path.join(settings.SIFT_CACHE_DIR, 'artist_matcher.pickle')
+# bump when ArtistMatcher's attributes change, so older pickles are rebuilt
+MATCHER_FORMAT = 1
+
+
+def literal_key(re_string):
+    """
+    Returns the longest run of literal characters in an artist regex string
+    (casefolded), or an empty string if the pattern has no usable literal.
+    """
+
+    if not SIMPLE_PATTERN_RE.fullmatch(re_string):
+        return ''
+    segments = PATTERN_SPLIT_RE.split(re_string)
+    return max(segments, key=len).casefold()
+
+
+class ArtistMatcher:
+    """
+    Matches many artist regexes against concert billings in one pass.
+
+    :param artist_pairs: iterable of (artist id, Artist.re_string) pairs.
+    """
+
+    def __init__(self, artist_pairs):
+        self.patterns = {}
+        # compiled lazily; most artists never reach the confirmation step
+        self.regexes = {}
+        # artists without a literal key get checked against every billing
+        self.unkeyed = []
+
+        # Aho-Corasick automaton: goto transitions, failure links, and the
+        # artist ids whose key ends at each state
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for artist_id, re_string in artist_pairs:
+            if not re_string:
+                # an empty pattern would match every billing
+                continue
+            self.patterns[artist_id] = re_string
+            key = literal_key(re_string)
+            if key:
+                self._add_key(key, artist_id)
+            else:
+                self.unkeyed.append(artist_id)
+
+        self._build_failure_links()
+
+    @classmethod
+    def from_db(cls):
+        """Returns a matcher for all active Artist entries."""
+
+        return cls(active_artist_pairs())
+
+    def __getstate__(self):
+        # compiled regexes are recompiled on unpickling anyway
+        state = self.__dict__.copy()
+        state['regexes'] = {}
+        return state
+
+    def _add_key(self, key, artist_id):
+        state = 0
+        for char in key:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._out[state].append(artist_id)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._out[next_state].extend(self._out[self._fail[next_state]])
+
+    def candidates(self, billing):
+        """
+        Returns the set of artist ids whose literal key appears in billing,
+        plus any artists that cannot be pre-filtered.
+        """
+
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set(self.unkeyed)
+        state = 0
+        for char in billing.casefold():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def _regex(self, artist_id):
+        regex = self.regexes.get(artist_id)
+        if regex is None:
+            regex = re.compile(
+                r'{}'.format(self.patterns[artist_id]),
+                flags=ARTIST_RE_FLAGS,
+            )
+            self.regexes[artist_id] = regex
+        return regex
+
+    def match(self, billing):
+        """Returns the set of artist ids whose regex matches billing."""
+
+        return {
+            artist_id for artist_id in self.candidates(billing)
+            if self._regex(artist_id).search(billing)
+        }
+
+    def match_all(self, concert_pairs):
+        """
+        Returns a list of (concert id, artist id) pairs for every match.
+
+        :param concert_pairs: iterable of (concert id, Concert.billing) pairs.
+        """
+
+        return [
+            (concert_id, artist_id)
+            for concert_id, billing in concert_pairs
+            for artist_id in sorted(self.match(billing))
+        ]
+
+
+def active_artist_pairs():
+    """Returns a list of (id, re_string) pairs of the active artists."""
+
+    from .models import Artist
+
+    return list(Artist.objects.filter(is_active=True).values_list('id', 're_string'))
+
+
+def artists_digest(artist_pairs):
+    """Returns the SHA-256 hex digest of a set of (id, re_string) pairs."""
+
+    encoded = json.dumps(sorted(artist_pairs), separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _read_matcher(path, digest):
+    try:
+        with open(path, 'rb') as matcher_file:
+            saved = pickle.load(matcher_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, AttributeError, ImportError,
+            pickle.UnpicklingError) as e:
+        logger.warning("Ignoring unreadable matcher {}: {}".format(path, e))
+        return None
+    if saved.get('format') != MATCHER_FORMAT or saved.get('digest') != digest:
+        return None
+    return saved['matcher']
+
+
+def _write_matcher(path, digest, matcher):
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as matcher_file:
+            pickle.dump(
+                {'format': MATCHER_FORMAT, 'digest': digest, 'matcher': matcher},
+                matcher_file, protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # the matcher still works; it just gets built again next time
+        logger.warning("Couldn't save matcher to {}: {}".format(path, e))
+
+
+# (path, digest, matcher) of the last matcher load_matcher returned
+_loaded = None
+
+
+def load_matcher(path=None):
+    """
+    Returns an ArtistMatcher for all active Artist entries: the one already
+    loaded, or saved at path (default MATCHER_PATH), if it was built from
+    the same (id, re_string) pairs, or else a new one, which is saved.
+    """
+
+    global _loaded
+
+    path = path or MATCHER_PATH
+    artist_pairs = active_artist_pairs()
+    digest = artists_digest(artist_pairs)
+    if _loaded is not None and _loaded[:2] == (path, digest):
+        return _loaded[2]
+
+    matcher = _read_matcher(path, digest)
+    if matcher is None:
+        logger.debug("Building matcher for {} artists".format(len(artist_pairs)))
+        matcher = ArtistMatcher(artist_pairs)
+        _write_matcher(path, digest, matcher)
+    _loaded = (path, digest, matcher)
+    return matcher
+
+
+def nested_loop_matches(artist_pairs, concert_pairs):
+    """
+    Reference implementation: search every artist regex against every
+    billing.  Kept for benchmarking and testing ArtistMatcher.
+    """
+
+    concert_pairs = list(concert_pairs)
+    matches = []
+    for artist_id, regex_string in artist_pairs:
+        if not regex_string:
+            continue
+        artist_regex = re.compile(r'{}'.format(regex_string), flags=ARTIST_RE_FLAGS)
+        for concert_id, billing in concert_pairs:
+            if artist_regex.search(billing):
+                matches.append((concert_id, artist_id))
+    return matches
+
+
+def _values_in(queryset, field, ids, *fields):
+    """
+    Yields queryset.values_list(*fields) rows for rows whose field is in ids,
+    querying QUERY_CHUNK_SIZE ids at a time.
+    """
+
+    ids = list(ids)
+    for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+        chunk = ids[start:start + QUERY_CHUNK_SIZE]
+        filtered = queryset.filter(**{'{}__in'.format(field): chunk})
+        yield from filtered.values_list(*fields)
+
+
+def save_matches(pairs):
+    """
+    Writes (concert id, artist id) match pairs to the database in bulk.
+
+    Creates any missing ConcertMatch rows and adds the artist to both
+    Concert.artists and ConcertMatch.artists, skipping links that already
+    exist.  Everything happens in one transaction, with a fixed number of
+    queries regardless of how many pairs there are.
+
+    :param pairs: iterable of (concert id, artist id) pairs.
+    :returns: The number of distinct pairs saved.
+    """
+
+    from .models import Concert, ConcertMatch
+
+    ConcertArtist = Concert.artists.through
+    MatchArtist = ConcertMatch.artists.through
+
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    concert_ids = {concert_id for concert_id, _ in pairs}
+
+    with transaction.atomic():
+        match_ids = dict(_values_in(
+            ConcertMatch.objects.all(), 'concert', concert_ids, 'concert', 'id'
+        ))
+        new_matches = [
+            ConcertMatch(concert_id=concert_id)
+            for concert_id in concert_ids - set(match_ids)
+        ]
+        if new_matches:
+            ConcertMatch.objects.bulk_create(new_matches, batch_size=QUERY_CHUNK_SIZE)
+            # bulk_create doesn't set primary keys, so look them up again
+            match_ids = dict(_values_in(
+                ConcertMatch.objects.all(), 'concert', concert_ids, 'concert', 'id'
+            ))
+
+        existing = set(_values_in(
+            ConcertArtist.objects.all(), 'concert', concert_ids,
+            'concert', 'artist',
+        ))
+        ConcertArtist.objects.bulk_create(
+            [
+                ConcertArtist(concert_id=concert_id, artist_id=artist_id)
+                for concert_id, artist_id in pairs - existing
+            ],
+            batch_size=QUERY_CHUNK_SIZE,
+        )
+
+        match_pairs = {
+            (match_ids[concert_id], artist_id) for concert_id, artist_id in pairs
+        }
+        existing = set(_values_in(
+            MatchArtist.objects.all(), 'concertmatch', match_ids.values(),
+            'concertmatch', 'artist',
+        ))
+        MatchArtist.objects.bulk_create(
+            [
+                MatchArtist(concertmatch_id=match_id, artist_id=artist_id)
+                for match_id, artist_id in match_pairs - existing
+            ],
+            batch_size=QUERY_CHUNK_SIZE,
+        )
+
+    return len(pairs)
+
+
+def clear_matches(concerts=None, artists=None, within=None):
+    """
+    Removes existing match links before concerts or artists are re-matched.
+
+    Deletes the Concert.artists and ConcertMatch.artists links for the given
+    concerts and artists, then any ConcertMatch left without artists.
+
+    :param concerts: Concert queryset whose matches should be dropped.
+    :param artists: Artist queryset whose matches should be dropped.
+    :param within: If given, a Concert queryset the artists' matches are
+                   only dropped from (eg. one generation of concerts).
+    """
+
+    from .models import Concert, ConcertMatch
+
+    ConcertArtist = Concert.artists.through
+    MatchArtist = ConcertMatch.artists.through
+
+    with transaction.atomic():
+        if concerts is not None:
+            ConcertArtist.objects.filter(concert__in=concerts).delete()
+            MatchArtist.objects.filter(concertmatch__concert__in=concerts).delete()
+        if artists is not None:
+            concert_links = ConcertArtist.objects.filter(artist__in=artists)
+            match_links = MatchArtist.objects.filter(artist__in=artists)
+            if within is not None:
+                concert_links = concert_links.filter(concert__in=within)
+                match_links = match_links.filter(concertmatch__concert__in=within)
+            concert_links.delete()
+            match_links.delete()
+        ConcertMatch.objects.filter(artists__isnull=True).delete()
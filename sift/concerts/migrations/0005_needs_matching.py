@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2026-10-18 09:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concerts', '0004_auto_20161126_2200'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='needs_matching',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='concert',
+            name='needs_matching',
+            field=models.BooleanField(default=True),
+        ),
+    ]
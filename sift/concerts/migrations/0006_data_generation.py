@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2026-10-18 09:16
+from __future__ import unicode_literals
+
+import concerts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concerts', '0005_needs_matching'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataGeneration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(default=concerts.models.new_generation_token, max_length=32)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from concerts.db_indexes import create_indexes, drop_indexes
+
+# concerts.db_indexes.INDEXES as of this migration; later migrations that
+# make SQLite rebuild these tables create them again from here
+QUERY_INDEXES = {
+    'concerts_concert_date_time_id': (
+        'concerts_concert', '(date_time, id)', '(date_time, id)',
+    ),
+    'concerts_concert_active_date_time_id': (
+        'concerts_concert', '(date_time, id) WHERE is_active', None,
+    ),
+    'concerts_concert_venue_date_time_id': (
+        'concerts_concert', '(venue_id, date_time, id)', '(venue_id, date_time, id)',
+    ),
+    'concerts_concert_date_scraped': (
+        'concerts_concert', '(date_scraped)', '(date_scraped)',
+    ),
+    'concerts_concert_needs_matching': (
+        'concerts_concert', '(id) WHERE needs_matching', None,
+    ),
+    'concerts_artist_active_name': (
+        'concerts_artist', '(name) WHERE is_active', None,
+    ),
+    'concerts_artist_needs_matching': (
+        'concerts_artist', '(id) WHERE needs_matching', None,
+    ),
+    'concerts_artist_name_ci': (
+        'concerts_artist', '(UPPER(name))', None,
+    ),
+}
+
+
+def forwards(apps, schema_editor):
+    create_indexes(schema_editor.connection, indexes=QUERY_INDEXES)
+
+
+def backwards(apps, schema_editor):
+    drop_indexes(schema_editor.connection, indexes=QUERY_INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concerts', '0006_data_generation'),
+    ]
+
+    operations = [
+        # partial and expression indexes; see concerts/db_indexes.py
+        migrations.RunPython(forwards, backwards),
+    ]
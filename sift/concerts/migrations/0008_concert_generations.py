@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2026-10-18 09:24
+from __future__ import unicode_literals
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+from concerts.db_indexes import create_indexes
+
+QUERY_INDEXES = import_module('concerts.migrations.0007_query_indexes').QUERY_INDEXES
+
+
+def recreate_indexes(apps, schema_editor):
+    # SQLite adds columns by rebuilding the table, which drops its indexes
+    create_indexes(schema_editor.connection, indexes=QUERY_INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concerts', '0007_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='concert',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='datageneration',
+            name='published',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(recreate_indexes, migrations.RunPython.noop),
+    ]
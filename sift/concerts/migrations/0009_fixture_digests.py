@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2026-10-18 09:32
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concerts', '0008_concert_generations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datageneration',
+            name='artists_fixture',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='datageneration',
+            name='concerts_fixture',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
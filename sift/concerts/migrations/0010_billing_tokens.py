@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.6 on 2026-10-18 09:40
+from __future__ import unicode_literals
+
+from importlib import import_module
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from concerts.db_indexes import create_indexes
+
+QUERY_INDEXES = import_module('concerts.migrations.0007_query_indexes').QUERY_INDEXES
+
+# concerts.billing's tokenizer as of this migration, so the tokens written
+# here don't change along with it
+BILLING_SPLIT_RE = re.compile(
+    r'\bwith\b|\bw/|\bfeat(?:uring\b|\.)|\bpresents?\b|\s[-–—]+\s|[,;:/*|()\[\]]',
+    flags=re.IGNORECASE
+)
+JOINED_ACTS_RE = re.compile(r'[&+]')
+APOSTROPHE_RE = re.compile(r"['’]")
+NON_WORD_RE = re.compile(r'[\W_]+')
+LEADING_ARTICLE_RE = re.compile(r'^the ')
+
+
+def normalize_name(name):
+    name = APOSTROPHE_RE.sub('', name.casefold())
+    name = NON_WORD_RE.sub(' ', name).strip()
+    return LEADING_ARTICLE_RE.sub('', name)
+
+
+def billing_tokens(billing):
+    tokens = []
+    for part in BILLING_SPLIT_RE.split(billing):
+        acts = [part]
+        if JOINED_ACTS_RE.search(part):
+            acts += JOINED_ACTS_RE.split(part)
+        for act in acts:
+            token = normalize_name(act)
+            if token and token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def recreate_indexes(apps, schema_editor):
+    # SQLite adds columns by rebuilding the table, which drops its indexes
+    create_indexes(schema_editor.connection, indexes=QUERY_INDEXES)
+
+
+def index_existing(apps, schema_editor):
+    Artist = apps.get_model('concerts', 'Artist')
+    Concert = apps.get_model('concerts', 'Concert')
+    BillingToken = apps.get_model('concerts', 'BillingToken')
+
+    for artist_id, name in Artist.objects.exclude(re_string='').values_list('id', 'name'):
+        Artist.objects.filter(pk=artist_id).update(normalized_name=normalize_name(name))
+    BillingToken.objects.bulk_create(
+        [
+            BillingToken(concert_id=concert_id, token=token)
+            for concert_id, billing in Concert.objects.values_list('id', 'billing')
+            for token in billing_tokens(billing)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concerts', '0009_fixture_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=400)),
+                ('concert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='concerts.Concert')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='normalized_name',
+            field=models.CharField(blank=True, db_index=True, max_length=200),
+        ),
+        migrations.AlterUniqueTogether(
+            name='billingtoken',
+            unique_together=set([('token', 'concert')]),
+        ),
+        migrations.RunPython(recreate_indexes, migrations.RunPython.noop),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+from concerts.db_indexes import create_indexes, drop_indexes
+
+# concerts.db_indexes.SEARCH_INDEXES as of this migration
+SEARCH_INDEXES = {
+    'concerts_concert_billing_search': (
+        'concerts_concert', "USING gin (to_tsvector('simple', billing))", None,
+    ),
+    'concerts_artist_name_search': (
+        'concerts_artist', "USING gin (to_tsvector('simple', name))", None,
+    ),
+}
+
+# 0010's frozen copy of the tokenizer
+billing_tokens = import_module('concerts.migrations.0010_billing_tokens').billing_tokens
+
+
+def token_rows(billing):
+    # concerts.billing.token_rows as of this migration
+    rows = {}
+    acts = billing_tokens(billing)
+    for act in acts:
+        rows[act] = 0
+    for act in acts:
+        words = act.split(' ')
+        for word in range(1, len(words)):
+            rows.setdefault(' '.join(words[word:]), word)
+    return list(rows.items())
+
+
+def forwards(apps, schema_editor):
+    create_indexes(schema_editor.connection, indexes=SEARCH_INDEXES)
+
+
+def backwards(apps, schema_editor):
+    drop_indexes(schema_editor.connection, indexes=SEARCH_INDEXES)
+
+
+def reindex_billings(apps, schema_editor):
+    # add the later-word tokens that search prefix-matches
+    Concert = apps.get_model('concerts', 'Concert')
+    BillingToken = apps.get_model('concerts', 'BillingToken')
+
+    BillingToken.objects.all().delete()
+    BillingToken.objects.bulk_create(
+        [
+            BillingToken(concert_id=concert_id, token=token, word=word)
+            for concert_id, billing in Concert.objects.values_list('id', 'billing')
+            for token, word in token_rows(billing)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concerts', '0010_billing_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billingtoken',
+            name='word',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterIndexTogether(
+            name='billingtoken',
+            index_together=set([('word', 'token', 'concert')]),
+        ),
+        migrations.RunPython(reindex_billings, migrations.RunPython.noop),
+        # full-text search indexes (PostgreSQL only); see concerts/db_indexes.py
+        migrations.RunPython(forwards, backwards),
+    ]
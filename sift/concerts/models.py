@@ -1,10 +1,20 @@
+import uuid
+
 from django.db import models
 
+# Artist fields that change what the artist matches
+MATCHING_FIELDS = ('re_string', 'is_active')
+
 class Artist(models.Model):
     name = models.CharField(max_length=200, unique=True)
     re_string = models.CharField(max_length=200)
     spotify_id = models.CharField(max_length=200, blank=True)
     is_active = models.BooleanField(default=True)
+    # set when the artist is new, or save() (or a delta, or enrich_artists)
+    # changes re_string or is_active; cleared by make_matches
+    needs_matching = models.BooleanField(default=True)
+    # name as it appears in BillingToken.token; see concerts.billing
+    normalized_name = models.CharField(max_length=200, blank=True, db_index=True)
 
     # vs. custom manager?
     @classmethod
@@ -15,6 +25,7 @@ class Artist(models.Model):
         Assumes artist DNE; calling code should check for artist in DB first.
         """
 
+        from concerts.billing import normalize_name
         from concerts.utils import get_spotify_id, make_artist_regex
 
         spotify_id = get_spotify_id(artist_name)
@@ -22,10 +33,37 @@ class Artist(models.Model):
         artist = Artist.objects.create(
             name=artist_name,
             re_string=re_string,
-            spotify_id=spotify_id
+            spotify_id=spotify_id,
+            normalized_name=normalize_name(artist_name),
         )
         return artist
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        artist = super().from_db(db, field_names, values)
+        # compared by save(); deferred fields aren't known, so aren't compared
+        artist._matching_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in MATCHING_FIELDS
+        }
+        return artist
+
+    def save(self, *args, **kwargs):
+        """
+        Flags the artist needs_matching if re_string or is_active changed
+        since it was loaded.  QuerySet.update() bypasses this; set the flag
+        along with the fields there.
+        """
+
+        loaded = getattr(self, '_matching_values', {})
+        if any(getattr(self, name) != value for name, value in loaded.items()):
+            self.needs_matching = True
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'needs_matching'}
+        super().save(*args, **kwargs)
+        self._matching_values = {name: getattr(self, name) for name in MATCHING_FIELDS}
+
     def __str__(self):
         return "({}) {} - Spotify ID: {}".format(self.pk,
                                                  self.name,
@@ -40,6 +78,18 @@ class Venue(models.Model):
     def __str__(self):
         return self.name
 
+class ConcertQuerySet(models.QuerySet):
+
+    def published(self, generation=None):
+        """
+        Concerts in the published generation (see DataGeneration), or in
+        `generation` if given.
+        """
+
+        if generation is None:
+            generation = DataGeneration.load().published
+        return self.filter(generation=generation)
+
 class Concert(models.Model):
     billing = models.CharField(max_length=400)
     artists = models.ManyToManyField(Artist)
@@ -54,6 +104,13 @@ class Concert(models.Model):
     url = models.CharField(max_length=300)
     date_scraped = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
+    # set when the concert is new or billing changes; cleared by make_matches
+    needs_matching = models.BooleanField(default=True)
+    # full refreshes build a new generation of concerts next to the
+    # published one; see DataGeneration
+    generation = models.PositiveIntegerField(default=0)
+
+    objects = ConcertQuerySet.as_manager()
 
     def __str__(self):
         return "{0} - {1} at {2}".format(
@@ -62,9 +119,110 @@ class Concert(models.Model):
             self.venue,
         )
 
+class BillingToken(models.Model):
+    """
+    One act on a Concert's billing, normalized, for matching artists by
+    name, or the rest of one from a later word on, for searching; see
+    concerts.billing.
+    """
+
+    concert = models.ForeignKey(
+        Concert,
+        on_delete = models.CASCADE,
+    )
+    token = models.CharField(max_length=400)
+    # where in its act the token starts; 0 for the whole act
+    word = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        # token first: it's the inverted index from tokens to concerts
+        unique_together = ('token', 'concert')
+        # and the whole acts alone, for exact matches in searches
+        index_together = [('word', 'token', 'concert')]
+
+    def __str__(self):
+        return "{} ({})".format(self.token, self.concert_id)
+
 class ConcertMatch(models.Model):
     artists = models.ManyToManyField(Artist)
     concert = models.OneToOneField(
         Concert,
         on_delete = models.CASCADE,
     )
+
+def new_generation_token():
+    return uuid.uuid4().hex
+
+class DataGeneration(models.Model):
+    """
+    Single row naming the current version of the concert data.  Cached pages
+    are keyed on its token (see concerts.caching), and the commands that
+    change what the pages show call bump() when they're done.
+
+    The token is random rather than a counter so a flushed DB, whose row
+    restarts from scratch, never reuses a key cached before the flush.
+
+    `published` is the generation of Concert rows the site shows.  Full
+    refreshes stage() a new generation, fill it and match it while the
+    published one stays up, then publish() it with a single update.  The
+    generation before is only deleted by the next stage(), so requests that
+    started on it can finish.
+    """
+
+    token = models.CharField(max_length=32, default=new_generation_token)
+    published = models.PositiveIntegerField(default=0)
+    # digests of the fixtures the artists and concerts were last loaded
+    # from, for applying delta fixtures; see concerts.deltas
+    artists_fixture = models.CharField(max_length=64, blank=True)
+    concerts_fixture = models.CharField(max_length=64, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def load(cls):
+        """Returns the DataGeneration row, creating it if needed."""
+
+        generation = cls.objects.filter(pk=1).first()
+        if generation is None:
+            generation, created = cls.objects.get_or_create(pk=1)
+        return generation
+
+    @classmethod
+    def bump(cls):
+        """Starts a new data generation and returns its token."""
+
+        token = new_generation_token()
+        cls.objects.update_or_create(pk=1, defaults={'token': token})
+        return token
+
+    @classmethod
+    def stage(cls):
+        """
+        Returns the number of a new, empty generation of concerts to build,
+        deleting every concert outside the published generation first.
+        """
+
+        published = cls.load().published
+        Concert.objects.exclude(generation=published).delete()
+        return published + 1
+
+    @classmethod
+    def record_fixture(cls, fixture_type, digest):
+        """Records the digest of the fixture fixture_type was loaded from."""
+
+        cls.objects.update_or_create(pk=1, defaults={
+            '{}_fixture'.format(fixture_type): digest,
+        })
+
+    @classmethod
+    def publish(cls, generation):
+        """Switches the site over to the concerts in `generation`."""
+
+        cls.objects.update_or_create(pk=1, defaults={
+            'published': generation,
+            'token': new_generation_token(),
+        })
+
+    def __str__(self):
+        return "Data generation {} of concerts, token {} ({})".format(
+            self.published, self.token, self.updated
+        )
@@ -1,12 +1,11 @@
 # -*- coding: utf-8 -*-
 # concerts/scrapers/bottomlounge.py
 
-from .venue import Venue
+from .venue import Venue, class_strainer
 
 import calendar, datetime, iso8601, os, pytz, sys, time
 from collections import namedtuple
 
-import requests
 from bs4 import BeautifulSoup as bs
 
 TODAY = datetime.datetime.today()
@@ -21,6 +20,8 @@ class BottomLounge(Venue):
     http://bottomlounge.com
     """
 
+    parse_only = class_strainer('schedule-item-content')
+
     def __init__(self):
         super().__init__()
         self.venue_name = 'Bottom Lounge'
@@ -34,7 +35,7 @@ class BottomLounge(Venue):
         html dump > '.schedule-item-content'
         """
 
-        show_summaries = bs(html, 'html.parser').select('.schedule-item-content')
+        show_summaries = self.make_soup(html).select('.schedule-item-content')
         return show_summaries
 
 
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+concerts/scrapers/browser.py
+
+Helpers for the venue scrapers that drive a headless browser (selenium).
+
+wait_for_content replaces fixed sleeps after each click: it polls the page
+for the show elements and returns as soon as they have rendered, changed
+from what was there before the click, and stopped changing.
+
+BrowserPool starts browsers once per scrape run and lends them to the
+scrapers, and lets venues that share a site (Lincoln Hall and Schubas on
+lh-st.com) load its pages once between them.
+"""
+
+import logging, queue, threading, time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+logger = logging.getLogger('concerts')
+
+# seconds
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.25
+
+# text of every element matching a CSS selector, as one string (ES5 for PhantomJS)
+SNAPSHOT_JS = """
+var nodes = document.querySelectorAll(arguments[0]), parts = [];
+for (var i = 0; i < nodes.length; i++) { parts.push(nodes[i].textContent); }
+return parts.join('\\u001e');
+"""
+
+
+def content_snapshot(driver, selector):
+    """Returns the text of all elements matching selector, joined."""
+
+    return driver.execute_script(SNAPSHOT_JS, selector) or ''
+
+
+def wait_for_content(driver, selector, previous=None, allow_empty=False,
+                     timeout=WAIT_TIMEOUT, poll=POLL_INTERVAL):
+    """
+    Waits for the elements matching selector to finish rendering.
+
+    The page counts as ready once the snapshot of matching elements differs
+    from `previous` (eg. the last month's shows, so stale content isn't
+    grabbed twice) and is unchanged between two consecutive polls.  Gives up
+    after `timeout` seconds and logs a warning, leaving the page as is.
+
+    :param driver: selenium webdriver.
+    :param str selector: CSS selector for the show elements.
+    :param previous: Snapshot from before the triggering click, if any.
+    :param bool allow_empty: Count a page without matching elements as ready.
+    :returns: The snapshot of the page when it was judged ready.
+    """
+
+    deadline = time.time() + timeout
+    last = None
+    while True:
+        snapshot = content_snapshot(driver, selector)
+        ready = (
+            (snapshot or allow_empty)
+            and snapshot != previous
+            and snapshot == last
+        )
+        if ready:
+            return snapshot
+        if time.time() >= deadline:
+            logger.warning(
+                "Timed out after {}s waiting for {} to render".format(timeout, selector)
+            )
+            return snapshot
+        last = snapshot
+        time.sleep(poll)
+
+
+def start_phantomjs():
+    """Starts a headless PhantomJS browser sized like a desktop window."""
+
+    from selenium import webdriver
+
+    driver = webdriver.PhantomJS()
+    driver.set_window_size(1221, 686)
+    return driver
+
+
+class BrowserPool:
+    """
+    Headless browsers shared by the selenium scrapers for one scrape run.
+
+    Browsers are started on first use, up to `size` of them, and lent out one
+    at a time by `driver()`.  `close()` (or leaving a `with` block) quits them.
+
+    :param int size: Most browsers to run at once.
+    :param factory: Callable that starts a browser; start_phantomjs by default.
+    """
+
+    def __init__(self, size=1, factory=start_phantomjs):
+        self.size = size
+        self._factory = factory
+        self._idle = queue.Queue()
+        self._started = []
+        self._lock = threading.Lock()
+        self._shared = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._started) < self.size:
+                driver = self._factory()
+                self._started.append(driver)
+                return driver
+        return self._idle.get()
+
+    @contextmanager
+    def driver(self):
+        """Lends out a browser with its cookies cleared."""
+
+        driver = self._acquire()
+        try:
+            driver.delete_all_cookies()
+            yield driver
+        finally:
+            self._idle.put(driver)
+
+    def shared(self, key, load):
+        """
+        Returns load(), calling it only once per key for the life of the pool.
+        Callers asking for a key that is already loading wait for that load.
+        """
+
+        with self._lock:
+            future = self._shared.get(key)
+            loader = future is None
+            if loader:
+                future = self._shared[key] = Future()
+        if loader:
+            try:
+                future.set_result(load())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def close(self):
+        """Quits every browser the pool started."""
+
+        with self._lock:
+            started, self._started = self._started, []
+        for driver in started:
+            try:
+                driver.quit()
+            except Exception:
+                logger.exception("Failed to quit browser {}".format(driver))
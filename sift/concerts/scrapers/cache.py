@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+concerts/scrapers/cache.py
+
+On-disk cache of the raw schedule HTML each scraper parsed, so parsing can be
+re-run (scrape_shows --replay) without hitting the venue sites.
+
+Pages are stored content-addressed, gzipped under <SIFT_CACHE_DIR>/pages/ and
+named by their SHA-256, so identical pages (eg. the lh-st.com blob shared by
+two venues) are stored once.  index.json maps each scraper's cache key to
+the hash, the time it was fetched, and its ETag/Last-Modified, which a
+replay saves once the page's shows are written (see scrape_shows).
+"""
+
+import gzip, hashlib, json, os, threading, time
+
+from django.conf import settings
+
+PAGES_DIR = os.path.join(settings.SIFT_CACHE_DIR, 'pages')
+INDEX_PATH = os.path.join(PAGES_DIR, 'index.json')
+
+_lock = threading.Lock()
+
+
+class CacheMiss(LookupError):
+    """No usable cached page for a cache key."""
+
+
+def _blob_path(digest):
+    return os.path.join(PAGES_DIR, digest + '.html.gz')
+
+
+def _read_index():
+    try:
+        with open(INDEX_PATH) as index_file:
+            return json.load(index_file)
+    except (IOError, ValueError):
+        return {}
+
+
+def _write_index(index):
+    tmp_path = INDEX_PATH + '.tmp'
+    with open(tmp_path, 'w') as index_file:
+        json.dump(index, index_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, INDEX_PATH)
+
+
+def put(key, html, validators=None):
+    """
+    Stores html as the latest page for key.
+
+    :param str key: Cache key, one per scraper (see Venue.cache_key).
+    :param str html: The raw HTML the scraper is about to parse.
+    :param dict validators: The page's ETag/Last-Modified (see
+                            scrapers.fetch), kept for get_validators.
+    :returns: The SHA-256 hex digest the page is stored under.
+    """
+
+    data = html.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+
+    with _lock:
+        os.makedirs(PAGES_DIR, exist_ok=True)
+        if not os.path.exists(_blob_path(digest)):
+            tmp_path = _blob_path(digest) + '.tmp'
+            with gzip.open(tmp_path, 'wb') as blob_file:
+                blob_file.write(data)
+            os.replace(tmp_path, _blob_path(digest))
+
+        index = _read_index()
+        old_digest = index.get(key, {}).get('sha256')
+        index[key] = {'sha256': digest, 'fetched': time.time()}
+        if validators:
+            index[key]['validators'] = validators
+        _write_index(index)
+
+        # drop the replaced page unless another key still points at it
+        still_used = {entry['sha256'] for entry in index.values()}
+        if old_digest and old_digest not in still_used:
+            try:
+                os.remove(_blob_path(old_digest))
+            except OSError:
+                pass
+
+    return digest
+
+
+def get(key, max_age=None):
+    """
+    Returns the cached page for key.
+
+    :param str key: Cache key, one per scraper (see Venue.cache_key).
+    :param max_age: If given, pages fetched more than max_age seconds ago
+                    count as missing.
+    :raises CacheMiss: If there is no (fresh enough) page for key.
+    """
+
+    with _lock:
+        entry = _read_index().get(key)
+        if entry is None:
+            raise CacheMiss("No cached page for {}".format(key))
+        if max_age is not None and time.time() - entry['fetched'] > max_age:
+            raise CacheMiss("Cached page for {} is older than {}s".format(key, max_age))
+        try:
+            with gzip.open(_blob_path(entry['sha256']), 'rb') as blob_file:
+                return blob_file.read().decode('utf-8')
+        except IOError:
+            raise CacheMiss("Cached page for {} is missing from disk".format(key))
+
+
+
+def get_validators(key):
+    """
+    Returns the validators stored with the cached page for key, or None, so
+    a replayed page's can be saved once its shows are written.
+    """
+
+    with _lock:
+        return _read_index().get(key, {}).get('validators')
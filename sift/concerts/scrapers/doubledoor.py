@@ -4,10 +4,9 @@
 import calendar, datetime, iso8601, os, pytz, sys, time
 from collections import namedtuple
 
-import requests
 from bs4 import BeautifulSoup as bs
 
-from .venue import Venue
+from .venue import Venue, class_strainer
 
 TODAY = datetime.datetime.today()
 
@@ -20,30 +19,27 @@ class DoubleDoor(Venue):
     http://doubledoor.com
     """
 
+    parse_only = class_strainer('rhino-event-wrapper')
+
     def __init__(self):
         super().__init__()
         self.venue_name = 'Double Door'
         self.url = 'http://doubledoor.com'
 
-    def load_live_shows(self):
+    def fetch_html(self, conditional=False):
         """
-        Scrapes the venue's concerts schedule page and populates
-        self.shows list with ShowTuples, if not self.shows.
+        See Venue.fetch_html.
+
+        Double Door wants a browser user agent.
         """
 
-        if not self.shows:
-            # thanks, obama
-            user_agent = ("Mozilla/5.0 (Windows NT 6.3; rv:36.0) "
-                          "Gecko/20100101 Firefox/36.0"
-            )
-            headers = {'user-agent': user_agent}
-
-            venue_html = requests.get(self.url, headers=headers)
-            venue_html.raise_for_status()
-            venue_html = venue_html.text
-            self.make_shows(venue_html)
-        else:
-            print("Shows list already populated")
+        # thanks, obama
+        user_agent = ("Mozilla/5.0 (Windows NT 6.3; rv:36.0) "
+                      "Gecko/20100101 Firefox/36.0"
+        )
+        headers = {'user-agent': user_agent}
+
+        return self.fetch_page(headers=headers, conditional=conditional)
 
 
     def get_summaries(self, html):
@@ -53,7 +49,7 @@ class DoubleDoor(Venue):
         html dump > '.rhino-event-wrapper'
         """
 
-        show_summaries = bs(html, 'html.parser').select('.rhino-event-wrapper')
+        show_summaries = self.make_soup(html).select('.rhino-event-wrapper')
         return show_summaries
 
 
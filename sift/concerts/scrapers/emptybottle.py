@@ -4,10 +4,9 @@
 import calendar, datetime, iso8601, os, pytz, sys, time
 from collections import namedtuple
 
-import requests
 from bs4 import BeautifulSoup as bs
 
-from .venue import Venue
+from .venue import Venue, class_strainer
 
 TODAY = datetime.datetime.today()
 
@@ -20,6 +19,8 @@ class EmptyBottle(Venue):
     http://emptybottle.com
     """
 
+    parse_only = class_strainer('show_summary')
+
     def __init__(self):
         super().__init__()
         self.venue_name = 'The Empty Bottle'
@@ -32,7 +33,7 @@ class EmptyBottle(Venue):
         html dump > '.show_summary'
         """
 
-        show_summaries = bs(html, 'html.parser').select('.show_summary')
+        show_summaries = self.make_soup(html).select('.show_summary')
         return show_summaries
 
 
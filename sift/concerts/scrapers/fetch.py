@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""
+concerts/scrapers/fetch.py
+
+Shared HTTP layer for the venue scrapers.
+
+All requests go through one pooled requests.Session (keep-alive, gzip,
+timeouts, and retries with backoff on connection errors and 5xx responses).
+
+The ETag and Last-Modified headers of every schedule page are kept in a
+small JSON file, so a conditional fetch can ask the venue site whether the
+page changed since the last scrape.  An unchanged page comes back as a 304
+with no body, and fetch returns None so the caller can skip parsing.
+
+fetch returns a page's validators along with its text rather than saving
+them: the caller saves them with save_validators once the page's shows are
+stored, so a page that failed to parse or write (or a --dry-run) is fetched
+in full next time.
+"""
+
+import json, os, threading
+from collections import namedtuple
+
+from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+CACHE_DIR = settings.SIFT_CACHE_DIR
+VALIDATORS_PATH = os.path.join(CACHE_DIR, 'validators.json')
+
+# (connect, read) seconds
+TIMEOUT = (10, 30)
+POOL_SIZE = 10
+RETRY = Retry(
+    total=3,
+    backoff_factor=1,
+    status_forcelist=(500, 502, 503, 504),
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+_validators = None
+_validators_lock = threading.Lock()
+
+Page = namedtuple('Page', 'text validators')
+
+
+def get_session():
+    """Returns the process-wide requests.Session used for venue fetches."""
+
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=POOL_SIZE,
+                pool_maxsize=POOL_SIZE,
+                max_retries=RETRY,
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+            _session = session
+    return _session
+
+
+def _load_validators():
+    global _validators
+
+    if _validators is None:
+        try:
+            with open(VALIDATORS_PATH) as validators_file:
+                _validators = json.load(validators_file)
+        except (IOError, ValueError):
+            _validators = {}
+    return _validators
+
+
+def get_validators(url):
+    """Returns the saved {'etag': ..., 'last_modified': ...} for url."""
+
+    with _validators_lock:
+        return dict(_load_validators().get(url, {}))
+
+
+def response_validators(response_headers):
+    """Returns the {'etag': ..., 'last_modified': ...} of a response."""
+
+    validators = {}
+    if response_headers.get('ETag'):
+        validators['etag'] = response_headers['ETag']
+    if response_headers.get('Last-Modified'):
+        validators['last_modified'] = response_headers['Last-Modified']
+    return validators
+
+
+def save_validators(url, validators):
+    """Saves validators (from a fetched Page) for conditional fetches of url."""
+
+    with _validators_lock:
+        saved = _load_validators()
+        if saved.get(url) == validators:
+            return
+        saved[url] = validators
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = VALIDATORS_PATH + '.tmp'
+        with open(tmp_path, 'w') as validators_file:
+            json.dump(saved, validators_file, indent=2, sort_keys=True)
+        os.replace(tmp_path, VALIDATORS_PATH)
+
+
+def fetch(url, headers=None, conditional=False):
+    """
+    GETs url with the shared session and returns the page.
+
+    :param str url: Page to fetch.
+    :param dict headers: Extra request headers.
+    :param bool conditional: If True, send If-None-Match/If-Modified-Since
+                             from the saved validators of url.
+    :returns: A Page of the response text and its validators (not saved;
+              see save_validators), or None if the page is unchanged (304).
+    :raises requests.HTTPError: On a 4xx response, or a 5xx not retried.
+    :raises requests.exceptions.RetryError: When a 5xx response is still
+                                            returned after the retries.
+    :raises requests.ConnectionError: When the site can't be reached after
+                                      the retries.
+    """
+
+    request_headers = dict(headers or {})
+    if conditional:
+        validators = get_validators(url)
+        if 'etag' in validators:
+            request_headers['If-None-Match'] = validators['etag']
+        if 'last_modified' in validators:
+            request_headers['If-Modified-Since'] = validators['last_modified']
+
+    response = get_session().get(url, headers=request_headers, timeout=TIMEOUT)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+
+    return Page(response.text, response_validators(response.headers))
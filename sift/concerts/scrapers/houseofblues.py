@@ -4,10 +4,10 @@
 import calendar, datetime, iso8601, os, pytz, sys, time
 from collections import namedtuple
 
-import requests
 from bs4 import BeautifulSoup as bs
 
-from .venue import Venue
+from .browser import wait_for_content
+from .venue import IndexedSummary, Venue, class_strainer
 
 TODAY = datetime.datetime.today()
 
@@ -20,27 +20,28 @@ class HouseOfBlues(Venue):
     http://houseofblues.com/chicago/
     """
 
+    parse_only = class_strainer('c-calendar-list__item')
+
     def __init__(self):
         super().__init__()
         self.venue_name = 'House of Blues'
         self.url = 'http://houseofblues.com/chicago'
 
-    def load_live_shows(self):
+    def fetch_html(self, conditional=False):
         """
-        Scrapes the venue's concerts schedule page and populates
-        self.shows list with ShowTuples, if not self.shows.
+        See Venue.fetch_html.
+
+        Returns the concatenated list-view HTML of the current month plus
+        the next two, rendered with selenium.  conditional is ignored;
+        rendered pages are always loaded.
         """
 
-        if not self.shows:
+        SHOW_SELECTOR = '.c-calendar-list__item'
 
-            from selenium import webdriver
-            from selenium.webdriver.common.by import By
-            from selenium.webdriver.support.ui import WebDriverWait
-            from selenium.webdriver.support import expected_conditions as EC
+        venue_html_list = []
+        month_snapshot = None
 
-            driver = webdriver.PhantomJS()
-            driver.set_window_size(1221, 686)
-            driver.delete_all_cookies()
+        with self.browser() as driver:
             driver.get(self.url)
 
             # set to list view
@@ -50,30 +51,20 @@ class HouseOfBlues(Venue):
             next_month_xpath = '//*[@id="content"]/div[2]/div/section/header[1]/h2/a[2]/i'
             next_month_button = driver.find_element_by_xpath(next_month_xpath)
 
-            venue_html_list = []
-            
-            # http://docs.seleniumhq.org/docs/04_webdriver_advanced.jsp#explicit-and-implicit-waits
-            def _wait_function():
-                time.sleep(3)
-                # Getting duplicates with the selenium wait function..
-                # WebDriverWait(driver, 10).until(
-                #     EC.presence_of_element_located((By.CLASS_NAME, "c-calendar-list__item")))
-
-            try:
-                # grab current month plus next two
-                for _ in range(3):
-                    list_button.click()
-                    _wait_function()
-                    venue_html_list.append(driver.page_source)
-                    next_month_button.click()
-                    _wait_function()
-            finally:
-                driver.quit()
-
-            self.make_shows('\n'.join(venue_html_list))
+            # grab current month plus next two
+            for _ in range(3):
+                list_button.click()
+                # wait for this month's list, not the one grabbed last time
+                month_snapshot = wait_for_content(
+                    driver, SHOW_SELECTOR, previous=month_snapshot
+                )
+                venue_html_list.append(driver.page_source)
+                next_month_button.click()
+                wait_for_content(
+                    driver, SHOW_SELECTOR, previous=month_snapshot, allow_empty=True
+                )
 
-        else:
-            print("Shows list already populated")                
+        return '\n'.join(venue_html_list)
 
 
     def get_summaries(self, html):
@@ -84,7 +75,9 @@ class HouseOfBlues(Venue):
         And some page manipulation to get a couple months' worth of concerts.
         """
 
-        all_summaries = bs(html, 'html.parser').select('.c-calendar-list__item')
+        all_summaries = self.make_soup(html).select('.c-calendar-list__item')
+        # index each candidate once; make_shows reuses the index
+        all_summaries = [IndexedSummary(summary) for summary in all_summaries]
 
         # "main" concerts at HoB will have 'Find Tickets Now' and
         # 'Event Details' buttons; filter everything else
@@ -12,9 +12,9 @@ define which venue is selected by selenium.
 import calendar, datetime, iso8601, os, pytz, sys, time
 from collections import namedtuple
 
-import requests
 from bs4 import BeautifulSoup as bs
 
+from .browser import wait_for_content
 from .venue import Venue
 
 TODAY = datetime.datetime.today()
@@ -24,8 +24,8 @@ class LHSTParent(Venue):
     Scraper object for Lincoln Hall and Schubas Tavern.
 
     The venues share a website, and so the scraping particulars can be defined
-    here mostly, with the subclasses overriding load_live_shows to select
-    their particular venue via selenium.
+    here mostly, with the subclasses setting VENUE_CLASS_NAME to pick out
+    their particular venue's shows.
 
     http://www.lh-st.com/
     """
@@ -40,83 +40,65 @@ class LHSTParent(Venue):
     def _build_html_blob(self):
         """
         For sites that display one month at a time.
-        Returns a concatenated blob of html for some number of months. 
-        """
+        Returns a concatenated blob of html for some number of months.
 
-        from selenium import webdriver
-        from selenium.webdriver.common.by import By
-        from selenium.webdriver.support.ui import WebDriverWait
-        from selenium.webdriver.support import expected_conditions as EC
+        The blob holds both venues' shows; get_summaries picks out the ones
+        for VENUE_CLASS_NAME.
+        """
 
+        SHOW_SELECTOR = '.showItem'
         CURRENT_MONTH_XPATH = '//*[@id="monthFilter"]/a[2]'
         NEXT_MONTH_XPATH = '//*[@id="monthFilter"]/a[3]'
         NEXT_NEXT_MONTH_XPATH = '//*[@id="monthFilter"]/a[4]'
 
-        driver = webdriver.PhantomJS()
-        driver.set_window_size(1221, 686)
-        driver.delete_all_cookies()
-        driver.get(self.url)
-
-
-        # http://docs.seleniumhq.org/docs/04_webdriver_advanced.jsp#explicit-and-implicit-waits
-        def _wait_function():
-            time.sleep(3)
-            # WebDriverWait(driver, 10).until(
-            #     EC.presence_of_element_located((By.CLASS_NAME, "showItem")))
-
-        def _pick_out_venue_shows(html_blob):
-            """
-            Pick out either the Lincoln Hall or Schubas shows from the blob.
-            This is all to get around the failure to filter by Selenium.
-            """
-
-            soup = bs(html_blob, 'html.parser')
-            shows = soup.select(self.VENUE_CLASS_NAME)
-            shows_html = '\n'.join((show.__str__() for show in shows))
-            return shows_html
+        venue_html_list = []
+        month_snapshot = None
 
+        with self.browser() as driver:
+            driver.get(self.url)
 
-        venue_html_list = []
-        current_month_button = driver.find_element_by_xpath(CURRENT_MONTH_XPATH)
-        next_month_button = driver.find_element_by_xpath(NEXT_MONTH_XPATH)
-        next_next_month_button = driver.find_element_by_xpath(NEXT_NEXT_MONTH_XPATH)
-        month_buttons = (current_month_button, next_month_button, next_next_month_button)
+            current_month_button = driver.find_element_by_xpath(CURRENT_MONTH_XPATH)
+            next_month_button = driver.find_element_by_xpath(NEXT_MONTH_XPATH)
+            next_next_month_button = driver.find_element_by_xpath(NEXT_NEXT_MONTH_XPATH)
+            month_buttons = (current_month_button, next_month_button, next_next_month_button)
 
-        # three months of shows
-        try:
+            # three months of shows
             for button in month_buttons:
                 button.click()
-                _wait_function()
-                shows_html = _pick_out_venue_shows(driver.page_source)
-                venue_html_list.append(shows_html)
-        finally:
-            driver.quit()
+                # wait for this month's shows, not the previous month's
+                month_snapshot = wait_for_content(
+                    driver, SHOW_SELECTOR, previous=month_snapshot
+                )
+                venue_html_list.append(driver.page_source)
 
         return('\n'.join(venue_html_list))
 
 
-    def load_live_shows(self):
+    def fetch_html(self, conditional=False):
         """
-        Scrapes the venue's concerts schedule page and populates
-        self.shows list with ShowTuples, if not self.shows.
+        See Venue.fetch_html.
+
+        Lincoln Hall and Schubas share the lh-st.com pages, so within a
+        scrape run they are loaded once and both venues filter from them.
+        conditional is ignored; pages rendered by selenium are always loaded.
         """
 
-        if not self.shows:
-            html_blob = self._build_html_blob()
-            self.make_shows(html_blob)
-        else:
-            print("Shows list already populated")
+        return self.shared_fetch(self.url, self._build_html_blob)
 
 
     def get_summaries(self, html):
         """
         See Venue.get_summaries.
 
-        html dump > '.showItem'
-        And some page manipulation to get a couple months' worth of concerts.
+        html dump > self.VENUE_CLASS_NAME > '.showItem'
+        (The venue class may be on the '.showItem' itself.)
         """
 
-        show_summaries = bs(html, 'html.parser').select('.showItem')
+        show_summaries = []
+        for venue_show in self.make_soup(html).select(self.VENUE_CLASS_NAME):
+            if 'showItem' in venue_show.get('class', []):
+                show_summaries.append(venue_show)
+            show_summaries.extend(venue_show.select('.showItem'))
         return show_summaries
 
 
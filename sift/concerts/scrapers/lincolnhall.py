@@ -6,18 +6,18 @@ Scraper class for Lincoln Hall, inheriting from the Lincoln Hall - Schubas
 Tavern shared parent, as they share a homepage (www.lh-st.com).
 
 The scraping functions should generally be the same, but the subclasses will
-define which venue is selected by selenium (via VENUE_XPATH).
+define which venue's shows are picked out (via VENUE_CLASS_NAME).
 """
 
 from .lh_st import LHSTParent
+from .venue import class_strainer
 
 class LincolnHall(LHSTParent):
     """
     Scraper object for Lincoln Hall.
 
-    The venues share a website, and so the scraping particulars can be defined
-    here mostly, with the subclasses overriding load_live_shows to select
-    their particular venue via selenium.
+    The venues share a website, and so the scraping particulars are defined
+    in LHSTParent, with VENUE_CLASS_NAME picking out this venue's shows.
 
     http://www.lh-st.com/
     """
@@ -26,4 +26,6 @@ class LincolnHall(LHSTParent):
         super().__init__()
         self.venue_name = 'Lincoln Hall'
         self.url = 'http://www.lh-st.com'
-        self.VENUE_CLASS_NAME = '.LincolnHall'
\ No newline at end of file
+        self.VENUE_CLASS_NAME = '.LincolnHall'
+        # keep this venue's elements; '.showItem's may be inside them
+        self.parse_only = class_strainer('LincolnHall')
@@ -1,12 +1,11 @@
 # -*- coding: utf-8 -*-
 # concerts/scrapers/metro.py
 
-from .venue import Venue
+from .venue import Venue, class_strainer
 
 import calendar, datetime, iso8601, os, pytz, sys, time
 from collections import namedtuple
 
-import requests
 from bs4 import BeautifulSoup as bs
 
 TODAY = datetime.datetime.today()
@@ -21,6 +20,8 @@ class Metro(Venue):
     http://metrochicago.com
     """
 
+    parse_only = class_strainer('showContainer')
+
     def __init__(self):
         super().__init__()
         self.venue_name = 'Metro'
@@ -34,7 +35,7 @@ class Metro(Venue):
         html dump > '.showContainer'
         """
 
-        show_summaries = bs(html, 'html.parser').select('.showContainer')
+        show_summaries = self.make_soup(html).select('.showContainer')
         return show_summaries
 
 
@@ -4,10 +4,9 @@
 import calendar, datetime, iso8601, os, pytz, sys, time
 from collections import namedtuple
 
-import requests
 from bs4 import BeautifulSoup as bs
 
-from .venue import Venue
+from .venue import Venue, class_strainer
 
 TODAY = datetime.datetime.today()
 
@@ -20,6 +19,8 @@ class Subterranean(Venue):
     http://www.subt.net
     """
 
+    parse_only = class_strainer('list-view-item')
+
     def __init__(self):
         super().__init__()
         self.venue_name = 'Subterranean'
@@ -32,7 +33,7 @@ class Subterranean(Venue):
         html dump > '.list-view-item'
         """
 
-        show_summaries = bs(html, 'html.parser').select('.list-view-item')
+        show_summaries = self.make_soup(html).select('.list-view-item')
         return show_summaries
 
     def get_artist_billing(self, summary):
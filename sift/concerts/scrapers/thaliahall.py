@@ -4,10 +4,9 @@
 import calendar, datetime, iso8601, os, pytz, sys, time
 from collections import namedtuple
 
-import requests
 from bs4 import BeautifulSoup as bs
 
-from .venue import Venue
+from .venue import Venue, class_strainer
 
 TODAY = datetime.datetime.today()
 
@@ -20,6 +19,8 @@ class ThaliaHall(Venue):
     http://thaliahallchicago.com/
     """
 
+    parse_only = class_strainer('event-list-item-inner')
+
     def __init__(self):
         super().__init__()
         self.venue_name = 'Thalia Hall'
@@ -32,7 +33,7 @@ class ThaliaHall(Venue):
         html dump > '.event-list-item-inner'
         """
 
-        show_summaries = bs(html, 'html.parser').select('.event-list-item-inner')
+        show_summaries = self.make_soup(html).select('.event-list-item-inner')
         return show_summaries
 
 
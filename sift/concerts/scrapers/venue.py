@@ -6,19 +6,84 @@ concerts/scrapers/venue.py
 Class definition for Venue base class.
 """
 
-import calendar, datetime, iso8601, os, pytz, sys, time
+import calendar, datetime, iso8601, os, pytz, re, sys, time
 from collections import namedtuple
+from contextlib import contextmanager
 
-import requests
 from bs4 import BeautifulSoup as bs
+from bs4 import SoupStrainer
+from bs4.element import Tag
+
+from . import cache
+from .browser import BrowserPool
+from . import fetch
 
 TODAY = datetime.datetime.today()
 
+# BeautifulSoup tree builder for every scraper: 'html.parser' (stdlib) or
+# the much faster 'lxml', if installed
+HTML_PARSER = os.environ.get('SIFT_HTML_PARSER', 'html.parser')
+
 ShowTuple = namedtuple(
                 'show',
                 'artists, venue_name, show_date, price, show_url, schedule_url'
             )
 
+# selectors IndexedSummary can answer from its index, eg. '.show_price'
+CLASS_SELECTOR_RE = re.compile(r'^\.([\w-]+)$')
+
+
+def class_strainer(class_name):
+    """
+    Returns a SoupStrainer for elements with class_name among their classes,
+    for a scraper's `parse_only`.  (While parsing, bs4 hands the strainer the
+    raw class attribute, so SoupStrainer(class_=...) alone misses elements
+    with more than one class.)
+    """
+
+    def has_class(value):
+        if value is None:
+            return False
+        if isinstance(value, str):
+            value = value.split()
+        return class_name in value
+
+    return SoupStrainer(class_=has_class)
+
+
+class IndexedSummary:
+    """
+    A show summary walked once into a {class name: [elements]} dict.
+
+    The get_* parsing methods look fields up with summary.select('.name'),
+    which re-walks the summary's whole subtree on every call.  Wrapped in
+    an IndexedSummary, those single-class lookups are answered from the
+    index instead; any other selector, and every other attribute, falls
+    through to the wrapped bs4 Tag.
+
+    :param bs4.element.Tag tag: The summary element.
+    """
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.by_class = {}
+        for element in tag.descendants:
+            if isinstance(element, Tag):
+                for class_name in element.get('class', ()):
+                    self.by_class.setdefault(class_name, []).append(element)
+
+    def select(self, selector):
+        class_match = CLASS_SELECTOR_RE.match(selector)
+        if class_match:
+            return list(self.by_class.get(class_match.group(1), ()))
+        return self.tag.select(selector)
+
+    def __getattr__(self, name):
+        return getattr(self.tag, name)
+
+    def __str__(self):
+        return str(self.tag)
+
 
 class Venue:
     """
@@ -28,25 +93,57 @@ class Venue:
     list.  The child venue classes should also define venue_name
     and url data attributes.
 
-    Complete methods include make_shows, load_live_shows, and
-    (staticmethod) make_utc_datetime.
+    Complete methods include make_shows, load_live_shows, fetch_html, and
+    (staticmethod) make_utc_datetime.  Venues whose schedule can't be
+    fetched with a plain GET override fetch_html.
+
+    Every page parsed is saved to the scrapers.cache page cache under
+    `cache_key`, along with its validators, so load_live_shows can replay
+    it later without network access.
+
+    If a conditional load finds the schedule page unchanged since the last
+    scrape, `not_modified` is set and `shows` is left empty.  A fetched
+    page's ETag/Last-Modified are kept in `validators` until the caller has
+    stored the shows and calls save_validators.
+
+    Scrapers that need a headless browser get one from `browser()`, which
+    uses the run's scrapers.browser.BrowserPool when one is assigned to
+    `browser_pool`.
 
     The rest of the methods are venue-specific parsing functions, to be
-    defined by child objects.
+    defined by child objects.  get_summaries should parse with make_soup,
+    which also accepts an already-parsed document.
+
+    make_soup uses the `parser` tree builder (SIFT_HTML_PARSER by default)
+    and, if a scraper sets `parse_only` to a SoupStrainer for its show
+    containers, builds only those parts of the page.
     """
 
     show_fac = ShowTuple
+    browser_pool = None
+    # walk each summary once into an IndexedSummary before field extraction
+    single_pass = True
+    parser = HTML_PARSER
+    # SoupStrainer limiting make_soup to the schedule's show elements
+    parse_only = None
 
     # TODO remove venue_id logic, now tracked in models
     def __init__(self, **kwargs):
         self.shows = []
         self.venue_id = 99
+        self.not_modified = False
+        self.validators = None
 
     def __str__(self):
         return "{0} -- {1} current shows".format(
             self.venue_name, len(self.shows)
         )
 
+    @property
+    def cache_key(self):
+        """Key for this scraper's pages in scrapers.cache."""
+        return type(self).__name__
+
 
     def get_summaries(self, html):
         """
@@ -148,19 +245,43 @@ class Venue:
         raise NotImplementedError("get_show_url is venue-specific")
 
 
-    def make_shows(self, html):
+    def make_soup(self, html):
+        """
+        Returns html parsed with BeautifulSoup (self.parser, limited to
+        self.parse_only), or html itself if it is already a parsed document
+        or element.
+        """
+
+        if isinstance(html, Tag):
+            return html
+        return bs(html, self.parser, parse_only=self.parse_only)
+
+
+    def make_shows(self, html, single_pass=None):
         """
         Venue's show creation function, called by self.load_live_shows.
         Parses the scraped HTML and adds ShowTuple named tuples to the
-        object's self.shows list.
-     
-        :param str html: HTML scraped from the venue's concerts page.
+        object's self.shows list, skipping duplicates.
+
+        :param html: HTML scraped from the venue's concerts page, or the
+                     page already parsed with BeautifulSoup.
+        :param bool single_pass: Index each summary once (IndexedSummary)
+                                 before extracting fields.  Defaults to
+                                 self.single_pass.
         """
 
+        if single_pass is None:
+            single_pass = self.single_pass
+
         summaries = self.get_summaries(html)
+        # multi-page scrapes can pick up the same show twice
+        seen = set(self.shows)
 
         for summary in summaries:
 
+            if single_pass and not isinstance(summary, IndexedSummary):
+                summary = IndexedSummary(summary)
+
             artists = self.get_artist_billing(summary)
             venue_name, venue_id = self.get_venue_info(summary)
             show_date = self.get_show_date(summary)
@@ -173,19 +294,112 @@ class Venue:
                 show_url=show_url, schedule_url=self.url,
             )
 
+            if show_tup in seen:
+                continue
+            seen.add(show_tup)
             self.shows.append(show_tup)
 
 
-    def load_live_shows(self):
+    @contextmanager
+    def browser(self):
+        """
+        Yields a headless browser from self.browser_pool, or a one-off
+        browser that is quit afterwards if no pool is assigned.
+        """
+
+        if self.browser_pool is not None:
+            with self.browser_pool.driver() as driver:
+                yield driver
+        else:
+            with BrowserPool(size=1) as pool, pool.driver() as driver:
+                yield driver
+
+
+    def shared_fetch(self, key, load):
+        """
+        Returns load(), sharing the result with other scrapers in the same
+        run that ask for the same key.
+        """
+
+        if self.browser_pool is not None:
+            return self.browser_pool.shared(key, load)
+        return load()
+
+
+    def fetch_html(self, conditional=False):
+        """
+        Fetches the HTML of the venue's concerts schedule page.
+
+        :param bool conditional: Return None if the page is unchanged since
+                                 the last scrape (see scrapers.fetch).
+        :returns: The page HTML, or None if unchanged.
+        """
+
+        return self.fetch_page(conditional=conditional)
+
+
+    def fetch_page(self, headers=None, conditional=False):
+        """
+        Fetches self.url with scrapers.fetch, keeping the page's validators
+        in self.validators.
+
+        :param dict headers: Extra request headers.
+        :param bool conditional: See fetch_html.
+        :returns: The page HTML, or None if unchanged.
+        """
+
+        page = fetch.fetch(self.url, headers=headers, conditional=conditional)
+        if page is None:
+            return None
+        self.validators = page.validators
+        return page.text
+
+
+    def save_validators(self):
+        """
+        Saves the validators of the page the shows were parsed from, so the
+        next conditional load can skip it if unchanged.  Call once the shows
+        are stored.
+        """
+
+        if self.validators is not None:
+            fetch.save_validators(self.url, self.validators)
+
+
+    def load_live_shows(self, conditional=False, replay=False, max_age=None):
         """
         Scrapes the venue's concerts schedule page and populates
         self.shows list with ShowTuples if none exist yet.
+
+        :param bool conditional: Skip parsing if the page is unchanged since
+                                 the last scrape (see scrapers.fetch).
+        :param bool replay: Parse the cached page instead of fetching;
+                            raises scrapers.cache.CacheMiss if there is none.
+        :param max_age: If given, parse the cached page instead of fetching
+                        when it is at most max_age seconds old.
         """
 
-        if not self.shows:
-            venue_html = requests.get(self.url)
-            venue_html.raise_for_status()
-            venue_html = venue_html.text
-            self.make_shows(venue_html)
+        if self.shows:
+            print("This object seems to have shows already")
+            return
+
+        venue_html = None
+        if replay:
+            venue_html = cache.get(self.cache_key)
+        elif max_age is not None:
+            try:
+                venue_html = cache.get(self.cache_key, max_age=max_age)
+            except cache.CacheMiss:
+                pass
+
+        if venue_html is None:
+            venue_html = self.fetch_html(conditional=conditional)
+            if venue_html is None:
+                self.not_modified = True
+                return
+            cache.put(self.cache_key, venue_html, self.validators)
         else:
-            print("This object seems to have shows already")
\ No newline at end of file
+            # as they were when the cached page was fetched
+            self.validators = cache.get_validators(self.cache_key)
+
+        self.make_shows(venue_html)
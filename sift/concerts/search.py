@@ -0,0 +1,231 @@
+"""
+concerts/search.py
+
+Search over concert billings, venue names, and artist names, for the
+Search and SearchJson views.
+
+A query is split into words, and a concert matches when every word starts
+a word of its billing or is part of its venue's name; artists match when
+every word starts a word of their name.  Concerts come back best match
+first (then by date), a page at a time, and tracked artists alongside the
+first page.
+
+On PostgreSQL, billings and artist names are matched with full-text search
+(to_tsvector('simple', ...) against a prefix to_tsquery) and ranked with
+ts_rank, using the GIN expression indexes of db_indexes.SEARCH_INDEXES.
+Django 1.9 has no full-text lookups (django.contrib.postgres.search came
+in 1.10), so the expressions are added with extra().  Venues are few, so
+they're matched by substring on every database.
+
+Other databases (SQLite in development) search the BillingTokens of
+concerts.billing instead: every word of a normalized billing starts one
+token, so a word prefix is a range scan of the token index.  Concerts with
+an act named exactly the query come first there, then the rest by date.
+A narrow search lists the few concerts with a matching token and sorts
+them; a broad one (every word matching at least WALK_MIN_MATCHES tokens or
+venue concerts) would sort a large part of the table, so the concerts are
+walked in date order instead, checking each one, until a page is found.
+On benchmark_search's 100,000 concerts, that keeps every search under
+30 ms, where substring matching (icontains) took 40-110 ms.
+"""
+
+import re
+from collections import namedtuple
+
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+
+# results per page, and tracked artists listed with the first page
+PAGE_SIZE = 20
+ARTIST_LIMIT = 10
+# words past this are ignored
+MAX_TERMS = 8
+# fallback searches whose rarest word starts at least this many billing
+# tokens, or names venues with this many concerts, walk the concerts in
+# date order rather than list the matches
+WALK_MIN_MATCHES = 5000
+
+TERM_RE = re.compile(r'[^\W_]+')
+
+SearchPage = namedtuple('SearchPage', 'query concerts artists page has_next')
+
+
+def search_terms(query):
+    """Returns the distinct lowercased words of a search query, in order."""
+
+    terms = []
+    for term in TERM_RE.findall(query.lower()):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def prefix_tsquery(terms, operator='&'):
+    """
+    Returns a to_tsquery() string matching words that start with the terms.
+    Terms come from search_terms, so they hold no tsquery syntax.
+    """
+
+    return ' {} '.format(operator).join('{}:*'.format(term) for term in terms)
+
+
+def _venue_ids(term):
+    from .models import Venue
+
+    return list(Venue.objects.filter(name__icontains=term).values_list('id', flat=True))
+
+
+def _postgres_concerts(concerts, terms):
+    table = concerts.model._meta.db_table
+    vector = "to_tsvector('simple', {}.billing)".format(table)
+    where = []
+    params = []
+    for term in terms:
+        condition = "{} @@ to_tsquery('simple', %s)".format(vector)
+        params.append(prefix_tsquery([term]))
+        venue_ids = _venue_ids(term)
+        if venue_ids:
+            condition = '({} OR {}.venue_id IN ({}))'.format(
+                condition, table, ', '.join(['%s'] * len(venue_ids))
+            )
+            params += venue_ids
+        where.append(condition)
+    return concerts.extra(
+        select={'rank': "ts_rank({}, to_tsquery('simple', %s))".format(vector)},
+        select_params=[prefix_tsquery(terms, '|')],
+        where=where,
+        params=params,
+    )
+
+
+def _postgres_artists(artists, terms):
+    vector = "to_tsvector('simple', {}.name)".format(artists.model._meta.db_table)
+    tsquery = prefix_tsquery(terms)
+    return artists.extra(
+        select={'rank': "ts_rank({}, to_tsquery('simple', %s))".format(vector)},
+        select_params=[tsquery],
+        where=["{} @@ to_tsquery('simple', %s)".format(vector)],
+        params=[tsquery],
+    )
+
+
+def _prefix_range(prefix):
+    """Returns the (start, end) range of strings starting with prefix."""
+
+    # the smallest string sorting after every string starting with prefix
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _fallback_matches(concerts, terms):
+    from .models import BillingToken
+
+    tokens = BillingToken.objects.all()
+    ranges = [_prefix_range(term) for term in terms]
+    venues = [_venue_ids(term) for term in terms]
+    # estimates, counted from the indexes alone
+    walk = all(
+        tokens.filter(token__gte=start, token__lt=end).count()
+        + (concerts.model.objects.filter(venue_id__in=venue_ids).count() if venue_ids else 0)
+        >= WALK_MIN_MATCHES
+        for (start, end), venue_ids in zip(ranges, venues)
+    )
+
+    for (start, end), venue_ids in zip(ranges, venues):
+        if walk:
+            # Django 1.9 has no Exists(), so the correlated subquery is
+            # added with extra()
+            condition = (
+                'EXISTS (SELECT 1 FROM {tokens} WHERE {tokens}.concert_id = {table}.id'
+                ' AND {tokens}.token >= %s AND {tokens}.token < %s)'
+            ).format(tokens=BillingToken._meta.db_table, table=concerts.model._meta.db_table)
+            params = [start, end]
+            if venue_ids:
+                condition = '({} OR {}.venue_id IN ({}))'.format(
+                    condition, concerts.model._meta.db_table, ', '.join(['%s'] * len(venue_ids))
+                )
+                params += venue_ids
+            concerts = concerts.extra(where=[condition], params=params)
+        else:
+            condition = Q(pk__in=tokens.filter(
+                token__gte=start, token__lt=end
+            ).values('concert_id'))
+            if venue_ids:
+                condition |= Q(venue_id__in=venue_ids)
+            concerts = concerts.filter(condition)
+    return concerts
+
+
+def _fallback_concerts(concerts, query, offset, limit):
+    """
+    Returns up to limit concerts matching query from offset: the ones with
+    an act named exactly query first, with rank 1, then the rest, rank 0.
+    """
+
+    from .billing import normalize_name
+    from .models import BillingToken
+
+    # normalized as the billings were, so "The Thermals" finds "thermals"
+    query = normalize_name(query)
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    concerts = concerts.select_related('venue').order_by('date_time', 'id')
+    exact_ids = BillingToken.objects.filter(word=0, token=query).values('concert_id')
+    exact = list(concerts.filter(pk__in=exact_ids))
+    rows = exact[offset:offset + limit]
+    for concert in rows:
+        concert.rank = 1
+    if len(rows) < limit:
+        start = max(0, offset - len(exact))
+        rest = _fallback_matches(concerts, terms).exclude(pk__in=exact_ids)
+        for concert in rest[start:start + limit - len(rows)]:
+            concert.rank = 0
+            rows.append(concert)
+    return rows
+
+
+def _fallback_artists(artists, query, terms):
+    for term in terms:
+        artists = artists.filter(name__icontains=term)
+    return artists.annotate(rank=Case(
+        When(name__iexact=query, then=Value(2)),
+        When(name__istartswith=query, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+
+def search(query, generation=None, page=1, page_size=PAGE_SIZE):
+    """
+    Returns a SearchPage of the active concerts in the published generation
+    (or `generation`) matching query, and on the first page, the active
+    artists matching it.  Every concert and artist has a `rank`.
+    """
+
+    from .models import Artist, Concert
+
+    query = ' '.join(query.split())
+    terms = search_terms(query)
+    if not terms:
+        return SearchPage(query, [], [], page, False)
+
+    concerts = Concert.objects.published(generation).filter(is_active=True)
+    artists = Artist.objects.filter(is_active=True)
+    offset = (page - 1) * page_size
+    # one extra row says whether there is a next page
+    limit = page_size + 1
+    if connections[concerts.db].vendor == 'postgresql':
+        concerts = _postgres_concerts(concerts, terms).select_related('venue')
+        rows = list(concerts.order_by('-rank', 'date_time', 'id')[offset:offset + limit])
+        artists = _postgres_artists(artists, terms)
+    else:
+        rows = _fallback_concerts(concerts, query, offset, limit)
+        artists = _fallback_artists(artists, query, terms)
+
+    matched_artists = []
+    if page == 1:
+        matched_artists = list(artists.order_by('-rank', 'name')[:ARTIST_LIMIT])
+    return SearchPage(
+        query, rows[:page_size], matched_artists, page, len(rows) > page_size
+    )
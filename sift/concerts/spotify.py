@@ -0,0 +1,242 @@
+"""
+concerts/spotify.py
+
+Resolves artist names to Spotify artist IDs, for Artist.add_artist and the
+get_spotify_artist_ids management command.
+
+SpotifyResolver searches the Spotify Web API for each name (quoted, which
+gives a more accurate first result; eg. Boris vs. "Boris") and takes the
+first artist returned.  Results are kept in a JSON cache file keyed on the
+case-folded name, including names Spotify didn't find, which are retried
+once NOT_FOUND_TTL has passed.
+
+resolve_many looks up uncached names on a small thread pool.  Requests
+share a token bucket, so the pool never goes over `rate` requests per
+second; a 429 response pauses every worker for its Retry-After, and 5xx
+responses are retried with backoff.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('concerts')
+
+SPOTIFY_API_BASE = 'https://api.spotify.com/v1'
+CACHE_PATH = os.path.join(settings.SIFT_CACHE_DIR, 'spotify_ids.json')
+
+# names Spotify didn't find are searched again after this many seconds
+NOT_FOUND_TTL = 30 * 86400
+# requests per second, and the most that may go out back to back
+RATE = 5
+BURST = 5
+MAX_WORKERS = 4
+MAX_ATTEMPTS = 4
+# (connect, read) seconds
+TIMEOUT = (10, 30)
+
+
+class SpotifyError(Exception):
+    """The Spotify API can't be used (eg. no token) or keeps failing."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: acquire() blocks until a request may go out.
+
+    pause() holds back every caller for a while, eg. for a Retry-After.
+    clock and sleep are swappable for tests.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            self.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+            self._tokens = 0
+
+
+class IdCache:
+    """
+    Case-folded artist name -> Spotify ID, saved as JSON at path (or only
+    kept in memory if path is None).  An empty ID records a name that
+    wasn't found, and expires after NOT_FOUND_TTL.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries = {}
+        if path is not None:
+            try:
+                with open(path) as cache_file:
+                    self._entries = json.load(cache_file)
+            except (IOError, ValueError):
+                pass
+
+    def get(self, name):
+        """Returns the cached ID ('' if not found), or None if unknown."""
+
+        with self._lock:
+            entry = self._entries.get(name.casefold())
+        if entry is None:
+            return None
+        if not entry['id'] and self.clock() - entry['checked'] > NOT_FOUND_TTL:
+            return None
+        return entry['id']
+
+    def put(self, name, spotify_id):
+        with self._lock:
+            self._entries[name.casefold()] = {'id': spotify_id, 'checked': self.clock()}
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(self._entries, cache_file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+class SpotifyResolver:
+    """
+    Looks up Spotify artist IDs by name; see the module docstring.
+
+    :param token: Spotify API bearer token (default: SPOTIFY_TOKEN env var).
+    :param base_url: API root, eg. a local stub server for tests.
+    :param cache_path: JSON file of known IDs (None to keep them in memory).
+    :raises SpotifyError: If there is no token.
+    """
+
+    def __init__(self, token=None, base_url=SPOTIFY_API_BASE, cache_path=CACHE_PATH,
+                 rate=RATE, burst=BURST, max_workers=MAX_WORKERS,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.token = token or os.environ.get('SPOTIFY_TOKEN')
+        if not self.token:
+            raise SpotifyError("No SPOTIFY_TOKEN env var set. Sad!")
+        self.search_url = base_url.rstrip('/') + '/search'
+        self.cache = IdCache(cache_path)
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep)
+        self.sleep = sleep
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Authorization': 'Bearer {}'.format(self.token)})
+
+    def search(self, name):
+        """
+        Searches Spotify for name, uncached.
+
+        :returns: The first artist's ID, or '' if there were no results.
+        :raises SpotifyError: If the API keeps rate limiting or failing.
+        :raises requests.HTTPError: On any other 4xx response.
+        """
+
+        params = {'q': '"{}"'.format(name), 'type': 'artist', 'limit': 1}
+        for attempt in range(MAX_ATTEMPTS):
+            self.bucket.acquire()
+            response = self.session.get(self.search_url, params=params, timeout=TIMEOUT)
+
+            if response.status_code == 429:
+                try:
+                    retry_after = float(response.headers.get('Retry-After', 1))
+                except ValueError:
+                    retry_after = 1
+                logger.debug("Rate limited by Spotify, pausing {}s".format(retry_after))
+                self.bucket.pause(retry_after)
+                continue
+            if response.status_code >= 500:
+                self.sleep(2 ** attempt)
+                continue
+            response.raise_for_status()
+
+            items = response.json()['artists']['items']
+            if not items:
+                logger.debug("Failed to get Spotify artist ID for {}".format(name))
+                return ''
+            return items[0]['id']
+
+        raise SpotifyError("Gave up on {} after {} attempts".format(name, MAX_ATTEMPTS))
+
+    def resolve(self, name):
+        """Returns the Spotify ID for name ('' if not found), cached."""
+
+        spotify_id = self.cache.get(name)
+        if spotify_id is None:
+            spotify_id = self.search(name)
+            self.cache.put(name, spotify_id)
+            self.cache.save()
+        return spotify_id
+
+    def resolve_many(self, names):
+        """
+        Resolves names on up to max_workers threads.
+
+        :returns: A dict of name: ID ('' if not found).  Names whose search
+                  failed are logged and left out.
+        """
+
+        results = {}
+        pending = []
+        for name in set(names):
+            spotify_id = self.cache.get(name)
+            if spotify_id is None:
+                pending.append(name)
+            else:
+                results[name] = spotify_id
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(self.search, name): name for name in pending}
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        results[name] = future.result()
+                    except (SpotifyError, requests.RequestException) as e:
+                        logger.warning("Spotify search for {} failed: {}".format(name, e))
+                        continue
+                    self.cache.put(name, results[name])
+        finally:
+            self.cache.save()
+        return results
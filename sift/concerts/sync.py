@@ -0,0 +1,151 @@
+"""
+concerts/sync.py
+
+Writes scraped shows to the Concert table by diffing against what is
+already there, for the scrape_shows management command.
+
+A concert is identified by (venue, date_time, url).  Scraped shows that
+aren't in the table yet are inserted; existing concerts whose billing or
+price changed are updated in place, and flagged for re-matching if their
+billing changed; and active concerts that no longer appear on the venue's
+schedule are marked is_active=False.  Concerts that didn't change keep
+their rows, and with them their matches, so a refresh only writes what
+actually changed.
+
+The billings of new and changed concerts are split into BillingTokens
+(concerts.billing) as they're written.
+
+Everything is scoped to one generation of concerts (see DataGeneration):
+the published one when updating in place, or a staging one being built.
+"""
+
+from django.db import transaction
+from django.db.models import Q
+
+from .billing import index_billings
+from .matching import QUERY_CHUNK_SIZE
+
+
+def concert_key(venue_id, date_time, url):
+    return (venue_id, date_time, url)
+
+
+def _deactivate(concert_ids):
+    from .models import Concert
+
+    concert_ids = list(concert_ids)
+    for start in range(0, len(concert_ids), QUERY_CHUNK_SIZE):
+        Concert.objects.filter(
+            id__in=concert_ids[start:start + QUERY_CHUNK_SIZE]
+        ).update(is_active=False)
+    return len(concert_ids)
+
+
+def sync_venue_concerts(venue, misc_venue, shows, generation):
+    """
+    Writes one venue's scraped shows to the DB, in one transaction.
+
+    Shows the scraper attributes to another venue are filed under
+    misc_venue.  Since several scrapers share misc_venue, its concerts are
+    never deactivated here; see deactivate_missing.
+
+    :param venue: The concerts.models.Venue that was scraped.
+    :param misc_venue: The Venue for shows held elsewhere.
+    :param shows: The scraper's list of ShowTuples.
+    :param int generation: The generation of concerts to write to.
+    :returns: A tuple of (<dict of 'added', 'updated', 'unchanged', and
+              'deactivated' counts>, <set of misc_venue keys scraped>).
+    """
+
+    from .models import Concert
+
+    scraped = {}
+    for show in shows:
+        show_venue = venue if show.venue_name == venue.name else misc_venue
+        key = concert_key(show_venue.id, show.show_date, show.show_url)
+        # the same show listed twice keeps its first listing
+        scraped.setdefault(key, (show_venue, show))
+
+    existing = {}
+    candidates = Q(venue=venue, is_active=True)
+    if scraped:
+        # anything a scraped show could be, including deactivated concerts
+        earliest = min(show.show_date for _, show in scraped.values())
+        candidates |= Q(venue__in=(venue, misc_venue), date_time__gte=earliest)
+    # active rows first, so they win over any inactive duplicates
+    concerts = Concert.objects.published(generation).filter(candidates)
+    for concert in concerts.order_by('-is_active', 'id'):
+        existing.setdefault(
+            concert_key(concert.venue_id, concert.date_time, concert.url), concert
+        )
+
+    counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'deactivated': 0}
+    new_concerts = []
+
+    with transaction.atomic():
+        for key, (show_venue, show) in scraped.items():
+            concert = existing.get(key)
+            if concert is None:
+                new_concerts.append(Concert(
+                    billing=show.artists,
+                    venue=show_venue,
+                    date_time=show.show_date,
+                    price=show.price,
+                    url=show.show_url,
+                    generation=generation,
+                ))
+                continue
+
+            billing_changed = concert.billing != show.artists
+            if not billing_changed and concert.price == show.price and concert.is_active:
+                counts['unchanged'] += 1
+                continue
+            Concert.objects.filter(pk=concert.pk).update(
+                billing=show.artists,
+                price=show.price,
+                is_active=True,
+                # a reactivated concert's old matches may be stale too
+                needs_matching=(
+                    concert.needs_matching or billing_changed or not concert.is_active
+                ),
+            )
+            counts['updated'] += 1
+
+        Concert.objects.bulk_create(new_concerts)
+        counts['added'] = len(new_concerts)
+
+        if new_concerts or counts['updated']:
+            # bulk_create doesn't return pks, so find the new rows by flag
+            index_billings(Concert.objects.published(generation).filter(
+                venue__in=(venue, misc_venue), needs_matching=True
+            ))
+
+        counts['deactivated'] = _deactivate(
+            concert.id for key, concert in existing.items()
+            if concert.venue_id == venue.id and concert.is_active and key not in scraped
+        )
+
+    misc_keys = {key for key in scraped if key[0] == misc_venue.id}
+    return counts, misc_keys
+
+
+def deactivate_missing(venue, keys, generation):
+    """
+    Marks the venue's active concerts that aren't in keys is_active=False.
+
+    Used for misc_venue once every venue sharing it has been scraped.
+
+    :param keys: concert_key()s of the concerts still listed.
+    :param int generation: The generation of concerts to update.
+    :returns: The number of concerts deactivated.
+    """
+
+    from .models import Concert
+
+    active = Concert.objects.published(generation).filter(venue=venue, is_active=True)
+    with transaction.atomic():
+        return _deactivate(
+            concert_id
+            for concert_id, date_time, url in active.values_list('id', 'date_time', 'url')
+            if concert_key(venue.id, date_time, url) not in keys
+        )
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# concerts/tests/test_artist_import.py
+
+import datetime
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import matching
+from ..artist_import import enrich_artists, import_artists, read_artist_names
+from ..deltas import delta_chain, fixture_digest
+from ..models import Artist, Concert, ConcertMatch, DataGeneration, Venue
+from ..utils import FIXTURE_DIRS, get_latest_fixture, make_artist_regex
+
+class FakeResolver:
+
+    def __init__(self, spotify_ids):
+        self.spotify_ids = spotify_ids
+        self.batches = []
+
+    def resolve_many(self, names):
+        names = list(names)
+        self.batches.append(names)
+        return {name: self.spotify_ids.get(name, '') for name in names}
+
+class ArtistImportTest(TestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        for name, value in (
+            ('MATCHER_PATH', os.path.join(cache_dir, 'artist_matcher.pickle')),
+            ('_loaded', None),
+        ):
+            patcher = mock.patch.object(matching, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        Artist.objects.create(
+            name='Toast Test', re_string=make_artist_regex('Toast Test'),
+            spotify_id='toast123', needs_matching=False,
+        )
+
+    def test_read_artist_names(self):
+        lines = ['Wilco\n', '\n', '  # a comment\n', '  El-P  \n']
+        self.assertEqual(list(read_artist_names(lines)), ['Wilco', 'El-P'])
+
+    def test_import_dedupes_case_insensitively(self):
+        added, skipped = import_artists(['TOAST TEST', 'Wilco', 'wilco', 'El-P'])
+        self.assertEqual(added, ['Wilco', 'El-P'])
+        self.assertEqual(skipped, 2)
+        wilco = Artist.objects.get(name='Wilco')
+        self.assertEqual(wilco.re_string, '')
+        self.assertFalse(wilco.needs_matching)
+
+    def test_enrich_in_batches(self):
+        import_artists(['Wilco', 'El-P', 'Boris'])
+        resolver = FakeResolver({'Wilco': 'wilco456', 'Boris': 'boris789'})
+
+        counts = enrich_artists(resolver=resolver, batch_size=2)
+        self.assertEqual(counts, {'enriched': 3, 'spotify_ids': 2})
+        self.assertEqual(resolver.batches, [['Wilco', 'El-P'], ['Boris']])
+        el_p = Artist.objects.get(name='El-P')
+        self.assertEqual(el_p.re_string, make_artist_regex('El-P'))
+        self.assertEqual(el_p.spotify_id, '')
+        self.assertTrue(el_p.needs_matching)
+        self.assertEqual(Artist.objects.get(name='Wilco').spotify_id, 'wilco456')
+        # nothing left pending
+        self.assertEqual(enrich_artists(resolver=resolver), {'enriched': 0, 'spotify_ids': 0})
+
+    def test_pending_artists_not_matched(self):
+        venue = Venue.objects.create(
+            name='House of Bugs', address='123 Card St., Chicago, IL 60606',
+            schedule_url='http://bugs.rock'
+        )
+        concert = Concert.objects.create(
+            billing='Wilco with Toast Test', venue=venue, price='$10',
+            date_time=timezone.now() + datetime.timedelta(days=1),
+            url='http://bugs.rock/wilco', needs_matching=False,
+        )
+        import_artists(['Wilco'])
+        call_command('make_matches')
+        self.assertFalse(ConcertMatch.objects.filter(concert=concert).exists())
+
+        enrich_artists()
+        call_command('make_matches')
+        self.assertEqual(
+            set(concert.artists.values_list('name', flat=True)), {'Wilco'}
+        )
+
+    @mock.patch.dict(os.environ, {'SPOTIFY_TOKEN': ''})
+    def test_commands(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as names:
+            names.write('Wilco\ntoast test\nEl-P\n')
+        self.addCleanup(os.remove, names.name)
+        token = DataGeneration.load().token
+
+        out = io.StringIO()
+        call_command('add_artists', '--file', names.name, '--no-enrich', stdout=out)
+        self.assertIn('Added 2 new artists, skipped 1', out.getvalue())
+        self.assertNotEqual(DataGeneration.load().token, token)
+        self.assertEqual(Artist.objects.filter(re_string='').count(), 2)
+
+        out = io.StringIO()
+        call_command('enrich_artists', stdout=out)
+        self.assertIn('Enriched 2 artists', out.getvalue())
+        self.assertFalse(Artist.objects.filter(re_string='').exists())
+
+    def test_export_writes_delta(self):
+        fixture_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, fixture_dir)
+        patcher = mock.patch.dict(
+            FIXTURE_DIRS, artists=os.path.join(fixture_dir, 'artists')
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.mkdir(FIXTURE_DIRS['artists'])
+        call_command('export_fixtures', 'artists', stdout=io.StringIO())
+        base_digest = fixture_digest(get_latest_fixture('artists'))
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as names:
+            names.write('Wilco\n')
+        self.addCleanup(os.remove, names.name)
+        out = io.StringIO()
+        with mock.patch.dict(os.environ, {'SPOTIFY_TOKEN': ''}):
+            call_command('add_artists', '--file', names.name, stdout=out)
+        self.assertIn("1 added, 0 changed, 0 removed", out.getvalue())
+
+        # refresh_heroku can follow the chain to the new fixture
+        chain = delta_chain(
+            'artists', base_digest, fixture_digest(get_latest_fixture('artists'))
+        )
+        self.assertEqual(len(chain), 1)
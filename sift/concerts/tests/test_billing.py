@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# concerts/tests/test_billing.py
+
+import datetime
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from ..billing import (
+    billing_tokens, index_billings, index_matches, normalize_name, token_rows
+)
+from ..models import Artist, BillingToken, Concert, DataGeneration, Venue
+from ..scrapers.venue import ShowTuple
+from ..sync import sync_venue_concerts
+from ..utils import make_artist_regex
+
+class TokenizeTest(SimpleTestCase):
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name('At the Drive-In'), 'at the drive in')
+        self.assertEqual(normalize_name("  Guns N' Roses "), 'guns n roses')
+        self.assertEqual(normalize_name('Godspeed You! Black Emperor'),
+                         'godspeed you black emperor')
+        self.assertEqual(normalize_name('JÓNSI'), 'jónsi')
+        self.assertEqual(normalize_name('!!!'), '')
+        self.assertEqual(normalize_name('The New Pornographers'), 'new pornographers')
+
+    def test_billing_tokens(self):
+        self.assertEqual(
+            billing_tokens('An Evening with WILCO (Acoustic), El-P / Boris w/ Wilco'),
+            ['an evening', 'wilco', 'acoustic', 'el p', 'boris'],
+        )
+        self.assertEqual(billing_tokens('Withered Hand'), ['withered hand'])
+        self.assertEqual(billing_tokens('!!! (Chk Chk Chk)'), ['chk chk chk'])
+        self.assertEqual(
+            billing_tokens('CHELSEA GRIN – Tour * GIDEON; Simon & Garfunkel'),
+            ['chelsea grin', 'tour', 'gideon', 'simon garfunkel', 'simon', 'garfunkel'],
+        )
+
+    def test_token_rows(self):
+        self.assertEqual(
+            token_rows('Godspeed You! Black Emperor w/ Black Emperor'),
+            [('godspeed you black emperor', 0), ('black emperor', 0),
+             ('you black emperor', 1), ('emperor', 3)],
+        )
+
+class IndexMatchingTest(TestCase):
+
+    def setUp(self):
+        self.venue = Venue.objects.create(
+            name='House of Bugs', address='123 Card St., Chicago, IL 60606',
+            schedule_url='http://bugs.rock'
+        )
+        self.toast = self._make_artist('Toast Test')
+        self.wilco = self._make_artist('Wilco')
+        self.concert = self._make_concert('Toast Test w/ The Toe Jam', 1)
+        self.tribute = self._make_concert('The Wilco Tribute', 2)
+
+    def _make_artist(self, name):
+        return Artist.objects.create(
+            name=name, re_string=make_artist_regex(name), normalized_name=normalize_name(name)
+        )
+
+    def _make_concert(self, billing, day):
+        return Concert.objects.create(
+            billing=billing, venue=self.venue, price='Free.99',
+            date_time=timezone.now() + datetime.timedelta(days=day),
+            url='http://bugs.rock/{}'.format(day),
+        )
+
+    def _matched_pairs(self):
+        return set(Concert.artists.through.objects.values_list('concert', 'artist'))
+
+    def test_index_matches(self):
+        index_billings(Concert.objects.all())
+        self.assertEqual(
+            set(BillingToken.objects.filter(concert=self.concert).values_list('token', 'word')),
+            {('toast test', 0), ('test', 1), ('toe jam', 0), ('jam', 1)},
+        )
+        self.assertEqual(
+            index_matches(BillingToken.objects.all(), Artist.objects.all()),
+            [(self.concert.id, self.toast.id)],
+        )
+        self.assertEqual(
+            index_matches(BillingToken.objects.all(), Artist.objects.filter(pk=self.wilco.pk)),
+            [],
+        )
+
+    def test_make_matches_index_strategy(self):
+        # the concerts were created without tokens, and the artists' names
+        # normalized only once they have a regex
+        Artist.objects.update(normalized_name='')
+        call_command('make_matches', strategy='index')
+        self.assertEqual(self._matched_pairs(), {(self.concert.id, self.toast.id)})
+        self.assertEqual(Artist.objects.get(pk=self.wilco.pk).normalized_name, 'wilco')
+
+        toe_jam = self._make_artist('The Toe Jam')
+        call_command('make_matches', strategy='index')
+        self.assertEqual(
+            self._matched_pairs(),
+            {(self.concert.id, self.toast.id), (self.concert.id, toe_jam.id)},
+        )
+
+    def test_sync_writes_tokens(self):
+        misc_venue = Venue.objects.create(
+            name='Misc', address='', schedule_url=''
+        )
+        show_date = timezone.now() + datetime.timedelta(days=5)
+        shows = [ShowTuple(
+            'Wilco, Toast Test', self.venue.name, show_date, '$20',
+            'http://bugs.rock/wilco', self.venue.schedule_url,
+        )]
+        generation = DataGeneration.load().published
+        sync_venue_concerts(self.venue, misc_venue, shows, generation)
+        concert = Concert.objects.get(url='http://bugs.rock/wilco')
+        self.assertEqual(
+            set(concert.billingtoken_set.filter(word=0).values_list('token', flat=True)),
+            {'wilco', 'toast test'},
+        )
+
+        shows = [shows[0]._replace(artists='Wilco')]
+        sync_venue_concerts(self.venue, misc_venue, shows, generation)
+        self.assertEqual(
+            list(concert.billingtoken_set.values_list('token', flat=True)), ['wilco']
+        )
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# concerts/tests/test_deltas.py
+
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import matching
+from ..deltas import delta_chain, fixture_digest, read_delta, snapshot, write_delta
+from ..models import Artist, Concert, ConcertMatch, DataGeneration, Venue
+from ..utils import FIXTURE_DIRS, get_latest_fixture
+
+class DeltaFixturesTest(TestCase):
+
+    def setUp(self):
+        self.fixture_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.fixture_dir)
+        patcher = mock.patch.dict(FIXTURE_DIRS, {
+            fixture_type: os.path.join(self.fixture_dir, fixture_type)
+            for fixture_type in FIXTURE_DIRS
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for path in FIXTURE_DIRS.values():
+            os.mkdir(path)
+        for name, value in (
+            ('MATCHER_PATH', os.path.join(self.fixture_dir, 'artist_matcher.pickle')),
+            ('_loaded', None),
+        ):
+            patcher = mock.patch.object(matching, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.venue = Venue.objects.create(name='House of Bugs', address='', schedule_url='')
+        self.toast = Artist.objects.create(name='Toast Test', re_string=r'\bToast Test\b')
+        self.gone_artist = Artist.objects.create(name='Gone', re_string=r'\bGone\b')
+        self.date_time = timezone.now().replace(microsecond=0)
+        self.toast_show = self.add_concert('Toast Test', 'http://bugs.rock/1')
+        self.gone_show = self.add_concert('Gone', 'http://bugs.rock/2')
+        call_command('make_matches')
+
+        # as if refresh_heroku had loaded these fixtures
+        call_command('export_fixtures', stdout=io.StringIO())
+        for fixture_type in ('artists', 'concerts'):
+            DataGeneration.record_fixture(
+                fixture_type, fixture_digest(get_latest_fixture(fixture_type))
+            )
+
+    def add_concert(self, billing, url):
+        return Concert.objects.create(
+            billing=billing, venue=self.venue, date_time=self.date_time,
+            price='$10', url=url
+        )
+
+    def make_deltas(self):
+        """Changes the data on 'dev' and writes the deltas, then rolls back."""
+
+        bases = {
+            fixture_type: snapshot(fixture_type, get_latest_fixture(fixture_type))
+            for fixture_type in ('artists', 'concerts')
+        }
+        with transaction.atomic():
+            self.gone_artist.delete()
+            Artist.objects.create(name='The Toe Jam', re_string=r'\bThe Toe Jam\b')
+            Concert.objects.filter(pk=self.toast_show.pk).update(
+                billing='Toast Test w/ The Toe Jam'
+            )
+            self.gone_show.delete()
+            self.add_concert('The Toe Jam', 'http://bugs.rock/3')
+
+            call_command('export_fixtures', 'artists', 'concerts', stdout=io.StringIO())
+            counts = {
+                fixture_type: write_delta(fixture_type, base, get_latest_fixture(fixture_type))[1]
+                for fixture_type, base in bases.items()
+            }
+            transaction.set_rollback(True)
+        return counts
+
+    def test_write_delta(self):
+        counts = self.make_deltas()
+        self.assertEqual(counts['artists'], {'added': 1, 'changed': 0, 'removed': 1})
+        self.assertEqual(counts['concerts'], {'added': 1, 'changed': 1, 'removed': 1})
+
+        chain = delta_chain(
+            'concerts', DataGeneration.load().concerts_fixture,
+            fixture_digest(get_latest_fixture('concerts'))
+        )
+        self.assertEqual(len(chain), 1)
+        header, operations = read_delta(chain[0])
+        # only the changes are shipped
+        self.assertEqual(len(list(operations)), 3)
+        self.assertIsNone(delta_chain('concerts', 'unknown', header['target']))
+
+    def test_refresh_heroku_applies_deltas(self):
+        self.make_deltas()
+
+        out = io.StringIO()
+        call_command('refresh_heroku', stdout=out)
+        self.assertIn("Applying 1 concert deltas", out.getvalue())
+        self.assertIn("1 added, 1 changed, 1 removed", out.getvalue())
+
+        self.assertEqual(
+            sorted(Artist.objects.values_list('name', flat=True)),
+            ['The Toe Jam', 'Toast Test']
+        )
+        concerts = Concert.objects.published()
+        self.assertEqual(
+            sorted(concerts.values_list('billing', flat=True)),
+            ['The Toe Jam', 'Toast Test w/ The Toe Jam']
+        )
+        # updated in place, and re-matched
+        toast_show = concerts.get(pk=self.toast_show.pk)
+        self.assertEqual(
+            sorted(toast_show.artists.values_list('name', flat=True)),
+            ['The Toe Jam', 'Toast Test']
+        )
+        self.assertTrue(ConcertMatch.objects.filter(concert=toast_show).exists())
+        self.assertEqual(
+            DataGeneration.load().concerts_fixture,
+            fixture_digest(get_latest_fixture('concerts'))
+        )
+
+        # nothing left to apply
+        out = io.StringIO()
+        call_command('refresh_heroku', stdout=out)
+        self.assertIn("Applying 0 concert deltas", out.getvalue())
+
+    def test_refresh_heroku_full_load_without_deltas(self):
+        self.make_deltas()
+        DataGeneration.record_fixture('concerts', '')
+
+        out = io.StringIO()
+        call_command('refresh_heroku', stdout=out)
+        self.assertIn("into generation 1", out.getvalue())
+        self.assertEqual(
+            sorted(Concert.objects.published().values_list('billing', flat=True)),
+            ['The Toe Jam', 'Toast Test w/ The Toe Jam']
+        )
+
+    def export_with_deltas(self, *fixture_types):
+        """Exports new fixtures and their deltas, as refresh_dev does."""
+
+        bases = {
+            fixture_type: snapshot(fixture_type, get_latest_fixture(fixture_type))
+            for fixture_type in fixture_types
+        }
+        call_command('export_fixtures', *fixture_types, stdout=io.StringIO())
+        for fixture_type, base in bases.items():
+            write_delta(fixture_type, base, get_latest_fixture(fixture_type))
+
+    def test_broken_chain_falls_back_to_full_load(self):
+        with transaction.atomic():
+            self.gone_show.delete()
+            self.export_with_deltas('concerts')
+            first_delta = delta_chain(
+                'concerts', DataGeneration.load().concerts_fixture,
+                fixture_digest(get_latest_fixture('concerts'))
+            )[0]
+            self.add_concert('The Toe Jam', 'http://bugs.rock/3')
+            self.export_with_deltas('concerts')
+            transaction.set_rollback(True)
+        os.remove(first_delta)
+
+        out = io.StringIO()
+        call_command('refresh_heroku', stdout=out)
+        self.assertIn("into generation 1", out.getvalue())
+        self.assertEqual(
+            sorted(Concert.objects.published().values_list('billing', flat=True)),
+            ['The Toe Jam', 'Toast Test']
+        )
+
+    def test_concert_keys_across_delete_and_upsert(self):
+        with transaction.atomic():
+            # removed, then back under the same key in the next delta
+            self.gone_show.delete()
+            self.export_with_deltas('concerts')
+            self.add_concert('Gone', 'http://bugs.rock/2')
+            # a new URL is a new key: a delete and an upsert in one delta
+            Concert.objects.filter(pk=self.toast_show.pk).update(url='http://bugs.rock/4')
+            self.export_with_deltas('concerts')
+            transaction.set_rollback(True)
+
+        out = io.StringIO()
+        call_command('refresh_heroku', stdout=out)
+        self.assertIn("Applying 2 concert deltas", out.getvalue())
+        self.assertIn("0 added, 0 changed, 1 removed", out.getvalue())
+        self.assertIn("2 added, 0 changed, 1 removed", out.getvalue())
+        concerts = Concert.objects.published()
+        self.assertEqual(
+            sorted(concerts.values_list('billing', 'url')),
+            [('Gone', 'http://bugs.rock/2'), ('Toast Test', 'http://bugs.rock/4')]
+        )
+        self.assertFalse(concerts.filter(pk__in=[self.gone_show.pk, self.toast_show.pk]))
+        self.assertEqual(
+            sorted(ConcertMatch.objects.values_list('concert__billing', 'artists__name')),
+            [('Gone', 'Gone'), ('Toast Test', 'Toast Test')]
+        )
+
+    def test_artists_reloaded_with_concert_deltas(self):
+        with transaction.atomic():
+            # an artists export with no delta (as add_artists used to do)
+            # breaks the artists chain
+            Artist.objects.create(name='Toast', re_string=r'\bToast\b')
+            call_command('export_fixtures', 'artists', stdout=io.StringIO())
+            # then refresh_dev matches, clearing the new artist's flag, and
+            # exports the concerts with a delta
+            self.add_concert('The Toe Jam', 'http://bugs.rock/3')
+            call_command('make_matches', full=True)
+            self.export_with_deltas('artists', 'concerts')
+            transaction.set_rollback(True)
+
+        out = io.StringIO()
+        call_command('refresh_heroku', stdout=out)
+        self.assertIn("Loading artists from fixture", out.getvalue())
+        self.assertIn("Applying 1 concert deltas", out.getvalue())
+        # the unchanged concert is matched against the reloaded artists
+        toast_show = Concert.objects.published().get(pk=self.toast_show.pk)
+        self.assertEqual(
+            sorted(toast_show.artists.values_list('name', flat=True)),
+            ['Toast', 'Toast Test']
+        )
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# concerts/tests/test_fixture_io.py
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..fixture_io import iter_fixture, load_fixtures, read_fixture
+from ..models import Artist, Concert, ConcertMatch, Venue
+from ..utils import FIXTURE_DIRS, get_latest_fixture
+
+class IterFixtureTest(TestCase):
+
+    def test_matches_json_load(self):
+        path = get_latest_fixture('venues')
+        with open(path) as fixture:
+            expected = json.load(fixture)
+        with open(path) as fixture:
+            # objects straddle the reads
+            self.assertEqual(list(iter_fixture(fixture, read_size=7)), expected)
+
+    def test_empty_list(self):
+        self.assertEqual(list(iter_fixture(io.StringIO(' [ ] '))), [])
+
+    def test_malformed(self):
+        for text in ('[{"model": "concerts.venue"}', '{"model": 1}', '[[]]', '[1]'):
+            with self.assertRaises(ValueError):
+                list(iter_fixture(io.StringIO(text)))
+
+class LoadFixturesTest(TestCase):
+
+    def write_fixture(self, objects):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w') as fixture:
+            json.dump(objects, fixture)
+        return path
+
+    def fixture_objects(self):
+        return [
+            {'model': 'concerts.venue', 'pk': 1, 'fields': {
+                'name': 'House of Bugs', 'address': '', 'schedule_url': '',
+                'is_active': True,
+            }},
+            {'model': 'concerts.artist', 'pk': 1, 'fields': {
+                'name': 'Toast Test', 're_string': 'Toast Test', 'spotify_id': '',
+                'is_active': True,
+            }},
+            {'model': 'concerts.artist', 'pk': 2, 'fields': {
+                'name': 'The Toe Jam', 're_string': 'The Toe Jam', 'spotify_id': '',
+                'is_active': True,
+            }},
+            {'model': 'concerts.concert', 'pk': 5, 'fields': {
+                'billing': 'Toast Test w/ The Toe Jam', 'venue': 1,
+                'date_time': '2017-03-26T17:00:00Z', 'price': '$10',
+                'url': 'http://bugs.rock', 'date_scraped': '2017-03-25T20:48:51.092Z',
+                'is_active': True, 'artists': [1, 2],
+            }},
+        ]
+
+    def test_load_and_reload(self):
+        objects = self.fixture_objects()
+        loader = load_fixtures([self.write_fixture(objects)])
+        self.assertEqual(
+            loader.counts['concerts.Artist'], {'added': 2, 'updated': 0, 'unchanged': 0}
+        )
+        concert = Concert.objects.get(pk=5)
+        self.assertEqual(concert.venue, Venue.objects.get(name='House of Bugs'))
+        # kept as in the fixture, as loaddata does
+        self.assertEqual(concert.date_scraped.year, 2017)
+        self.assertEqual(set(concert.artists.values_list('id', flat=True)), {1, 2})
+
+        objects[2]['fields']['name'] = 'The Toe Jammers'
+        objects[3]['fields']['artists'] = [1]
+        loader = load_fixtures([self.write_fixture(objects)])
+        self.assertEqual(
+            loader.counts['concerts.Artist'], {'added': 0, 'updated': 1, 'unchanged': 1}
+        )
+        self.assertEqual(
+            loader.counts['concerts.Concert'], {'added': 0, 'updated': 0, 'unchanged': 1}
+        )
+        self.assertEqual(Artist.objects.get(pk=2).name, 'The Toe Jammers')
+        self.assertEqual(list(concert.artists.values_list('id', flat=True)), [1])
+
+        # sequences continue after the loaded pks
+        self.assertGreater(
+            Artist.objects.create(name='New', re_string='New').pk, 2
+        )
+
+    def test_prune(self):
+        objects = self.fixture_objects()
+        load_fixtures([self.write_fixture(objects)])
+        match = ConcertMatch.objects.create(concert_id=5)
+        match.artists.add(2)
+        Venue.objects.create(name='Gone', address='', schedule_url='')
+
+        # The Toe Jam and the new venue are gone from the fixture
+        path = self.write_fixture(objects[:2])
+        out = io.StringIO()
+        call_command('load_fixtures', path, stdout=out)
+        self.assertEqual(Artist.objects.count(), 2)
+
+        call_command('load_fixtures', path, prune=True, stdout=out)
+        self.assertIn("concerts.Artist: 1 removed", out.getvalue())
+        self.assertEqual(list(Artist.objects.values_list('id', flat=True)), [1])
+        self.assertEqual(list(Venue.objects.values_list('name', flat=True)), ['House of Bugs'])
+        # models not in the fixtures are left alone, but not their links
+        # to the deleted rows, nor the matches left without artists
+        concert = Concert.objects.get(pk=5)
+        self.assertEqual(list(concert.artists.values_list('id', flat=True)), [1])
+        self.assertFalse(ConcertMatch.objects.exists())
+
+    def test_matches_loaddata(self):
+        path = self.write_fixture(self.fixture_objects())
+        call_command('loaddata', path, verbosity=0)
+        expected = [list(model.objects.values_list()) for model in (Venue, Artist, Concert)]
+        Concert.objects.all().delete()
+        Artist.objects.all().delete()
+        Venue.objects.all().delete()
+
+        load_fixtures([path])
+        self.assertEqual(
+            [list(model.objects.values_list()) for model in (Venue, Artist, Concert)],
+            expected
+        )
+
+class ExportFixturesTest(TestCase):
+
+    def setUp(self):
+        self.bundled = [
+            get_latest_fixture(fixture_type)
+            for fixture_type in ('venues', 'artists', 'concerts')
+        ]
+        self.fixture_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.fixture_dir)
+        patcher = mock.patch.dict(FIXTURE_DIRS, {
+            fixture_type: os.path.join(self.fixture_dir, fixture_type)
+            for fixture_type in FIXTURE_DIRS
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for path in FIXTURE_DIRS.values():
+            os.mkdir(path)
+
+    def test_round_trip(self):
+        load_fixtures(self.bundled)
+        expected = [list(model.objects.values_list()) for model in (Venue, Artist, Concert)]
+        expected_links = list(Concert.artists.through.objects.values_list(
+            'concert_id', 'artist_id'
+        ))
+
+        out = io.StringIO()
+        call_command('export_fixtures', chunk_size=100, stdout=out)
+        self.assertIn("Exported 413 concerts", out.getvalue())
+        exported = [get_latest_fixture(fixture_type)
+                    for fixture_type in ('venues', 'artists', 'concerts')]
+        for path in exported:
+            self.assertTrue(path.endswith('.jsonl.gz'))
+        # one object per line
+        with gzip.open(exported[0], 'rt') as fixture:
+            self.assertEqual(len(fixture.readlines()), Venue.objects.count())
+
+        Concert.objects.all().delete()
+        Artist.objects.all().delete()
+        Venue.objects.all().delete()
+        load_fixtures(exported)
+        self.assertEqual(
+            [list(model.objects.values_list()) for model in (Venue, Artist, Concert)],
+            expected
+        )
+        self.assertEqual(
+            list(Concert.artists.through.objects.values_list('concert_id', 'artist_id')),
+            expected_links
+        )
+
+    def test_rotation(self):
+        artists_dir = FIXTURE_DIRS['artists']
+        for name in ('20170101_artist.json', '20170102_artist.json',
+                     '20170103_artist.jsonl.gz', '__init__.py'):
+            open(os.path.join(artists_dir, name), 'w').close()
+        Artist.objects.create(name='Toast Test', re_string='Toast Test')
+
+        call_command('export_fixtures', 'artists', keep=2, stdout=io.StringIO())
+        self.assertEqual(
+            sorted(os.listdir(artists_dir)),
+            sorted(['20170103_artist.jsonl.gz', '__init__.py',
+                    os.path.basename(get_latest_fixture('artists'))])
+        )
+        self.assertEqual(
+            [obj['fields']['name'] for obj in read_fixture(get_latest_fixture('artists'))],
+            ['Toast Test']
+        )
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# concerts/tests/test_matching.py
+
+import datetime
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .. import matching
+from ..matching import (
+    ArtistMatcher, literal_key, load_matcher, nested_loop_matches, save_matches,
+)
+from ..models import Artist, Concert, ConcertMatch, Venue
+from ..utils import make_artist_regex
+
+class ArtistMatcherTest(SimpleTestCase):
+
+    def setUp(self):
+        names = [
+            'Boris', 'Boris the Blade', 'Wilco', 'At the Drive-In', 'El-P',
+            "Godspeed You! Black Emperor", '!!!', 'Jónsi', 'Sunn O)))',
+            'A Silver Mt. Zion',
+        ]
+        self.artist_pairs = [
+            (pk, make_artist_regex(name)) for pk, name in enumerate(names, 1)
+        ]
+        self.concert_pairs = list(enumerate([
+            'BORIS THE BLADE with Boris',
+            'Wilcox Sisters, The Wilco Tribute',
+            'At The Drive In / El P',
+            "Godspeed You Black Emperor w/ A Silver Mt Zion",
+            '!!! (Chk Chk Chk), JONSI',
+            'Sunn O))) and friends',
+            'Nobody we track',
+        ], 1))
+
+    def test_literal_key(self):
+        self.assertEqual(literal_key(make_artist_regex('At the Drive-In')), 'at the drive')
+        self.assertEqual(literal_key(make_artist_regex('!!!')), '')
+        self.assertEqual(literal_key(r'\b(Foo|Bar)\b'), '')
+
+    def test_matches_nested_loop(self):
+        expected = nested_loop_matches(self.artist_pairs, self.concert_pairs)
+        found = ArtistMatcher(self.artist_pairs).match_all(self.concert_pairs)
+        self.assertEqual(sorted(found), sorted(expected))
+
+    def test_overlapping_and_boundaries(self):
+        # '!!!' reduces to \b.?.?.?\b, which matches nearly anything
+        matcher = ArtistMatcher(
+            [pair for pair in self.artist_pairs if pair[0] != 7]
+        )
+        self.assertEqual(matcher.match('BORIS THE BLADE with Boris'), {1, 2})
+        self.assertEqual(matcher.match('Wilcox Sisters'), set())
+        self.assertEqual(matcher.match('Wilco'), {3})
+
+
+class SaveMatchesTest(TestCase):
+
+    def setUp(self):
+        venue = Venue.objects.create(
+            name='House of Bugs', address='123 Card St., Chicago, IL 60606',
+            schedule_url='http://bugs.rock'
+        )
+        self.artists = [
+            Artist.objects.create(name='Artist {}'.format(i), re_string='')
+            for i in range(3)
+        ]
+        self.concerts = [
+            Concert.objects.create(
+                billing='Concert {}'.format(i), venue=venue,
+                date_time=timezone.now() + datetime.timedelta(days=i),
+                price='Free.99', url='http://bugs.rock/{}'.format(i)
+            )
+            for i in range(10)
+        ]
+
+    def test_saves_matches_and_links(self):
+        pairs = [
+            (concert.id, artist.id)
+            for concert in self.concerts for artist in self.artists[:2]
+        ]
+        # savepoint, 3 lookups, 3 inserts, a re-read of new match ids, release
+        with self.assertNumQueries(9):
+            self.assertEqual(save_matches(pairs), 20)
+
+        self.assertEqual(ConcertMatch.objects.count(), 10)
+        for concert in self.concerts:
+            self.assertEqual(
+                set(concert.artists.values_list('id', flat=True)),
+                {artist.id for artist in self.artists[:2]}
+            )
+            self.assertEqual(
+                concert.concertmatch.artists.count(), 2
+            )
+
+    def test_existing_matches_are_extended(self):
+        concert, artist, other = self.concerts[0], self.artists[0], self.artists[1]
+        save_matches([(concert.id, artist.id)])
+        save_matches([(concert.id, artist.id), (concert.id, other.id)])
+
+        self.assertEqual(ConcertMatch.objects.count(), 1)
+        self.assertEqual(concert.artists.count(), 2)
+        self.assertEqual(concert.concertmatch.artists.count(), 2)
+
+
+class IncrementalMatchingTest(TestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        for name, value in (
+            ('MATCHER_PATH', os.path.join(cache_dir, 'artist_matcher.pickle')),
+            ('_loaded', None),
+        ):
+            patcher = mock.patch.object(matching, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.venue = Venue.objects.create(
+            name='House of Bugs', address='123 Card St., Chicago, IL 60606',
+            schedule_url='http://bugs.rock'
+        )
+        self.toast = Artist.objects.create(
+            name='Toast Test', re_string=make_artist_regex('Toast Test')
+        )
+        self.concert = self._make_concert('Toast Test w/ The Toe Jam')
+
+    def _make_concert(self, billing):
+        return Concert.objects.create(
+            billing=billing, venue=self.venue, date_time=timezone.now(),
+            price='Free.99', url='http://bugs.rock/TTwTTJ'
+        )
+
+    def _matched_pairs(self):
+        return set(
+            Concert.artists.through.objects.values_list('concert', 'artist')
+        )
+
+    def test_flags_cleared_after_matching(self):
+        call_command('make_matches')
+        self.assertFalse(Concert.objects.filter(needs_matching=True).exists())
+        self.assertFalse(Artist.objects.filter(needs_matching=True).exists())
+        self.assertEqual(self._matched_pairs(), {(self.concert.id, self.toast.id)})
+
+    def test_new_rows_matched_incrementally(self):
+        call_command('make_matches')
+        toe_jam = Artist.objects.create(
+            name='The Toe Jam', re_string=make_artist_regex('The Toe Jam')
+        )
+        new_concert = self._make_concert('The Toe Jam, Toast Test')
+        call_command('make_matches')
+
+        self.assertEqual(self._matched_pairs(), {
+            (self.concert.id, self.toast.id),
+            (self.concert.id, toe_jam.id),
+            (new_concert.id, self.toast.id),
+            (new_concert.id, toe_jam.id),
+        })
+        self.assertEqual(ConcertMatch.objects.count(), 2)
+
+    def test_changed_billing_drops_stale_match(self):
+        call_command('make_matches')
+        Concert.objects.filter(id=self.concert.id).update(
+            billing='Somebody Else', needs_matching=True
+        )
+        call_command('make_matches')
+
+        self.assertEqual(self._matched_pairs(), set())
+        self.assertFalse(ConcertMatch.objects.exists())
+
+    def test_changed_artist_rematched(self):
+        call_command('make_matches')
+        self.toast.re_string = make_artist_regex('Toe Jam')
+        self.toast.save()
+        self.assertTrue(Artist.objects.get(pk=self.toast.pk).needs_matching)
+        call_command('make_matches')
+        self.assertEqual(self._matched_pairs(), {(self.concert.id, self.toast.id)})
+
+        self.toast.re_string = make_artist_regex('Somebody Else')
+        self.toast.save(update_fields=['re_string'])
+        call_command('make_matches')
+        self.assertEqual(self._matched_pairs(), set())
+
+    def test_deactivated_artist_matches_dropped(self):
+        call_command('make_matches')
+        toast = Artist.objects.get(pk=self.toast.pk)
+        toast.is_active = False
+        toast.save()
+        call_command('make_matches')
+
+        self.assertEqual(self._matched_pairs(), set())
+        self.assertFalse(ConcertMatch.objects.exists())
+        self.assertFalse(Artist.objects.filter(needs_matching=True).exists())
+
+    def test_unchanged_artist_not_flagged(self):
+        call_command('make_matches')
+        toast = Artist.objects.get(pk=self.toast.pk)
+        toast.spotify_id = '123spotify'
+        toast.save()
+        self.assertFalse(Artist.objects.get(pk=self.toast.pk).needs_matching)
+
+    def test_full_rescan(self):
+        call_command('make_matches')
+        Concert.artists.through.objects.all().delete()
+        call_command('make_matches')
+        self.assertEqual(self._matched_pairs(), set())
+        call_command('make_matches', full=True)
+        self.assertEqual(self._matched_pairs(), {(self.concert.id, self.toast.id)})
+
+
+class LoadMatcherTest(TestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.path = os.path.join(cache_dir, 'artist_matcher.pickle')
+        matching._loaded = None
+        self.addCleanup(setattr, matching, '_loaded', None)
+        self.toast = Artist.objects.create(
+            name='Toast Test', re_string=make_artist_regex('Toast Test')
+        )
+
+    def test_saved_and_reused(self):
+        matcher = load_matcher(self.path)
+        self.assertEqual(matcher.match('Toast Test w/ The Toe Jam'), {self.toast.id})
+        self.assertTrue(os.path.exists(self.path))
+
+        # a new process would read the saved copy back
+        matching._loaded = None
+        with open(self.path, 'rb') as matcher_file:
+            saved = pickle.load(matcher_file)
+        self.assertEqual(saved['matcher'].regexes, {})
+        loaded = load_matcher(self.path)
+        self.assertIsNot(loaded, matcher)
+        self.assertEqual(loaded.patterns, matcher.patterns)
+        self.assertIs(load_matcher(self.path), loaded)
+
+    def test_rebuilt_when_artists_change(self):
+        matcher = load_matcher(self.path)
+        toe_jam = Artist.objects.create(
+            name='The Toe Jam', re_string=make_artist_regex('The Toe Jam')
+        )
+        matcher = load_matcher(self.path)
+        self.assertEqual(
+            matcher.match('Toast Test w/ The Toe Jam'), {self.toast.id, toe_jam.id}
+        )
+
+        Artist.objects.filter(pk=toe_jam.pk).update(is_active=False)
+        matching._loaded = None
+        self.assertEqual(
+            load_matcher(self.path).match('Toast Test w/ The Toe Jam'), {self.toast.id}
+        )
+
+    def test_unreadable_file_rebuilt(self):
+        with open(self.path, 'wb') as matcher_file:
+            matcher_file.write(b'not a pickle')
+        self.assertEqual(load_matcher(self.path).match('Toast Test'), {self.toast.id})
+        matching._loaded = None
+        with open(self.path, 'rb') as matcher_file:
+            self.assertEqual(pickle.load(matcher_file)['format'], matching.MATCHER_FORMAT)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# concerts/tests/test_models.py
+
+from importlib import import_module
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from ..billing import token_rows
+from ..db_indexes import (
+    INDEXES, SEARCH_INDEXES, _definitions, create_indexes, drop_indexes,
+)
+from ..models import Concert, DataGeneration, Venue
+
+class QueryIndexesTest(TestCase):
+
+    def index_names(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, 'concerts_concert'
+            )
+            constraints.update(connection.introspection.get_constraints(
+                cursor, 'concerts_artist'
+            ))
+        return set(constraints)
+
+    def test_migration_creates_indexes(self):
+        expected = {name for name, table, definition in _definitions(connection)}
+        self.assertTrue(expected)
+        self.assertLessEqual(expected, self.index_names())
+
+    def test_drop_and_recreate(self):
+        expected = {name for name, table, definition in _definitions(connection)}
+        drop_indexes(connection)
+        self.assertFalse(expected & self.index_names())
+        create_indexes(connection)
+        create_indexes(connection)
+        self.assertLessEqual(expected, self.index_names())
+
+    def test_migrations_keep_their_own_definitions(self):
+        # indexes added to INDEXES later aren't created or dropped by 0007
+        migration = import_module('concerts.migrations.0007_query_indexes')
+        for name, definition in migration.QUERY_INDEXES.items():
+            self.assertEqual(INDEXES[name], definition)
+        migration = import_module('concerts.migrations.0011_search_indexes')
+        self.assertEqual(migration.SEARCH_INDEXES, SEARCH_INDEXES)
+        self.assertEqual(
+            migration.token_rows('Toast Test w/ The Toe Jam'),
+            token_rows('Toast Test w/ The Toe Jam')
+        )
+
+class DataGenerationTest(TestCase):
+
+    def test_stage_and_publish(self):
+        venue = Venue.objects.create(name='House of Bugs', address='', schedule_url='')
+
+        def add_concert(generation):
+            return Concert.objects.create(
+                billing='Toast Test', venue=venue, date_time=timezone.now(),
+                price='$10', url='http://bugs.rock', generation=generation
+            )
+
+        old = add_concert(0)
+        token = DataGeneration.load().token
+        generation = DataGeneration.stage()
+        self.assertEqual(generation, 1)
+        new = add_concert(generation)
+        self.assertEqual(list(Concert.objects.published()), [old])
+
+        DataGeneration.publish(generation)
+        self.assertEqual(list(Concert.objects.published()), [new])
+        self.assertNotEqual(DataGeneration.load().token, token)
+        # kept for requests still reading it, until the next stage()
+        self.assertTrue(Concert.objects.filter(pk=old.pk).exists())
+        self.assertEqual(DataGeneration.stage(), 2)
+        self.assertEqual(list(Concert.objects.all()), [new])
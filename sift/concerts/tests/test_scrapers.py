@@ -0,0 +1,681 @@
+# -*- coding: utf-8 -*-
+# concerts/tests/test_scrapers.py
+
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import io
+import unittest
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from .. import matching, models
+from ..scrapers import cache, fetch
+from ..scrapers.browser import BrowserPool, wait_for_content
+from ..scrapers.emptybottle import EmptyBottle
+from ..scrapers.houseofblues import HouseOfBlues
+from ..scrapers.lincolnhall import LincolnHall
+from ..scrapers.schubas import SchubasTavern
+from ..scrapers.venue import IndexedSummary, Venue
+from ..utils import SCRAPERS
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+# trimmed-down schedule markup for a few scrapers
+EMPTY_BOTTLE_PAGE = """
+<div class="show_summary">
+  <a href="http://emptybottle.com/?event_id=1">details</a>
+  <div class="show_artists">Toast Test \nThe Toe Jam</div>
+  <span class="tw-event-date">Dec 30</span><span class="tw-event-time">9:00 pm</span>
+  <div class="show_price"> $10.00 </div>
+</div>
+<div class="show_summary">
+  <a href="http://emptybottle.com/?event_id=2">details</a>
+  <div class="show_artists">Lavender Menace</div>
+  <div class="show_venue"> Thalia Hall </div>
+  <span class="tw-event-date">Dec 31</span><span class="tw-event-time">8:30 pm</span>
+  <div class="show_price">Free</div>
+</div>
+"""
+
+HOUSE_OF_BLUES_PAGE = """
+<ul>
+<li class="c-calendar-list__item">
+  <div class="c-calendar-list__date-date">Dec 30,</div>
+  <div class="c-calendar-list__date-time">7:00PM</div>
+  <div class="c-calendar-list__title">Toast Test</div>
+  <div class="c-calendar-list__venue">
+    <span class="btn-parent"><a href="http://tickets/1">Find Tickets Now</a></span>
+    <span class="btn-parent"><a href="http://hob/events/1">Event Details</a></span>
+  </div>
+</li>
+<li class="c-calendar-list__item">
+  <div class="c-calendar-list__date-date">Dec 31,</div>
+  <div class="c-calendar-list__date-time">8:00PM</div>
+  <div class="c-calendar-list__title">Private Event</div>
+  <div class="c-calendar-list__venue">Foundation Room</div>
+</li>
+</ul>
+"""
+
+LH_ST_PAGE = """
+<div class="showItem LincolnHall">
+  <div class="header">Friday Dec 30 2016</div>
+  <div class="bands">Toast Test\nThe Toe Jam</div>
+  <div class="ticketInfo">Doors 7:00 PM\nShow 8:00 PM</div>
+  <div class="avail">$15 Available</div>
+  <div class="buttons"><a href="/event/1">Buy</a></div>
+</div>
+<div class="Schubas"><div class="showItem">
+  <div class="header">Saturday Dec 31 2016</div>
+  <div class="bands">Lavender Menace</div>
+  <div class="ticketInfo">Show 9:00 PM</div>
+  <div class="avail">$12 Available</div>
+  <div class="buttons"><a href="/event/2">Buy</a></div>
+</div></div>
+"""
+
+SAMPLE_PAGES = (
+    (EmptyBottle, EMPTY_BOTTLE_PAGE),
+    (HouseOfBlues, HOUSE_OF_BLUES_PAGE),
+    (LincolnHall, LH_ST_PAGE),
+    (SchubasTavern, LH_ST_PAGE),
+)
+
+class SchedulePageHandler(http.server.BaseHTTPRequestHandler):
+    """Serves a fixed page with an ETag, answering 304 when it matches."""
+
+    etag = '"v1"'
+    body = b'<div class="show_summary">Toast Test</div>'
+    requests_seen = []
+
+    def do_GET(self):
+        SchedulePageHandler.requests_seen.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+class FetchTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self._saved = (fetch.CACHE_DIR, fetch.VALIDATORS_PATH, fetch._validators)
+        fetch.CACHE_DIR = self.cache_dir
+        fetch.VALIDATORS_PATH = os.path.join(self.cache_dir, 'validators.json')
+        fetch._validators = None
+
+        SchedulePageHandler.requests_seen = []
+        self.server = http.server.HTTPServer(('127.0.0.1', 0), SchedulePageHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        fetch.CACHE_DIR, fetch.VALIDATORS_PATH, fetch._validators = self._saved
+        shutil.rmtree(self.cache_dir)
+
+    def test_conditional_fetch_returns_none_when_unchanged(self):
+        page = fetch.fetch(self.url)
+        self.assertEqual(page.text, SchedulePageHandler.body.decode())
+        self.assertEqual(page.validators, {'etag': '"v1"'})
+        # saved by the caller, once the page's shows are stored
+        self.assertEqual(fetch.get_validators(self.url), {})
+        self.assertIsNotNone(fetch.fetch(self.url, conditional=True))
+
+        fetch.save_validators(self.url, page.validators)
+        self.assertIsNone(fetch.fetch(self.url, conditional=True))
+        self.assertEqual(
+            SchedulePageHandler.requests_seen[-1].get('If-None-Match'), '"v1"'
+        )
+
+    def test_unconditional_fetch_always_returns_page(self):
+        fetch.fetch(self.url)
+        self.assertIsNotNone(fetch.fetch(self.url))
+        self.assertNotIn('If-None-Match', SchedulePageHandler.requests_seen[-1])
+
+    def test_validators_persist_across_processes(self):
+        fetch.save_validators(self.url, fetch.fetch(self.url).validators)
+        # simulate a fresh process reading the validators file
+        fetch._validators = None
+        self.assertIsNone(fetch.fetch(self.url, conditional=True))
+
+
+class StubVenue(Venue):
+    """Minimal scraper over SchedulePageHandler-style markup."""
+
+    def __init__(self):
+        super().__init__()
+        self.venue_name = 'House of Bugs'
+        self.url = 'http://bugs.rock'
+        self.fetches = 0
+
+    def fetch_html(self, conditional=False):
+        self.fetches += 1
+        return SchedulePageHandler.body.decode()
+
+    def get_summaries(self, html):
+        from bs4 import BeautifulSoup as bs
+        return bs(html, 'html.parser').select('.show_summary')
+
+    def get_artist_billing(self, summary):
+        return summary.text
+
+    def get_venue_info(self, summary):
+        return (self.venue_name, self.venue_id)
+
+    def get_show_date(self, summary):
+        return None
+
+    def get_show_price(self, summary):
+        return 'Free.99'
+
+    def get_show_url(self, summary):
+        return self.url
+
+class PageCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self._saved = (cache.PAGES_DIR, cache.INDEX_PATH)
+        cache.PAGES_DIR = os.path.join(self.cache_dir, 'pages')
+        cache.INDEX_PATH = os.path.join(cache.PAGES_DIR, 'index.json')
+
+    def tearDown(self):
+        cache.PAGES_DIR, cache.INDEX_PATH = self._saved
+        shutil.rmtree(self.cache_dir)
+
+    def test_put_and_get(self):
+        cache.put('LincolnHall', '<p>blob</p>')
+        cache.put('SchubasTavern', '<p>blob</p>')
+        self.assertEqual(cache.get('LincolnHall'), '<p>blob</p>')
+        # identical pages are stored once
+        blobs = [name for name in os.listdir(cache.PAGES_DIR) if name.endswith('.gz')]
+        self.assertEqual(len(blobs), 1)
+
+    def test_replaced_pages_are_removed(self):
+        cache.put('EmptyBottle', '<p>old</p>')
+        cache.put('EmptyBottle', '<p>new</p>')
+        self.assertEqual(cache.get('EmptyBottle'), '<p>new</p>')
+        blobs = [name for name in os.listdir(cache.PAGES_DIR) if name.endswith('.gz')]
+        self.assertEqual(len(blobs), 1)
+
+    def test_miss_and_ttl(self):
+        with self.assertRaises(cache.CacheMiss):
+            cache.get('Metro')
+        cache.put('Metro', '<p>show</p>')
+        with self.assertRaises(cache.CacheMiss):
+            cache.get('Metro', max_age=-1)
+        self.assertEqual(cache.get('Metro', max_age=60), '<p>show</p>')
+
+    def test_replay_parses_cached_page(self):
+        live = StubVenue()
+        live.load_live_shows()
+        replayed = StubVenue()
+        replayed.load_live_shows(replay=True)
+
+        self.assertEqual(replayed.fetches, 0)
+        self.assertEqual(replayed.shows, live.shows)
+        self.assertEqual(replayed.shows[0].artists, 'Toast Test')
+
+    def test_replay_without_cache_raises(self):
+        with self.assertRaises(cache.CacheMiss):
+            StubVenue().load_live_shows(replay=True)
+
+
+class FakeDriver:
+    """Returns queued page snapshots from execute_script, repeating the last."""
+
+    def __init__(self, *snapshots):
+        self.snapshots = list(snapshots)
+        self.calls = 0
+
+    def execute_script(self, script, selector):
+        self.calls += 1
+        if len(self.snapshots) > 1:
+            return self.snapshots.pop(0)
+        return self.snapshots[0]
+
+class WaitForContentTest(SimpleTestCase):
+
+    def test_waits_for_new_stable_content(self):
+        driver = FakeDriver('', 'march', 'march', 'april', 'april partial', 'april full')
+        self.assertEqual(wait_for_content(driver, '.showItem', poll=0), 'march')
+        self.assertEqual(
+            wait_for_content(driver, '.showItem', previous='march', poll=0),
+            'april full'
+        )
+
+    def test_gives_up_at_timeout(self):
+        driver = FakeDriver('march')
+        snapshot = wait_for_content(
+            driver, '.showItem', previous='march', timeout=0.05, poll=0.01
+        )
+        self.assertEqual(snapshot, 'march')
+
+    def test_allow_empty(self):
+        driver = FakeDriver('march', '')
+        self.assertEqual(
+            wait_for_content(driver, '.showItem', previous='march',
+                             allow_empty=True, poll=0),
+            ''
+        )
+
+class MakeShowsTest(SimpleTestCase):
+
+    def test_duplicate_shows_skipped(self):
+        page = SchedulePageHandler.body.decode()
+        venue = StubVenue()
+        venue.make_shows('\n'.join([page, page]))
+        self.assertEqual(len(venue.shows), 1)
+
+
+class FakeBrowser:
+
+    def __init__(self):
+        self.quit_called = False
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+class BrowserPoolTest(SimpleTestCase):
+
+    def test_browsers_reused_and_quit(self):
+        started = []
+        def factory():
+            started.append(FakeBrowser())
+            return started[-1]
+
+        with BrowserPool(size=2, factory=factory) as pool:
+            with pool.driver() as first:
+                pass
+            with pool.driver() as second:
+                pass
+            self.assertIs(first, second)
+            with pool.driver() as first, pool.driver() as second:
+                self.assertIsNot(first, second)
+        self.assertEqual(len(started), 2)
+        self.assertTrue(all(browser.quit_called for browser in started))
+
+    def test_shared_loads_once(self):
+        loads = []
+        def load():
+            loads.append(1)
+            return '<p>lh-st</p>'
+
+        pool = BrowserPool(factory=FakeBrowser)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(pool.shared('lh-st', load)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['<p>lh-st</p>'] * 4)
+        self.assertEqual(len(loads), 1)
+
+    def test_scraper_without_pool_uses_one_off_browser(self):
+        venue = StubVenue()
+        self.assertEqual(venue.shared_fetch('key', lambda: 'page'), 'page')
+
+class LHSTSummariesTest(SimpleTestCase):
+
+    def test_venues_filter_shared_page(self):
+        lincoln_hall = LincolnHall().get_summaries(LH_ST_PAGE)
+        schubas = SchubasTavern().get_summaries(LH_ST_PAGE)
+        self.assertEqual(
+            [LincolnHall().get_artist_billing(s) for s in lincoln_hall],
+            ['Toast Test, The Toe Jam']
+        )
+        self.assertEqual(
+            [SchubasTavern().get_artist_billing(s) for s in schubas],
+            ['Lavender Menace']
+        )
+
+class SinglePassTest(SimpleTestCase):
+
+    def test_indexed_summary_select(self):
+        from bs4 import BeautifulSoup as bs
+
+        summary = bs(EMPTY_BOTTLE_PAGE, 'html.parser').select('.show_summary')[1]
+        indexed = IndexedSummary(summary)
+        for selector in ('.show_venue', '.show_price', '.missing', 'div > span'):
+            self.assertEqual(indexed.select(selector), summary.select(selector))
+        self.assertEqual(indexed.find('a', href=True), summary.find('a', href=True))
+
+    def test_single_pass_matches_select(self):
+        for scraper_class, page in SAMPLE_PAGES:
+            single_pass = scraper_class()
+            single_pass.make_shows(page, single_pass=True)
+            walked = scraper_class()
+            walked.make_shows(page, single_pass=False)
+            self.assertTrue(single_pass.shows)
+            self.assertEqual(single_pass.shows, walked.shows)
+
+    def test_parsed_document_accepted(self):
+        from bs4 import BeautifulSoup as bs
+
+        from_string = EmptyBottle()
+        from_string.make_shows(EMPTY_BOTTLE_PAGE)
+        from_soup = EmptyBottle()
+        from_soup.make_shows(bs(EMPTY_BOTTLE_PAGE, 'html.parser'))
+        self.assertEqual(from_soup.shows, from_string.shows)
+        self.assertEqual(len(from_soup.shows), 2)
+
+
+def full_page(page):
+    """Wraps sample schedule markup in some surrounding page chrome."""
+    return (
+        '<!DOCTYPE html><html><head><title>Shows</title>'
+        '<script>var shows = "<div class=\'show_summary\'>";</script></head>'
+        '<body><nav class="menu"><a href="/">Home</a></nav>'
+        + page +
+        '<footer class="showItem-footer">&copy; 2016</footer></body></html>'
+    )
+
+
+class ParserBackendTest(SimpleTestCase):
+
+    def shows(self, scraper_class, page, parser, strained):
+        scraper = scraper_class()
+        scraper.parser = parser
+        if not strained:
+            scraper.parse_only = None
+        scraper.make_shows(full_page(page))
+        return scraper.shows
+
+    def test_strainer_matches_full_parse(self):
+        for scraper_class, page in SAMPLE_PAGES:
+            expected = self.shows(scraper_class, page, 'html.parser', strained=False)
+            self.assertTrue(expected)
+            self.assertEqual(
+                self.shows(scraper_class, page, 'html.parser', strained=True),
+                expected
+            )
+
+    @unittest.skipUnless(lxml, "lxml is not installed")
+    def test_lxml_matches_html_parser(self):
+        for scraper_class, page in SAMPLE_PAGES:
+            expected = self.shows(scraper_class, page, 'html.parser', strained=False)
+            for strained in (False, True):
+                self.assertEqual(
+                    self.shows(scraper_class, page, 'lxml', strained=strained),
+                    expected
+                )
+
+
+class OfflineEmptyBottle(EmptyBottle):
+    """Empty Bottle scraper that parses `page` instead of fetching."""
+
+    page = EMPTY_BOTTLE_PAGE
+
+    def load_live_shows(self, **load_options):
+        self.validators = {'etag': '"v1"'}
+        self.make_shows(self.page)
+
+
+class BrokenVenue(EmptyBottle):
+    """Scraper whose page fails to parse."""
+
+    def load_live_shows(self, **load_options):
+        raise IndexError('list index out of range')
+
+
+@mock.patch.dict(SCRAPERS, {1: OfflineEmptyBottle}, clear=True)
+class ScrapeShowsTest(TestCase):
+
+    def setUp(self):
+        self.empty_bottle = models.Venue.objects.create(
+            id=1, name='The Empty Bottle', address='1035 N Western Ave.',
+            schedule_url='http://emptybottle.com'
+        )
+        self.misc_venue = models.Venue.objects.create(
+            id=99, name='Misc', address='', schedule_url='', is_active=False
+        )
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        for module, name, value in (
+            (fetch, 'CACHE_DIR', cache_dir),
+            (fetch, 'VALIDATORS_PATH', os.path.join(cache_dir, 'validators.json')),
+            (fetch, '_validators', None),
+            (matching, 'MATCHER_PATH', os.path.join(cache_dir, 'artist_matcher.pickle')),
+            (matching, '_loaded', None),
+        ):
+            patcher = mock.patch.object(module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_bulk_insert(self):
+        out = io.StringIO()
+        call_command('scrape_shows', stdout=out)
+
+        concerts = models.Concert.objects.order_by('date_time')
+        self.assertEqual(
+            [(concert.billing, concert.venue) for concert in concerts],
+            [('Toast Test,The Toe Jam', self.empty_bottle),
+             ('Lavender Menace', self.misc_venue)]
+        )
+        self.assertIn("2 shows from The Empty Bottle: 2 added", out.getvalue())
+
+    def test_dry_run(self):
+        out = io.StringIO()
+        call_command('scrape_shows', dry_run=True, stdout=out)
+        self.assertFalse(models.Concert.objects.exists())
+        self.assertIn("Parsed 2 shows from The Empty Bottle", out.getvalue())
+        # nothing stored, so the next --if-modified run fetches in full
+        self.assertEqual(fetch.get_validators(OfflineEmptyBottle().url), {})
+
+    def test_validators_saved_after_write(self):
+        url = OfflineEmptyBottle().url
+        with mock.patch(
+            'concerts.management.commands.scrape_shows.sync_venue_concerts',
+            side_effect=RuntimeError('write failed'),
+        ):
+            with self.assertRaises(RuntimeError):
+                call_command('scrape_shows', stdout=io.StringIO())
+        self.assertEqual(fetch.get_validators(url), {})
+
+        call_command('scrape_shows', stdout=io.StringIO())
+        self.assertEqual(fetch.get_validators(url), {'etag': '"v1"'})
+
+    def test_rescrape_updates_in_place(self):
+        call_command('scrape_shows', stdout=io.StringIO())
+        call_command('make_matches')
+        toast = models.Concert.objects.get(venue=self.empty_bottle)
+        match = models.ConcertMatch.objects.create(concert=toast)
+
+        # Toast Test's price changes, Lavender Menace is gone, a show is new
+        changed_page = (
+            EMPTY_BOTTLE_PAGE
+            .replace('$10.00', '$12.00')
+            .replace('Lavender Menace', 'Soft Spoken')
+            .replace('event_id=2', 'event_id=3')
+        )
+        out = io.StringIO()
+        with mock.patch.object(OfflineEmptyBottle, 'page', changed_page):
+            call_command('scrape_shows', stdout=out)
+        self.assertIn(
+            "1 added, 1 updated, 0 unchanged, 0 deactivated", out.getvalue()
+        )
+
+        toast.refresh_from_db()
+        self.assertEqual(toast.price, '$12.00')
+        self.assertTrue(toast.is_active)
+        # billing didn't change, so the match stands
+        self.assertFalse(toast.needs_matching)
+        self.assertTrue(models.ConcertMatch.objects.filter(pk=match.pk).exists())
+
+        misc = models.Concert.objects.filter(venue=self.misc_venue)
+        self.assertEqual(
+            sorted((concert.billing, concert.is_active) for concert in misc),
+            [('Lavender Menace', False), ('Soft Spoken', True)]
+        )
+
+    def test_failed_venue_skipped(self):
+        call_command('scrape_shows', stdout=io.StringIO())
+        models.Concert.objects.filter(venue=self.misc_venue).update(url='http://gone')
+        models.Venue.objects.create(
+            id=2, name='Broken Hall', address='', schedule_url='http://broken.hall'
+        )
+        token = models.DataGeneration.load().token
+
+        out, err = io.StringIO(), io.StringIO()
+        with mock.patch.dict(SCRAPERS, {2: BrokenVenue}), \
+                self.assertLogs('concerts.data_management', 'ERROR'):
+            call_command('scrape_shows', stdout=out, stderr=err)
+        self.assertIn("Failed to scrape Broken Hall: IndexError", err.getvalue())
+        self.assertIn("2 shows from The Empty Bottle", out.getvalue())
+        self.assertIn("(1 failed: Broken Hall)", out.getvalue())
+        # the other venues' concerts are written, and the pages re-rendered,
+        # but with a venue missing, no misc venue concert is judged gone
+        self.assertNotEqual(models.DataGeneration.load().token, token)
+        self.assertTrue(
+            models.Concert.objects.get(venue=self.misc_venue, url='http://gone').is_active
+        )
+
+    def test_rescrape_unchanged(self):
+        call_command('scrape_shows', stdout=io.StringIO())
+        ids = set(models.Concert.objects.values_list('id', flat=True))
+        out = io.StringIO()
+        call_command('scrape_shows', stdout=out)
+        self.assertIn("0 added, 0 updated, 2 unchanged, 0 deactivated", out.getvalue())
+        self.assertEqual(set(models.Concert.objects.values_list('id', flat=True)), ids)
+
+    def test_vanished_show_deactivated(self):
+        call_command('scrape_shows', stdout=io.StringIO())
+        first_show = EMPTY_BOTTLE_PAGE[:EMPTY_BOTTLE_PAGE.index('</div>\n<div class="show_summary">')]
+        with mock.patch.object(OfflineEmptyBottle, 'page', EMPTY_BOTTLE_PAGE.replace(
+            first_show + '</div>', ''
+        )):
+            out = io.StringIO()
+            call_command('scrape_shows', stdout=out)
+        self.assertIn("1 deactivated", out.getvalue())
+        self.assertFalse(
+            models.Concert.objects.get(venue=self.empty_bottle).is_active
+        )
+
+        # reappearing reactivates it and flags it for matching
+        call_command('scrape_shows', stdout=io.StringIO())
+        concert = models.Concert.objects.get(venue=self.empty_bottle)
+        self.assertTrue(concert.is_active)
+        self.assertTrue(concert.needs_matching)
+
+    def test_staged_generation(self):
+        models.Artist.objects.create(
+            name='Toast Test', re_string=r'\bToast.?Test\b', is_active=True
+        )
+        call_command('scrape_shows', stdout=io.StringIO())
+        call_command('make_matches')
+        published = set(models.Concert.objects.published().values_list('id', flat=True))
+
+        generation = models.DataGeneration.stage()
+        call_command('scrape_shows', generation=generation, stdout=io.StringIO())
+        call_command('make_matches', full=True, generation=generation)
+        # the published concerts and their matches are untouched
+        self.assertEqual(
+            set(models.Concert.objects.published().values_list('id', flat=True)), published
+        )
+        self.assertEqual(models.ConcertMatch.objects.count(), 2)
+        staged = models.Concert.objects.published(generation)
+        self.assertEqual(staged.count(), 2)
+        self.assertFalse(staged.filter(id__in=published).exists())
+
+        models.DataGeneration.publish(generation)
+        self.assertEqual(models.Concert.objects.published().count(), 2)
+        self.assertTrue(models.ConcertMatch.objects.filter(
+            concert__generation=generation, concert__billing='Toast Test,The Toe Jam'
+        ).exists())
+        # the old generation goes with the next stage()
+        models.DataGeneration.stage()
+        self.assertEqual(models.Concert.objects.count(), 2)
+        self.assertEqual(models.ConcertMatch.objects.count(), 1)
+
+
+class EmptyBottlePageHandler(SchedulePageHandler):
+    body = EMPTY_BOTTLE_PAGE.encode('utf-8')
+
+class LiveEmptyBottle(EmptyBottle):
+    """Empty Bottle scraper fetching from the stub server at `stub_url`."""
+
+    stub_url = None
+
+    def __init__(self):
+        super().__init__()
+        self.url = self.stub_url
+
+@mock.patch.dict(SCRAPERS, {1: LiveEmptyBottle}, clear=True)
+class UpdateLiveTest(TestCase):
+
+    def setUp(self):
+        models.Venue.objects.create(
+            id=1, name='The Empty Bottle', address='1035 N Western Ave.',
+            schedule_url='http://emptybottle.com'
+        )
+        models.Venue.objects.create(
+            id=99, name='Misc', address='', schedule_url='', is_active=False
+        )
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        pages_dir = os.path.join(cache_dir, 'pages')
+        for module, name, value in (
+            (fetch, 'CACHE_DIR', cache_dir),
+            (fetch, 'VALIDATORS_PATH', os.path.join(cache_dir, 'validators.json')),
+            (fetch, '_validators', None),
+            (cache, 'PAGES_DIR', pages_dir),
+            (cache, 'INDEX_PATH', os.path.join(pages_dir, 'index.json')),
+            (matching, 'MATCHER_PATH', os.path.join(cache_dir, 'artist_matcher.pickle')),
+            (matching, '_loaded', None),
+        ):
+            patcher = mock.patch.object(module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        SchedulePageHandler.requests_seen = []
+        server = http.server.HTTPServer(('127.0.0.1', 0), EmptyBottlePageHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        patcher = mock.patch.object(
+            LiveEmptyBottle, 'stub_url', 'http://127.0.0.1:{}/'.format(server.server_port)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_second_run_skips_unchanged_page(self):
+        out = io.StringIO()
+        call_command('update_live', force=True, stdout=out)
+        self.assertIn("2 shows from The Empty Bottle: 2 added", out.getvalue())
+        self.assertEqual(
+            fetch.get_validators(LiveEmptyBottle.stub_url), {'etag': '"v1"'}
+        )
+
+        out = io.StringIO()
+        call_command('update_live', force=True, stdout=out)
+        # the fetch got a 304, and the replay left the concerts as they were
+        self.assertEqual(len(SchedulePageHandler.requests_seen), 2)
+        self.assertEqual(SchedulePageHandler.requests_seen[-1].get('If-None-Match'), '"v1"')
+        self.assertIn("The Empty Bottle unchanged since last scrape", out.getvalue())
+        self.assertIn("2 unchanged, 0 deactivated", out.getvalue())
+        self.assertEqual(models.Concert.objects.filter(is_active=True).count(), 2)
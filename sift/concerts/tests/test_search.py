@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# concerts/tests/test_search.py
+
+import datetime
+from unittest import mock
+
+from django.core.urlresolvers import reverse
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from ..billing import index_billings
+from ..models import Artist, Concert, Venue
+from ..search import search, search_terms
+
+class SearchTermsTest(SimpleTestCase):
+
+    def test_search_terms(self):
+        self.assertEqual(search_terms('  Wilco, wilco & El-P '), ['wilco', 'el', 'p'])
+        self.assertEqual(search_terms('!!!'), [])
+        self.assertEqual(len(search_terms(' '.join(str(n) for n in range(20)))), 8)
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        self.venue = Venue.objects.create(
+            name='House of Bugs', address='123 Card St., Chicago, IL 60606',
+            schedule_url='http://bugs.rock'
+        )
+        self.other_venue = Venue.objects.create(
+            name='Empty Bottle', address='', schedule_url=''
+        )
+        self.tribute = self._make_concert('The Wilco Tribute', 1)
+        self.wilco = self._make_concert('Toast Test w/ Wilco', 2)
+        self.headliner = self._make_concert('Wilco', 3, venue=self.other_venue)
+        self._make_concert('Withered Hand', 4)
+        self._make_concert('Wilco (inactive)', 5, is_active=False)
+        index_billings(Concert.objects.all())
+        Artist.objects.create(name='Wilco', re_string='Wilco')
+
+    def _make_concert(self, billing, day, venue=None, is_active=True):
+        return Concert.objects.create(
+            billing=billing, venue=venue or self.venue, price='Free.99',
+            date_time=timezone.now() + datetime.timedelta(days=day),
+            url='http://bugs.rock/{}'.format(day), is_active=is_active,
+        )
+
+    def _billings(self, results):
+        return [concert.billing for concert in results.concerts]
+
+    def test_exact_acts_first(self):
+        results = search('wilco')
+        self.assertEqual(
+            self._billings(results),
+            ['Toast Test w/ Wilco', 'Wilco', 'The Wilco Tribute'],
+        )
+        self.assertEqual([concert.rank for concert in results.concerts], [1, 1, 0])
+        self.assertEqual([artist.name for artist in results.artists], ['Wilco'])
+
+    def test_word_prefixes(self):
+        self.assertEqual(self._billings(search('TRIB')), ['The Wilco Tribute'])
+        self.assertEqual(self._billings(search('the wil trib')), ['The Wilco Tribute'])
+        self.assertEqual(self._billings(search('wi ha')), ['Withered Hand'])
+        self.assertEqual(self._billings(search('ilco')), [])
+        self.assertEqual(search('   ').concerts, [])
+
+    def test_venue_names(self):
+        self.assertEqual(self._billings(search('wilco bottle')), ['Wilco'])
+        self.assertEqual(
+            self._billings(search('bugs')),
+            ['The Wilco Tribute', 'Toast Test w/ Wilco', 'Withered Hand'],
+        )
+
+    def test_pages(self):
+        first = search('wilco', page_size=2)
+        self.assertTrue(first.has_next)
+        second = search('wilco', page=2, page_size=2)
+        self.assertFalse(second.has_next)
+        self.assertEqual(self._billings(second), ['The Wilco Tribute'])
+        self.assertEqual(second.artists, [])
+
+    def test_walk_finds_the_same_concerts(self):
+        for query in ('wilco', 'wi ha', 'wilco bottle'):
+            with mock.patch('concerts.search.WALK_MIN_MATCHES', 0):
+                walked = self._billings(search(query, page_size=2))
+            self.assertEqual(walked, self._billings(search(query, page_size=2)))
+
+    def test_search_view(self):
+        response = self.client.get(reverse('concerts:search'), {'q': 'wilco'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['results'].concerts), 3)
+        self.assertContains(response, 'The Wilco Tribute')
+
+        response = self.client.get(reverse('concerts:search'), {'q': 'wilco', 'page': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_json(self):
+        url = reverse('concerts:search_json')
+        data = self.client.get(url, {'q': 'wilco', 'page': 2}).json()
+        self.assertEqual(data['page'], 2)
+        self.assertIsNone(data['next_page'])
+        self.assertEqual(data['concerts'], [])
+
+        data = self.client.get(url, {'q': 'the wilco tribute'}).json()
+        self.assertEqual(data['query'], 'the wilco tribute')
+        self.assertEqual(
+            [(concert['billing'], concert['venue']) for concert in data['concerts']],
+            [('The Wilco Tribute', 'House of Bugs')],
+        )
+
+        response = self.client.get(url, {'q': 'x' * 201})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('q', response.json()['errors'])
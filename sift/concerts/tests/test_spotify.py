@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# concerts/tests/test_spotify.py
+
+import http.server
+import io
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from ..models import Artist, DataGeneration
+from ..spotify import NOT_FOUND_TTL, IdCache, SpotifyResolver, TokenBucket
+
+SPOTIFY_IDS = {'Toast Test': 'toast123', 'The Toe Jam': 'toejam456', 'Slow Band': 'slow789'}
+
+class StubSpotifyHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers /v1/search like the Spotify API.  'Slow Band' is rate limited
+    once, with a Retry-After.
+    """
+
+    searches = []
+    in_flight = 0
+    most_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = StubSpotifyHandler
+        query = parse_qs(urlparse(self.path).query)
+        name = query['q'][0].strip('"')
+        with cls.lock:
+            cls.searches.append((name, self.headers.get('Authorization')))
+            cls.in_flight += 1
+            cls.most_in_flight = max(cls.most_in_flight, cls.in_flight)
+            first_try = [n for n, auth in cls.searches].count(name) == 1
+        try:
+            time.sleep(0.02)
+            if name == 'Slow Band' and first_try:
+                self.send_response(429)
+                self.send_header('Retry-After', '0.1')
+                self.end_headers()
+                return
+            items = [{'id': SPOTIFY_IDS[name], 'name': name}] if name in SPOTIFY_IDS else []
+            body = json.dumps({'artists': {'items': items}}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+class ThreadingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+class SpotifyResolverTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.cache_path = os.path.join(self.cache_dir, 'spotify_ids.json')
+
+        StubSpotifyHandler.searches = []
+        StubSpotifyHandler.most_in_flight = 0
+        self.server = ThreadingServer(('127.0.0.1', 0), StubSpotifyHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = 'http://127.0.0.1:{}/v1'.format(self.server.server_port)
+
+    def resolver(self, **kwargs):
+        return SpotifyResolver(
+            token='test-token', base_url=self.base_url, cache_path=self.cache_path, **kwargs
+        )
+
+    def test_resolve_many(self):
+        pauses = []
+        resolver = self.resolver(rate=1000, burst=1000, max_workers=2)
+        resolver.bucket.pause = lambda seconds, pause=resolver.bucket.pause: (
+            pauses.append(seconds), pause(seconds)
+        )
+        names = ['Toast Test', 'The Toe Jam', 'Slow Band', 'Nobody', 'Toast Test']
+        self.assertEqual(resolver.resolve_many(names), {
+            'Toast Test': 'toast123', 'The Toe Jam': 'toejam456',
+            'Slow Band': 'slow789', 'Nobody': '',
+        })
+        # one search per name, plus Slow Band's retry after the 429
+        self.assertEqual(len(StubSpotifyHandler.searches), 5)
+        self.assertEqual(pauses, [0.1])
+        self.assertLessEqual(StubSpotifyHandler.most_in_flight, 2)
+        self.assertEqual(
+            {auth for name, auth in StubSpotifyHandler.searches}, {'Bearer test-token'}
+        )
+
+        # found and not-found names come from the cache file from now on
+        resolver = self.resolver()
+        self.assertEqual(resolver.resolve('toast test'), 'toast123')
+        self.assertEqual(resolver.resolve_many(['Nobody', 'Slow Band']),
+                         {'Nobody': '', 'Slow Band': 'slow789'})
+        self.assertEqual(len(StubSpotifyHandler.searches), 5)
+
+    def test_not_found_expires(self):
+        now = [1000.0]
+        cache = IdCache(self.cache_path, clock=lambda: now[0])
+        cache.put('Nobody', '')
+        cache.put('Toast Test', 'toast123')
+        now[0] += NOT_FOUND_TTL + 1
+        self.assertIsNone(cache.get('Nobody'))
+        self.assertEqual(cache.get('TOAST TEST'), 'toast123')
+
+class TokenBucketTest(SimpleTestCase):
+
+    def test_rate_and_pause(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(6):
+            bucket.acquire()
+        # a burst of 2, then 2 per second
+        self.assertAlmostEqual(now[0], 2.0)
+
+        bucket.pause(5)
+        bucket.acquire()
+        self.assertGreaterEqual(now[0], 7.0)
+
+class GetSpotifyArtistIdsTest(TestCase):
+
+    def test_saves_ids_and_bumps_once(self):
+        Artist.objects.create(name='Toast Test', re_string='Toast Test')
+        Artist.objects.create(name='The Toe Jam', re_string='The Toe Jam')
+        Artist.objects.create(name='Nobody', re_string='Nobody')
+        token = DataGeneration.load().token
+
+        with mock.patch(
+            'concerts.management.commands.get_spotify_artist_ids.SpotifyResolver'
+        ) as resolver, mock.patch.object(
+            DataGeneration, 'bump', wraps=DataGeneration.bump
+        ) as bump:
+            resolver.return_value.resolve_many.return_value = {
+                'Toast Test': 'toast123', 'The Toe Jam': 'toejam456', 'Nobody': '',
+            }
+            call_command('get_spotify_artist_ids', stdout=io.StringIO())
+
+        self.assertEqual(
+            dict(Artist.objects.values_list('name', 'spotify_id')),
+            {'Toast Test': 'toast123', 'The Toe Jam': 'toejam456', 'Nobody': ''}
+        )
+        self.assertEqual(bump.call_count, 1)
+        self.assertNotEqual(DataGeneration.load().token, token)
@@ -44,4 +44,16 @@ class UrlsTest(TestCase):
 
         found = resolve(self.concert_index_url)
         # TODO figure out why functions themselves are not equal
-        self.assertEqual(found.func.__name__, ConcertsIndex.as_view().__name__)
\ No newline at end of file
+        self.assertEqual(found.func.__name__, ConcertsIndex.as_view().__name__)
+
+    def test_search_view_function_resolution(self):
+
+        from ..views import Search, SearchJson
+
+        self.assertEqual(
+            resolve(reverse('concerts:search')).func.__name__, Search.as_view().__name__
+        )
+        self.assertEqual(
+            resolve(reverse('concerts:search_json')).func.__name__,
+            SearchJson.as_view().__name__
+        )
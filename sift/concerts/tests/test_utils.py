@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# concerts/tests/test_utils.py
+
+import os
+import tempfile
+
+from django.core import serializers
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Artist, Concert, Venue
+from ..utils import stage_concert_fixture
+
+class StageConcertFixtureTest(TestCase):
+
+    def test_loads_concerts_into_generation(self):
+        venue = Venue.objects.create(name='House of Bugs', address='', schedule_url='')
+        artist = Artist.objects.create(name='Toast Test', re_string='Toast Test')
+        concert = Concert.objects.create(
+            billing='Toast Test', venue=venue, date_time=timezone.now(),
+            price='$10', url='http://bugs.rock', needs_matching=False
+        )
+        concert.artists.add(artist)
+
+        handle, path = tempfile.mkstemp(suffix='.json')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w') as fixture:
+            serializers.serialize('json', Concert.objects.all(), stream=fixture)
+
+        self.assertEqual(stage_concert_fixture(path, 3), 1)
+        staged = Concert.objects.get(generation=3)
+        self.assertNotEqual(staged.pk, concert.pk)
+        self.assertEqual((staged.billing, staged.venue), ('Toast Test', venue))
+        self.assertTrue(staged.needs_matching)
+        self.assertFalse(staged.artists.exists())
@@ -2,11 +2,12 @@
 # concerts/tests/test_views.py
 
 import datetime
+from unittest import mock
 
 from django.test import TestCase, RequestFactory
 from django.core.urlresolvers import reverse
 
-from ..models import Artist, Concert, ConcertMatch, Venue
+from ..models import Artist, Concert, ConcertMatch, DataGeneration, Venue
 from ..views import Home, UpcomingShows, ArtistsIndex, VenuesIndex, ConcertsIndex
 
 class ViewsTest(TestCase):
@@ -68,6 +69,89 @@ class ViewsTest(TestCase):
             datetime.datetime(2010,1,1,tzinfo=datetime.timezone.utc)
         )
 
+    def test_upcoming_shows_query_count(self):
+        """
+        The page's query count shouldn't grow with the number of matches.
+        """
+
+        def add_match(n):
+            artist = Artist.objects.create(
+                name='Artist {}'.format(n), re_string='Artist {}'.format(n),
+                is_active=True
+            )
+            concert = Concert.objects.create(
+                billing='Artist {}'.format(n), venue=self.test_venue,
+                date_time=datetime.datetime.utcnow(), price='$10',
+                url='http://bugs.rock/{}'.format(n)
+            )
+            match = ConcertMatch.objects.create(concert=concert)
+            concert.artists.add(artist, self.test_artist)
+            match.artists.add(artist, self.test_artist)
+
+        # generation token, matches, their artists, last updated
+        DataGeneration.bump()
+        with self.assertNumQueries(4):
+            self.client.get(self.upcoming_concerts_url)
+
+        for n in range(10):
+            add_match(n)
+        DataGeneration.bump()
+        with self.assertNumQueries(4):
+            response = self.client.get(self.upcoming_concerts_url)
+        self.assertEqual(len(response.context['matches']), 11)
+        self.assertContains(response, 'Artist 9')
+
+    def test_pages_cached_until_generation_bumped(self):
+        """
+        Cached pages are served until new data lands and the commands bump
+        the data generation.
+        """
+
+        DataGeneration.bump()
+        for url in (self.upcoming_concerts_url, self.artist_index_url,
+                    self.venue_index_url, self.concert_index_url):
+            first = self.client.get(url)
+            with self.assertNumQueries(1):
+                cached = self.client.get(url)
+            self.assertEqual(cached.status_code, 200)
+            self.assertEqual(cached.content, first.content)
+
+        self.test_venue.name = 'House of Slugs'
+        self.test_venue.save()
+        response = self.client.get(self.venue_index_url)
+        self.assertNotContains(response, 'House of Slugs')
+
+        DataGeneration.bump()
+        response = self.client.get(self.venue_index_url)
+        self.assertContains(response, 'House of Slugs')
+
+    def test_query_string_pages_not_cached(self):
+        url = self.venue_index_url + '?page=1'
+        self.client.get(url)
+        self.test_venue.name = 'House of Slugs'
+        self.test_venue.save()
+        self.assertContains(self.client.get(url), 'House of Slugs')
+
+    def test_staged_concerts_hidden_until_published(self):
+        generation = DataGeneration.stage()
+        staged = Concert.objects.create(
+            billing='Toast Test', venue=self.test_venue,
+            date_time=datetime.datetime.utcnow(), price='$10',
+            url='http://bugs.rock/staged', generation=generation
+        )
+        ConcertMatch.objects.create(concert=staged).artists.add(self.test_artist)
+
+        response = self.client.get(self.upcoming_concerts_url)
+        self.assertEqual(list(response.context['matches']), [self.test_concert])
+        response = self.client.get(self.concert_index_url)
+        self.assertNotContains(response, 'bugs.rock/staged')
+
+        DataGeneration.publish(generation)
+        response = self.client.get(self.upcoming_concerts_url)
+        self.assertEqual(list(response.context['matches']), [staged])
+        response = self.client.get(self.concert_index_url)
+        self.assertContains(response, 'bugs.rock/staged')
+
     def test_artists_index(self):
         response = self.client.get(self.artist_index_url)
         self.assertEqual(response.status_code, 200)
@@ -95,3 +179,82 @@ class ViewsTest(TestCase):
             response.context['last_updated'],
             datetime.datetime(2010,1,1,tzinfo=datetime.timezone.utc)
         )
+
+
+class ConcertsIndexTest(TestCase):
+    """
+    Keyset pagination, filters, and streaming on the all-concerts page.
+    """
+
+    def setUp(self):
+        self.bugs = Venue.objects.create(
+            name='House of Bugs', address='123 Card St., Chicago, IL 60606',
+            schedule_url='http://bugs.rock'
+        )
+        self.slugs = Venue.objects.create(
+            name='House of Slugs', address='321 Card St., Chicago, IL 60606',
+            schedule_url='http://slugs.rock'
+        )
+        # two shows a night, 9pm Chicago (3am UTC the next day), Dec 1-3
+        self.concerts = []
+        for day in (2, 3, 4):
+            for venue in (self.bugs, self.slugs):
+                self.concerts.append(Concert.objects.create(
+                    billing='{} show Dec {}'.format(venue.name, day - 1),
+                    venue=venue, price='$10', url='http://bugs.rock/',
+                    date_time=datetime.datetime(
+                        2016, 12, day, 3, tzinfo=datetime.timezone.utc
+                    ),
+                ))
+        self.url = reverse('concerts:all_concerts')
+
+    def get_all_pages(self, query=''):
+        concerts = []
+        next_query = query
+        while next_query is not None:
+            response = self.client.get('{}?{}'.format(self.url, next_query))
+            self.assertEqual(response.status_code, 200)
+            concerts += response.context['concert_list']
+            next_query = response.context['next_query']
+        return concerts
+
+    def test_keyset_pages(self):
+        # page boundaries fall between concerts at the same time
+        with mock.patch.object(ConcertsIndex, 'paginate_by', 4):
+            self.assertEqual(self.get_all_pages(), self.concerts)
+        # don't serve the pages cached with the other page size
+        DataGeneration.bump()
+        with mock.patch.object(ConcertsIndex, 'paginate_by', 1):
+            self.assertEqual(self.get_all_pages(), self.concerts)
+
+    def test_page_queries(self):
+        DataGeneration.bump()
+        # generation token, page of concerts with venues, last updated,
+        # venue filter choices
+        with mock.patch.object(ConcertsIndex, 'paginate_by', 2), \
+                self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'House of Slugs show Dec 1')
+
+    def test_filters(self):
+        with mock.patch.object(ConcertsIndex, 'paginate_by', 1):
+            concerts = self.get_all_pages(
+                'venue={}&start=2016-12-02&end=2016-12-03'.format(self.slugs.pk)
+            )
+        self.assertEqual(concerts, [self.concerts[3], self.concerts[5]])
+
+    def test_bad_query(self):
+        for query in ('after=nonsense', 'start=tuesday', 'venue=999'):
+            response = self.client.get('{}?{}'.format(self.url, query))
+            self.assertEqual(response.status_code, 400)
+
+    def test_stream(self):
+        response = self.client.get(self.url + '?stream=1&venue={}'.format(self.bugs.pk))
+        self.assertTrue(response.streaming)
+        html = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(html.count('<h3>'), 3)
+        self.assertIn('House of Bugs show Dec 3', html)
+        self.assertNotIn('House of Slugs show', html)
+        # rows are in Chicago time, as on the paginated page
+        self.assertIn('Dec. 1, 2016, 9 p.m.', html)
+        self.assertTrue(html.rstrip().endswith('</html>'))
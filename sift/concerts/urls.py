@@ -8,4 +8,6 @@ urlpatterns = [
     url(r'^artists/$', views.ArtistsIndex.as_view(), name='artists'),
     url(r'^venues/$', views.VenuesIndex.as_view(), name='venues'),
     url(r'^all/$', views.ConcertsIndex.as_view(), name='all_concerts'),
+    url(r'^search/$', views.Search.as_view(), name='search'),
+    url(r'^search\.json$', views.SearchJson.as_view(), name='search_json'),
 ]
\ No newline at end of file
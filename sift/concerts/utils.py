@@ -5,9 +5,14 @@ Misc. utility functions for the concerts app:
 
 * get_spotify_id
 * make_artist_regex
+* get_latest_fixture
+* new_fixture_path
+* rotate_fixtures
+* stage_concert_fixture
 """
 
-import logging, os
+import logging, os, re
+from string import punctuation
 
 from .scrapers import (
     emptybottle,
@@ -23,6 +28,12 @@ from .scrapers import (
 
 logger = logging.getLogger('concerts')
 
+# compiled once for make_artist_regex, which bulk imports call per name
+PUNC_RE = re.compile(
+    '[{}]'.format(punctuation),
+    flags=re.I|re.M|re.DOTALL
+)
+
 # key is Venue objects's pk; used by scrape_shows mgmt command
 SCRAPERS = {
     1: emptybottle.EmptyBottle,
@@ -48,49 +59,112 @@ FIXTURE_DIRS = {
     'venues': os.path.join(FIXTURES_BASE_DIR, 'venues'),
 }
 
-def get_spotify_id(artist_name):
-    """Returns Spotify artist ID, or empty string if none found."""
+# number of fixtures of each type export_fixtures keeps
+KEEP_FIXTURES = 5
 
-    import requests
-    from django.utils.http import urlencode
+def _list_fixtures(fixture_type):
+    """Returns fixture_type's fixture filenames, oldest first."""
 
-    SPOTIFY_QUERY_BASE = 'https://api.spotify.com/v1/search?'
-    spotify_token = os.environ.get('SPOTIFY_TOKEN')
-    if spotify_token is None:
-        import sys
-        sys.exit("No SPOTIFY_TOKEN env var set. Sad!")
-
-    # searching quoted artist name seems to give more accurate
-    quoted_name = '\"' + artist_name + '\"'
-    query_str = urlencode([('q', quoted_name), ('type', 'artist')])
-    response = requests.get(
-        SPOTIFY_QUERY_BASE + query_str,
-        headers={"Authorization": "Bearer {}".format(spotify_token)}
-    )
-    response.raise_for_status()
+    from .fixture_io import FIXTURE_SUFFIXES
 
-    artist_id = ''
+    fixtures = [
+        name for name in os.listdir(FIXTURE_DIRS[fixture_type])
+        if name.endswith(FIXTURE_SUFFIXES)
+    ]
+    fixtures.sort()
+    return fixtures
 
-    try:
-        artist_id = response.json()['artists']['items'][0]['id']
-    except IndexError as e:
-        logger.debug("Failed to get Spotify artist ID for {}".format(artist_name))
+def get_latest_fixture(fixture_type):
+    """
+    Returns the path to the most recent fixture of fixture_type
+    ('artists', 'concerts', or 'venues'), going by the date-prefixed filename.
+    Fixtures may be .json (dumpdata) or .jsonl.gz (export_fixtures).
+    Raises IndexError if there are no fixtures of that type.
+    """
 
-    return artist_id
+    fixtures = _list_fixtures(fixture_type)
+    return os.path.join(FIXTURE_DIRS[fixture_type], fixtures[-1])
 
+def new_fixture_path(fixture_type):
+    """
+    Returns the path for today's .jsonl.gz fixture of fixture_type.  The
+    date prefix (UTC) sorts it after every earlier fixture, including a
+    .json one from the same day.
+    """
 
-def make_artist_regex(artist_name):
-    """Returns regex string of artist name for storage in DB."""
+    from datetime import datetime
 
-    from string import punctuation
-    import re
+    from .fixture_io import JSONL_SUFFIX
 
-    PUNC_RE = re.compile(
-        '[{}]'.format(punctuation),
-        flags=re.I|re.M|re.DOTALL
+    name = '{}_{}{}'.format(
+        datetime.utcnow().strftime('%Y%m%d'), fixture_type[:-1], JSONL_SUFFIX
     )
+    return os.path.join(FIXTURE_DIRS[fixture_type], name)
+
+def rotate_fixtures(fixture_type, keep=KEEP_FIXTURES):
+    """
+    Deletes all but the `keep` most recent fixtures of fixture_type.
+    Returns the paths deleted.
+    """
+
+    fixtures = _list_fixtures(fixture_type)
+    removed = []
+    for name in fixtures[:max(len(fixtures) - keep, 0)]:
+        path = os.path.join(FIXTURE_DIRS[fixture_type], name)
+        os.remove(path)
+        removed.append(path)
+    return removed
+
+def stage_concert_fixture(fixture_path, generation):
+    """
+    Loads the concerts from a Concert fixture into `generation`, as
+    new rows alongside the published ones (see DataGeneration.stage).
+
+    Fixture pks and matches are dropped, and the billings tokenized; run
+    make_matches on the generation afterwards.  Returns the number of
+    concerts loaded.
+    """
+
+    from django.db import transaction
+
+    from .billing import index_billings
+    from .fixture_io import BATCH_SIZE, fixture_rows, raw_bulk_insert, read_fixture
+    from .models import Concert
+
+    count = 0
+    batch = []
+    with transaction.atomic():
+        for model, values, m2m in fixture_rows(read_fixture(fixture_path)):
+            if model is not Concert:
+                continue
+            values.pop('id', None)
+            values.update(generation=generation, needs_matching=True)
+            batch.append(Concert(**values))
+            if len(batch) == BATCH_SIZE:
+                raw_bulk_insert(Concert, batch)
+                count += len(batch)
+                batch = []
+        raw_bulk_insert(Concert, batch)
+        index_billings(Concert.objects.published(generation))
+    return count + len(batch)
+
+def get_spotify_id(artist_name):
+    """Returns Spotify artist ID, or empty string if none found."""
+
+    from .spotify import SpotifyError, SpotifyResolver
+
+    try:
+        resolver = SpotifyResolver()
+    except SpotifyError as e:
+        import sys
+        sys.exit(str(e))
+    return resolver.resolve(artist_name)
+
+
+def make_artist_regex(artist_name):
+    """Returns regex string of artist name for storage in DB."""
 
-    no_punc = re.sub(PUNC_RE, r'.?', artist_name)
+    no_punc = PUNC_RE.sub(r'.?', artist_name)
     no_end = re.sub(r'$', '\\\\b', no_punc)
     re_string = re.sub(r'^', '\\\\b', no_end)
     return re_string
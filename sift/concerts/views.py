@@ -3,11 +3,17 @@
 
 from datetime import datetime
 
+from django.db.models import Max, Q
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
 from django.views import generic
 
-from .models import Artist, Concert, ConcertMatch, Venue
+from .caching import GenerationCacheMixin
+from .forms import LOCAL_TZ, ConcertFilterForm, SearchForm, make_cursor
+from .models import Artist, Concert, DataGeneration, Venue
+from .search import search
 
 class Home(generic.View):
     """
@@ -29,7 +35,7 @@ class Home(generic.View):
         context = {'tagline': choice(taglines)}
         return render(request, 'concerts/sift_home.html', context)
 
-class UpcomingShows(generic.View):
+class UpcomingShows(GenerationCacheMixin, generic.View):
     """
     View list of concerts that have a tracked artist in their billing.
     """
@@ -38,14 +44,23 @@ class UpcomingShows(generic.View):
         """
         Return Concerts that have matched an artist in their billing,
         ordered by date ascending.
+
+        Venues are joined in and matched artists prefetched, so the page
+        takes the same few queries however many matches there are.  Every
+        query reads the same, published generation of concerts.
         """
 
-        matched_concert_ids = list(ConcertMatch.objects.values_list('concert', flat=True))
-        matches = Concert.objects.filter(id__in=matched_concert_ids).order_by('date_time')
-        if Concert.objects.count():
-            last_updated = Concert.objects.latest('date_scraped').date_scraped
+        concerts = Concert.objects.published(self.data_generation.published)
+        matches = (
+            concerts
+            .filter(concertmatch__isnull=False, is_active=True)
+            .select_related('venue')
+            .prefetch_related('artists')
+            .order_by('date_time')
+        )
+        last_updated = concerts.aggregate(Max('date_scraped'))['date_scraped__max']
         # TODO handle empty DB
-        else:
+        if last_updated is None:
             last_updated = datetime(1900,1,1)
         context = {
             'matches': matches,
@@ -54,38 +69,165 @@ class UpcomingShows(generic.View):
 
         return render(request, 'concerts/upcoming_concerts.html', context)
 
-class ArtistsIndex(generic.ListView):
+class ArtistsIndex(GenerationCacheMixin, generic.ListView):
     """
     View all artists being tracked.
     """
     queryset = Artist.objects.filter(is_active=True).order_by('name')
 
-class VenuesIndex(generic.ListView):
+class VenuesIndex(GenerationCacheMixin, generic.ListView):
     """
     View all venues being tracked.
     """
     queryset = Venue.objects.filter(is_active=True).order_by('name')
 
-class ConcertsIndex(generic.View):
+class ConcertsIndex(GenerationCacheMixin, generic.View):
     """
-    View all concerts in the DB, regardless of artist matches.
+    View all active concerts in the DB, regardless of artist matches.
+
+    Concerts are listed paginate_by at a time in (date_time, id) order; each
+    page carries on from the keyset cursor of the last one (?after=), so
+    later pages cost the same as the first.  They can be filtered by venue
+    and date range (see forms.ConcertFilterForm), and ?stream=1 sends every
+    matching concert instead, rendered row by row from a DB iterator.
     """
 
+    paginate_by = 100
+    # stands in for the rows when splitting the page around them to stream
+    rows_marker = '<!-- concert rows -->'
+
     def get(self, request):
         """
-        Return a list of all Concerts in the database.
+        Return a page of the Concerts in the database.
         """
-        concerts = Concert.objects.order_by('date_time')
-        if concerts:
-            last_updated = concerts[0].date_scraped
+
+        form = ConcertFilterForm(request.GET)
+        if not form.is_valid():
+            context = {'concert_list': [], 'form': form}
+            return render(request, 'concerts/concert_list.html', context, status=400)
+
+        published = Concert.objects.published(self.data_generation.published)
+        concerts = form.filter(published.filter(is_active=True).select_related('venue'))
+        concerts = concerts.order_by('date_time', 'id')
+        last_updated = published.aggregate(Max('date_scraped'))['date_scraped__max']
         # TODO handle empty DB
-        else:
+        if last_updated is None:
             last_updated = datetime(1900,1,1)
         context = {
-            'concert_list': concerts,
             'last_updated': last_updated,
+            'form': form,
         }
+
+        if form.cleaned_data['stream']:
+            return self.stream(request, concerts, context)
+
+        if form.cleaned_data['after']:
+            date_time, concert_id = form.cleaned_data['after']
+            concerts = concerts.filter(
+                Q(date_time__gt=date_time) | Q(date_time=date_time, id__gt=concert_id)
+            )
+        # one extra row says whether there is a next page
+        page = list(concerts[:self.paginate_by + 1])
+        next_query = None
+        if len(page) > self.paginate_by:
+            page = page[:self.paginate_by]
+            query = request.GET.copy()
+            query['after'] = make_cursor(page[-1])
+            next_query = query.urlencode()
+
+        context.update({
+            'concert_list': page,
+            'next_query': next_query,
+        })
         return render(request, 'concerts/concert_list.html', context)
 
+    def stream(self, request, concerts, context):
+        """
+        Return every concert in `concerts` as a StreamingHttpResponse,
+        rendering the rows one at a time as they come from the DB.
+        """
+
+        context['rows_marker'] = self.rows_marker
+        page = render_to_string('concerts/concert_list.html', context, request=request)
+        head, tail = page.split(self.rows_marker)
+        row_template = get_template('concerts/concert_row.html')
+
+        def rows():
+            yield head
+            # the rows are rendered outside base.html's {% timezone %} block
+            with timezone.override(LOCAL_TZ):
+                for concert in concerts.iterator():
+                    yield row_template.render({'concert': concert})
+            yield tail
+
+        return StreamingHttpResponse(rows())
+
+class Search(generic.View):
+    """
+    Search concerts by billing and venue, and tracked artists by name
+    (see concerts.search).
+
+    Not page cached, unlike the fixed lists: there's no end to the queries
+    people can type, and they would crowd the lists out of the cache.
+    """
+
+    template_name = 'concerts/search.html'
+
+    def get(self, request):
+        form = SearchForm(request.GET)
+        if not form.is_valid():
+            return self.render_results(request, form, None, status=400)
+
+        results = search(
+            form.cleaned_data['q'],
+            generation=DataGeneration.load().published,
+            page=form.cleaned_data['page'],
+        )
+        return self.render_results(request, form, results)
+
+    def render_results(self, request, form, results, status=200):
+        next_query = None
+        if results is not None and results.has_next:
+            query = request.GET.copy()
+            query['page'] = results.page + 1
+            next_query = query.urlencode()
+        context = {'form': form, 'results': results, 'next_query': next_query}
+        return render(request, self.template_name, context, status=status)
+
+class SearchJson(Search):
+    """
+    Search results as JSON: the query, page, next page number (or null),
+    and the concerts and artists found, best match first.
+    """
+
+    def render_results(self, request, form, results, status=200):
+        if results is None:
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        return JsonResponse({
+            'query': results.query,
+            'page': results.page,
+            'next_page': results.page + 1 if results.has_next else None,
+            'concerts': [
+                {
+                    'id': concert.id,
+                    'billing': concert.billing,
+                    'venue': concert.venue.name if concert.venue else None,
+                    'date_time': concert.date_time,
+                    'price': concert.price,
+                    'url': concert.url,
+                }
+                for concert in results.concerts
+            ],
+            'artists': [
+                {
+                    'id': artist.id,
+                    'name': artist.name,
+                    'spotify_id': artist.spotify_id,
+                }
+                for artist in results.artists
+            ],
+        }, status=status)
+
 if __name__=='__main__':
     pass
@@ -69,6 +69,37 @@ WSGI_APPLICATION = 'sift.wsgi.application'
 # Logging
 
 
+# Cache
+# https://docs.djangoproject.com/en/1.9/topics/cache/
+# Rendered pages are kept until the next data generation (concerts.caching);
+# set SIFT_PAGE_CACHE_DIR to share them between processes on disk.
+
+if os.environ.get('SIFT_PAGE_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['SIFT_PAGE_CACHE_DIR'],
+            'TIMEOUT': None,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sift-pages',
+            'TIMEOUT': None,
+        }
+    }
+
+
+# Files the concerts app keeps between runs: fetched pages and their
+# validators, Spotify IDs, and the compiled artist matcher
+
+SIFT_CACHE_DIR = os.environ.get(
+    'SIFT_CACHE_DIR', os.path.join(BASE_DIR, 'concerts', '.cache')
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
 